@@ -1,88 +1,327 @@
-from machine import Pin, I2C
-from utime import sleep, time, sleep_ms, ticks_ms, ticks_diff
+from utime import time, ticks_ms, ticks_diff, ticks_add
 import random
-import _thread
-from math import pi, exp, sin, cos
+from math import exp
+from array import array
 
-from shapeDrawer import shapeDrawer
-from Light import Lights
-from Locker import ConditionalLock
 from TimeProfiles import Time_Profiles
 
-import gc9a01
-import tft_config
-import gc
-from Particle import Tear, Heart, Z
-from Light import Lights
-
-def weighted_choice(options, weights):
-	total = sum(weights)
-	cumulative_weights = []
-	cumulative_sum = 0
-	for weight in weights:
-		cumulative_sum += weight
-		cumulative_weights.append(cumulative_sum)
-	
-	r = random.uniform(0, total)
-	for option, cumulative_weight in zip(options, cumulative_weights):
-		if r < cumulative_weight:
-			return option
+def run_script(State, name, **args):
+	"""
+	Queues the routine of an animation script on a State, nothing if the script is missing. The scripts are imported
+	on first use.
+	"""
+	import Scripts
+	script = Scripts.get(name)
+	if script is not None:
+		script.run(State, args)
+
+class Choices():
+	"""
+	Weighted options with the cumulative weights computed once, so picking one does not build any lists.
+
+	Attributes:
+		options (tuple): The options.
+		weights (tuple): The cumulative weights of the options.
+
+	Methods:
+		pick(): Returns an option at random by its weight.
+	"""
+
+	def __init__(self, options):
+		"""
+		Parameters:
+			options (dict): The weight per option.
+		"""
+		self.options = tuple(options)
+		cumulative_weights = []
+		cumulative_sum = 0
+		for option in self.options:
+			cumulative_sum += options[option]
+			cumulative_weights.append(cumulative_sum)
+		self.weights = tuple(cumulative_weights)
+
+	def pick(self):
+		r = random.uniform(0, self.weights[-1])
+		for i in range(len(self.options)):
+			if r < self.weights[i]:
+				return self.options[i]
+
+EASING_BITS = 6
+EASING_STEPS = 1 << EASING_BITS
+EASING_ONE = 0xFFFF
+EASING_LUTS = True
+BLEND_TOLERANCE = 1e-3
+
+_PROFILES = []
+_LUTS = []
+_PLANS = {}
+
+def profile_id(timing_profile):
+	"""
+	Returns the index of a timing profile in the profile table, registering it on first use.
+
+	A registered profile is sampled into a lookup table, see easing_lut().
+
+	:param timing_profile: The timing function used to interpolate an animation.
+	:return: The index of the timing profile.
+	"""
+	for i in range(len(_PROFILES)):
+		if _PROFILES[i] == timing_profile:
+			return i
+	_PROFILES.append(timing_profile)
+	_LUTS.append(easing_lut(timing_profile))
+	return len(_PROFILES)-1
+
+def easing_lut(timing_profile):
+	"""
+	Samples a timing profile at EASING_STEPS+1 evenly spaced points into a fixed-point table of its progress,
+	where EASING_ONE is the end value. Between the points the progress is interpolated linearly in integers.
+
+	:param timing_profile: The timing function, called as timing_profile(start, end, elapsed, duration).
+	:return: The table as array('H'), or None if the profile leaves the range from start to end, e.g. to overshoot.
+	"""
+	lut = array('H', [0]*(EASING_STEPS+1))
+	for i in range(EASING_STEPS+1):
+		progress = round(timing_profile(0, EASING_ONE, i, EASING_STEPS))
+		if progress < 0 or progress > EASING_ONE:
+			return None
+		lut[i] = progress
+	return lut
+
+for _profile in (Time_Profiles.linear, Time_Profiles.ease_in, Time_Profiles.ease_out, Time_Profiles.ease_in_out):
+	profile_id(_profile)
+
+class _Track():
+	"""
+	The compiled keyframes of a single status property.
+
+	Keyframes are stored in parallel arrays sorted on start time. Everything before the cursor has been
+	activated, the active index points to the keyframe that is currently being interpolated.
+
+	Attributes:
+		prop (str): The status property animated by this track.
+		start (array): Start time of each keyframe in ticks.
+		duration (array): Duration of each keyframe in milliseconds.
+		start_value (array): Value of the property when the keyframe got activated.
+		end_value (array): Target value of the keyframe.
+		profile (array): Index of the timing profile of the keyframe.
+		step (float): The change of the property per EASING_ONE of progress of the active keyframe.
+	"""
+
+	def __init__(self, prop):
+		self.prop = prop
+		self.start = array('i')
+		self.duration = array('i')
+		self.start_value = array('f')
+		self.end_value = array('f')
+		self.profile = array('B')
+		self.step = 0
+		self.length = 0
+		self.cursor = 0
+		self.active = -1
+		self.live = False
+
+	def insert(self, start_time, duration, end_value, profile):
+		"""
+		Inserts a keyframe, keeping the pending part of the track sorted on start time.
+		Keyframes with an equal start time keep their insertion order.
+
+		Returns:
+			int: The index of the inserted keyframe.
+		"""
+		if self.cursor >= 8:
+			self.__compact()
+		index = self.length
+		if index == len(self.start):
+			self.start.append(0)
+			self.duration.append(0)
+			self.start_value.append(0)
+			self.end_value.append(0)
+			self.profile.append(0)
+		while index > self.cursor and ticks_diff(self.start[index-1], start_time) > 0:
+			self.start[index] = self.start[index-1]
+			self.duration[index] = self.duration[index-1]
+			self.end_value[index] = self.end_value[index-1]
+			self.profile[index] = self.profile[index-1]
+			index -= 1
+		self.start[index] = start_time
+		self.duration[index] = duration
+		self.end_value[index] = end_value
+		self.profile[index] = profile
+		self.length += 1
+		return index
+
+	def clear(self):
+		"""
+		Drops all keyframes, the storage is kept for the next animation.
+		"""
+		self.length = 0
+		self.cursor = 0
+		self.active = -1
+		self.live = False
+
+	def __compact(self):
+		"""
+		Moves the active and pending keyframes to the front of the arrays.
+		"""
+		first = self.active if self.active >= 0 else self.cursor
+		for i in range(first, self.length):
+			self.start[i-first] = self.start[i]
+			self.duration[i-first] = self.duration[i]
+			self.start_value[i-first] = self.start_value[i]
+			self.end_value[i-first] = self.end_value[i]
+			self.profile[i-first] = self.profile[i]
+		self.length -= first
+		self.cursor -= first
+		if self.active >= 0:
+			self.active -= first
+
+class Blend_Plan():
+	"""
+	The keyframes of a transition, compiled once into one target per property, e.g. the standard face and colour of
+	an emotion. A property set by more than one step takes the target of the last one.
+
+	Attributes:
+		props (tuple): The animated properties.
+		values (array): The target value per property.
+		durations (array): The duration per property in milliseconds.
+		profiles (array): The index of the timing profile per property.
+	"""
+
+	def __init__(self, steps):
+		"""
+		Parameters:
+			steps (tuple): (end_config, duration, timing_profile) per group of properties.
+		"""
+		props = []
+		self.values = array('f')
+		self.durations = array('i')
+		self.profiles = array('B')
+		for end_config, duration, timing_profile in steps:
+			profile = profile_id(timing_profile)
+			for prop, value in end_config.items():
+				if prop in props:
+					index = props.index(prop)
+					self.values[index] = value
+					self.durations[index] = duration
+					self.profiles[index] = profile
+				else:
+					props.append(prop)
+					self.values.append(value)
+					self.durations.append(duration)
+					self.profiles.append(profile)
+		self.props = tuple(props)
 
 class StatusAnimator:
 	"""
 	Manages animations for facial expressions by queuing and executing animations with specified timing profiles.
 
+	Every animated property owns a compiled track of keyframes. A frame only visits the tracks that still have
+	active or pending keyframes, so the cost of a frame does not depend on the number of queued keyframes.
+
+	The projected final status and end time are kept up to date while animations are queued, so reading them
+	does not walk the tracks.
+
 	Attributes:
-		animation_queue (list): A queue of animations to be executed.
-		active_animations (list): List of currently active animations.
+		time_animation_done (int): The time at which the last queued animation is done.
 	"""
 
 	def __init__(self):
-		self.animation_queue = []
-		self.active_animations = {}
+		self.__tracks = {}
+		self.__live = []
+		self.__pending = 0
+		self.__frame = {}
 		self.time_animation_done = ticks_ms()
 
+		self.__projected = None
+		self.__projected_shared = False
+		self.__end_time = self.time_animation_done
+
 	def get_final_status(self, current_status):
 		"""
 		Returns the status of the State after all queued animations are completed.
+
+		The returned dictionary is shared with later calls and must not be modified.
 		
+		:param current_status: The current status of the State.
+		:return: The status of the State after all queued animations are completed.
+		"""
+		if self.__projected is None:
+			self.__projected = self.compute_final_status(current_status)
+		self.__projected_shared = True
+		return self.__projected
+
+	def compute_final_status(self, current_status):
+		"""
+		Computes the final status by walking all tracks, without using the projection.
+
 		:param current_status: The current status of the State.
 		:return: The status of the State after all queued animations are completed.
 		"""
 		status = current_status.copy()
-		for item in self.active_animations.values():
-			if 'end_config' in item:
-				end_config = item['end_config']
-				status.update(end_config)
-		for item in self.animation_queue:
-			end_config, duration, timing_profile, start_time = item
-			status.update(end_config)
+		for track in self.__live:
+			if track.length > 0:
+				status[track.prop] = track.end_value[track.length-1]
 		return status
 	
 	def get_final_time(self):
 		"""
-		Returns the duration of all queued animations.
+		Returns the time in milliseconds until all queued animations are completed.
 		"""
-		time = 0
-		for item in self.active_animations.values():
-			if 'duration' in item:
-				time += item['duration']
-		for item in self.animation_queue:
-			time += item[1]
-		return time
+		return max(ticks_diff(self.__end_time, ticks_ms()), 0)
+
+	def sync_status(self, prop, value):
+		"""
+		Updates the projection after a property of the current status was written directly.
+		Properties that are still animated keep the value of their last keyframe.
+
+		:param prop: The property that was written.
+		:param value: The new value of the property.
+		"""
+		if self.__projected is None or self.__projected.get(prop) == value:
+			return
+		track = self.__tracks.get(prop)
+		if track is None or not track.live:
+			self.__project(prop, value)
+
+	def reset_projection(self):
+		"""
+		Drops the projected final status, e.g. after the current status was replaced as a whole.
+		"""
+		self.__projected = None
 	
 	def reset_queue(self):
 		"""
 		Resets the animation queue and active animations.
 		"""
-		self.animation_queue = []
-		self.active_animations = {}
+		for track in self.__live:
+			track.clear()
+		self.__live = []
+		self.__pending = 0
+		self.__projected = None
+		self.__end_time = self.time_animation_done
 
 	def is_animation_active(self):
 		"""
 		Returns True if an animation is active or queued, False otherwise.
 		"""
-		return len(self.active_animations) > 0 or len(self.animation_queue) > 0
+		return len(self.__live) > 0
+
+	def next_keyframe_in_ms(self):
+		"""
+		Returns 0 while a property is being interpolated, otherwise the number of milliseconds until the
+		next queued keyframe starts, or None if nothing is queued.
+		"""
+		current_time = ticks_ms()
+		next_keyframe = None
+		for track in self.__live:
+			if track.active >= 0:
+				return 0
+			if track.cursor < track.length:
+				wait = max(ticks_diff(track.start[track.cursor], current_time), 0)
+				if next_keyframe is None or wait < next_keyframe:
+					next_keyframe = wait
+		return next_keyframe
 
 	def trigger_animation(self, end_config, duration, timing_profile=Time_Profiles.linear, force=False):
 		"""
@@ -93,9 +332,65 @@ class StatusAnimator:
 		:param timing_profile: The timing function used to interpolate the animation.
 		"""
 		self.__update_time_animation_done()
+		start_time = ticks_ms() if force else self.time_animation_done
+		profile = profile_id(timing_profile)
 		for prop, value in end_config.items():
-			self.animation_queue.append(({prop: value}, duration, timing_profile, ticks_ms() if force else self.time_animation_done))
+			track = self.__track(prop)
+			index = track.insert(start_time, duration, value, profile)
+			self.__pending += 1
+			if index == track.length-1 and self.__projected is not None:
+				self.__project(prop, track.end_value[index])
 		self.time_animation_done += duration
+		self.__extend_end_time(start_time+duration)
+		self.__extend_end_time(self.time_animation_done)
+
+	def retarget(self, end_config, duration, timing_profile=Time_Profiles.linear, current_status=None):
+		"""
+		Animates properties to a new target from now on, dropping their active and queued keyframes instead of
+		queuing behind them. The animation starts from the value the property has when it is picked up.
+
+		:param end_config: The target configuration of the State at the end of the animation.
+		:param duration: The duration of the animation in milliseconds.
+		:param timing_profile: The timing function used to interpolate the animation.
+		:param current_status: The current status, properties that are not animated and already at their target are
+							   skipped. None to animate all.
+		:return: The number of keyframes queued.
+		"""
+		start_time = ticks_ms()
+		profile = profile_id(timing_profile)
+		queued = 0
+		for prop, value in end_config.items():
+			if self.__retarget(prop, value, duration, profile, start_time, current_status):
+				queued += 1
+		self.__reset_end_time(start_time)
+		return queued
+
+	def blend(self, plan, current_status):
+		"""
+		Retargets the properties of a Blend_Plan, see retarget(). Properties that are at their target, or are already
+		animating to it as their last keyframe, keep their animation.
+
+		:param plan: The Blend_Plan to animate to.
+		:param current_status: The current status of the State.
+		:return: The number of keyframes queued.
+		"""
+		start_time = ticks_ms()
+		queued = 0
+		for i in range(len(plan.props)):
+			if self.__retarget(plan.props[i], plan.values[i], plan.durations[i], plan.profiles[i], start_time, current_status):
+				queued += 1
+		self.__reset_end_time(start_time)
+		return queued
+
+	def keyframe_count(self):
+		"""
+		Returns the number of keyframes that are active or queued.
+		"""
+		count = 0
+		for track in self.__live:
+			count += track.length - (track.active if track.active >= 0 else track.cursor)
+		return count
+
 	def trigger_wait_animation(self, duration):
 		"""
 		Queues a wait period as an animation with the last configuration.
@@ -103,70 +398,136 @@ class StatusAnimator:
 		:param duration: The duration of the wait period in milliseconds.
 		"""
 		self.__update_time_animation_done()
-		if self.animation_queue:
+		if self.__pending > 0:
 			self.time_animation_done += duration
+			self.__extend_end_time(self.time_animation_done)
 
 	def animate_status(self, current_status):
 		"""
 		Updates the State configuration based on the current animation and time, allowing
 		for independent animation of each property.
+
+		Profiles with a lookup table are interpolated in fixed point, with a single multiply-add in floating point
+		per property. Other profiles, or all when EASING_LUTS is off, are called.
+
+		The returned dictionary is reused by the next call.
 		
 		:param current_status: The current configuration of the State.
 		:return: The updated configuration of the State.
 		"""
 		current_time = ticks_ms()
-
-		# Move animations from queue to active, per property
-		for end_config, duration, timing_profile, start_time in list(self.animation_queue):
-			if ticks_diff(current_time, start_time) >= 0:
-				for prop, value in end_config.items():
-					start_config = {prop: current_status.get(prop, 0)}
-					end_config = {prop: value}
-					end_time = start_time + duration
-
-					if prop not in self.active_animations.keys():
-						self.active_animations[prop] = {}
-
-					if end_config == self.active_animations[prop].get(end_config):
-						self.animation_queue.remove((end_config, duration, timing_profile, start_time))
-						continue
-					self.active_animations[prop] = {
-						'start_config': start_config,
-						'end_config': end_config,
-						'start_time': start_time,
-						'end_time': end_time,
-						'duration': duration,
-						'timing_profile': timing_profile
-					}
-					self.animation_queue.remove((end_config, duration, timing_profile, start_time))
-
-		new_status = {}
-		completed_animations = []
-
-		# Update active animations per property
-		for prop, animation in self.active_animations.items():
-			if animation:
-				elapsed_time = ticks_diff(current_time, animation['start_time'])
-				duration = animation['duration']
-				start_config = animation['start_config']
-				end_config = animation['end_config']
-				timing_profile = animation['timing_profile']
-
-				if ticks_diff(current_time, animation['end_time']) >= 0:
-					elapsed_time = duration
-					completed_animations.append((prop, animation))
-
-				start_value = start_config[prop]
-				end_value = end_config[prop]
-				interpolated_value = timing_profile(start_value, end_value, elapsed_time, duration)
-				new_status[prop] = interpolated_value
-
-		# Remove completed animations
-		for prop, animation in completed_animations:
-			self.active_animations.pop(prop)
+		new_status = self.__frame
+		new_status.clear()
+
+		live = self.__live
+		kept = 0
+		for i in range(len(live)):
+			track = live[i]
+			prop = track.prop
+
+			# Activate the keyframes that are due, the latest one wins
+			cursor = track.cursor
+			if cursor < track.length and ticks_diff(current_time, track.start[cursor]) >= 0:
+				while cursor < track.length and ticks_diff(current_time, track.start[cursor]) >= 0:
+					track.start_value[cursor] = current_status.get(prop, 0)
+					track.active = cursor
+					cursor += 1
+					self.__pending -= 1
+				track.cursor = cursor
+				track.step = (track.end_value[track.active]-track.start_value[track.active])/EASING_ONE
+
+			active = track.active
+			if active >= 0:
+				elapsed_time = ticks_diff(current_time, track.start[active])
+				duration = track.duration[active]
+				lut = _LUTS[track.profile[active]] if EASING_LUTS else None
+				if elapsed_time >= duration:
+					new_status[prop] = track.end_value[active]
+					track.active = -1
+				elif lut is not None:
+					position = (elapsed_time << (EASING_BITS+8)) // duration
+					entry = position >> 8
+					low = lut[entry]
+					new_status[prop] = track.start_value[active] + track.step*(low + (((lut[entry+1]-low)*(position & 0xFF)) >> 8))
+				else:
+					new_status[prop] = _PROFILES[track.profile[active]](track.start_value[active], track.end_value[active], elapsed_time, duration)
+
+			if track.active < 0 and cursor == track.length:
+				track.clear()
+			else:
+				live[kept] = track
+				kept += 1
+		del live[kept:]
 
 		return new_status
+
+	def __track(self, prop):
+		"""
+		Returns the track of a property and makes sure it is visited by the next frame.
+		"""
+		track = self.__tracks.get(prop)
+		if track is None:
+			track = _Track(prop)
+			self.__tracks[prop] = track
+		if not track.live:
+			track.live = True
+			self.__live.append(track)
+		return track
 	
+	def __project(self, prop, value):
+		"""
+		Writes a property of the projected final status, copying it first if it was handed out.
+		"""
+		if self.__projected_shared:
+			self.__projected = self.__projected.copy()
+			self.__projected_shared = False
+		self.__projected[prop] = value
+
+	def __retarget(self, prop, value, duration, profile, start_time, current_status):
+		"""
+		Replaces the keyframes of a property with a single one from start_time.
+
+		Returns:
+			bool: Whether a keyframe was queued.
+		"""
+		track = self.__tracks.get(prop)
+		if track is None or not track.live:
+			if current_status is not None and abs(current_status.get(prop, 0) - value) < BLEND_TOLERANCE:
+				return False
+			track = self.__track(prop)
+		else:
+			first = track.active if track.active >= 0 else track.cursor
+			if current_status is not None and track.length-first == 1 and abs(track.end_value[track.length-1] - value) < BLEND_TOLERANCE:
+				return False
+			self.__pending -= track.length - track.cursor
+			# The track stays in the live list
+			track.length = track.cursor = 0
+			track.active = -1
+		track.insert(start_time, duration, value, profile)
+		self.__pending += 1
+		if self.__projected is not None:
+			self.__project(prop, track.end_value[0])
+		return True
+
+	def __reset_end_time(self, current_time):
+		"""
+		Sets the end time and the time the next queued animation starts to the end of the last keyframe left, after
+		keyframes were dropped.
+		"""
+		end_time = current_time
+		for track in self.__live:
+			if track.length > 0:
+				last = track.length-1
+				track_end = ticks_add(track.start[last], track.duration[last])
+				if ticks_diff(track_end, end_time) > 0:
+					end_time = track_end
+		self.time_animation_done = end_time
+		self.__end_time = end_time
+
+	def __extend_end_time(self, end_time):
+		if ticks_diff(end_time, self.__end_time) > 0:
+			self.__end_time = end_time
+
 	def __update_time_animation_done(self):
 		"""
 		Updates the time of the last completed animation to the current time.
@@ -176,7 +537,8 @@ class StatusAnimator:
 
 class AnimationBank():
 	"""
-	A collection of static methods for triggering pre-defined facial animations.
+	A collection of static methods for triggering pre-defined facial animations. The routines are scripts, see
+	Scripts, which are compiled on first use.
 
 	Methods:
 		blink(State): Triggers a blink animation.
@@ -186,92 +548,47 @@ class AnimationBank():
 
 	@staticmethod
 	def blink(State):
-		saved_state = State.get_final_state(dont_lock=True)
-		State.trigger_animation({'eye_open': 0.0}, 200, Time_Profiles.ease_in, dont_lock=True)
-		State.trigger_animation({'eye_open': saved_state['eye_open']}, 200, Time_Profiles.ease_out, dont_lock=True)
+		run_script(State, 'blink')
 
 	@staticmethod
 	def wink(State, left_right:int=None):
-		if left_right is None:
-			left_right = random.choice([-1,1])
-
-		State.trigger_animation({'left_right': left_right}, 250, Time_Profiles.ease_in, dont_lock=True)
-		State.trigger_animation({'left_right': 0}, 250, Time_Profiles.ease_out, dont_lock=True)
+		run_script(State, 'wink', left_right=left_right)
 
 	@staticmethod
 	def shake_yes(State, amount=None):
-		saved_state = State.get_final_state(dont_lock=True)
-		if amount is None:
-			amount = random.randint(1,3)
-		for i in range(amount):
-			State.trigger_animation({'y': 140}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-			State.trigger_animation({'y': 100}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-		State.trigger_animation({'y': saved_state['y']}, 400, Time_Profiles.ease_out, dont_lock=True)
+		run_script(State, 'shake_yes', amount=amount)
 
 	@staticmethod
 	def shake_no(State, amount=None):
-		saved_state = State.get_final_state(dont_lock=True)
-		if amount is None:
-			amount = random.randint(1,3)
-		for i in range(amount):
-			State.trigger_animation({'x': 140}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-			State.trigger_animation({'x': 100}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-		State.trigger_animation({'x': saved_state['x']}, 400, Time_Profiles.ease_out, dont_lock=True)
+		run_script(State, 'shake_no', amount=amount)
 		
 	@staticmethod
 	def dancing(State, amount=None):
-		saved_state = State.get_final_state(dont_lock=True)
-		if amount is None:
-			amount = random.randint(2,5)
-		for i in range(amount):
-			State.trigger_animation({'x': 140, 'y': 100, 'value': saved_state['value']*0.4}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-			State.trigger_animation({'x': 120, 'y': 140, 'value': saved_state['value']}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-			State.trigger_animation({'x': 100, 'y': 100, 'value': saved_state['value']*0.4}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-			State.trigger_animation({'x': 120, 'y': 140, 'value': saved_state['value']}, 400, Time_Profiles.ease_in_out, dont_lock=True)
-		State.trigger_animation({'x': saved_state['x'], 'y': saved_state['y'], 'value': saved_state['value']}, 600, Time_Profiles.ease_out, dont_lock=True)
+		run_script(State, 'dancing', amount=amount)
 
 	@staticmethod
 	def kiss(State):
-		saved_state = State.get_final_state(dont_lock=True)
-		heart = Heart((saved_state['x'], saved_state['y']+45, pi/4))
-		heart.scale(0.75)
-		State.queue_particle(heart, State.get_final_time()+200, dont_lock=True)
-		State.trigger_animation({'mouth_width': 10}, 200, Time_Profiles.ease_in_out, dont_lock=True)
-		State.trigger_animation({'mouth_width': saved_state['mouth_width']}, 200, Time_Profiles.ease_in_out, dont_lock=True)
+		run_script(State, 'kiss')
 
 	@staticmethod
-	def eye_brows_raise(State, amount=2):
-		saved_state = State.get_final_state(dont_lock=True)
-		for i in range(amount):
-			State.trigger_animation({'eye_open': 1.0, 'eyebrow_angle': 0.0}, 200, Time_Profiles.ease_in, dont_lock=True)
-			State.trigger_animation({'eye_open': saved_state['eye_open'], 'eyebrow_angle': saved_state['eyebrow_angle']}, 200, Time_Profiles.ease_out, dont_lock=True)
+	def eye_brows_raise(State, amount=None):
+		run_script(State, 'eye_brows_raise', amount=amount)
 
 	@staticmethod
 	def yawn(State):
-		saved_state = State.get_final_state(dont_lock=True)
-		State.trigger_animation({'mouth_width': 0, 'yawn': 0.8, 'eye_open': 0.2, 'under_eye_lid': 0.5}, 1200, Time_Profiles.ease_in, dont_lock=True)
-		State.trigger_animation({'mouth_width': 0, 'yawn': 1, 'eye_open': 0.1, 'under_eye_lid': 0.7}, 800, Time_Profiles.ease_out, dont_lock=True)
-		State.trigger_animation({'mouth_width': saved_state['mouth_width'], 'yawn': 0, 'eye_open': saved_state['eye_open'], 'under_eye_lid': saved_state['under_eye_lid']}, 800, Time_Profiles.ease_in_out, dont_lock=True)
+		run_script(State, 'yawn')
 
 	@staticmethod
 	def falling_asleep(State, amount = None):
-		saved_state = State.get_final_state(dont_lock=True)
-		if saved_state['eye_open']<0.4:
-			pass
-		if amount is None:
-			amount = random.randint(1,3)
-		for i in range(amount):
-			State.trigger_animation({'eye_open': random.randint(0,4)//10, 'y': saved_state['y']+20,"value": min(0.1, saved_state['value'])}, random.randint(1500,3000), Time_Profiles.ease_in)
-			State.trigger_animation({'eye_open': saved_state['eye_open'], 'y': saved_state['y'], "value": saved_state['value']}, 100, Time_Profiles.ease_out)
-			if (i+1) < amount:
-				State.trigger_wait_animation(random.randint(500, 1500))
+		run_script(State, 'falling_asleep', amount=amount)
 
 	@staticmethod
 	def wake_up_fall_asleep(State):
-		saved_state = State.get_final_state(dont_lock=True)
-		State.trigger_animation({'eye_open': 1, 'y': saved_state['y']-20}, 200, Time_Profiles.ease_in, dont_lock=True)
-		State.trigger_wait_animation(1000, dont_lock=True)
-		State.trigger_animation({'eye_open': 0.1, 'y': saved_state['y']}, 2000, Time_Profiles.ease_in, dont_lock=True)
+		run_script(State, 'wake_up_fall_asleep')
+
+	@staticmethod
+	def crying(State, tear_y):
+		run_script(State, 'crying', tear_y=tear_y)
 
 class Trigger:
 	"""
@@ -294,6 +611,12 @@ class Trigger:
 		self.change_function = change_function
 		self.__trigger_time = time()
 
+	def reset(self):
+		"""
+		Restarts the time since the trigger was last executed, e.g. when its emotion is entered again.
+		"""
+		self.__trigger_time = time()
+
 	def check_trigger(self):
 		"""
 		Checks if the trigger should be executed based on the change function.
@@ -322,6 +645,8 @@ class Trigger:
 		return random.random() < self.change_function(time()-self.__trigger_time+0.001)
 
 
+TIRED_CHOICES = Choices({'yawn': 0.5, 'falling_asleep': 0.5})
+
 class Emotion:
 	"""
 	A base class for managing different emotional states and their associated triggers.
@@ -332,8 +657,12 @@ class Emotion:
 		tired_value (int): A value representing the tiredness aspect of the emotion.
 		name (str): The name of the emotion.
 		triggers (dict): A dictionary of triggers associated with the emotion.
+		FACE (dict): The standard face of the emotion, None for no standard face.
+		COLOUR (dict): The colour of the lamp and position of the face the emotion is entered with.
 
 	Methods:
+		enter(): Blends the face and lamp into the emotion.
+		plan(): Returns the Blend_Plan of the emotion.
 		update_parameters(): Updates the parameters for the emotion's triggers.
 		check_triggers(): Checks and executes triggers based on their change functions.
 		trigger_blink(): Triggers a blink animation.
@@ -341,6 +670,11 @@ class Emotion:
 		trigger_background(): Triggers a background animation.
 	"""
 
+	FACE = None
+	COLOUR = {}
+	FACE_TIME = 3000
+	COLOUR_TIME = 2000
+
 	def __init__(self, State, social_value=50, tired_value=50):
 		self.social_value = social_value
 		self.tired_value = tired_value
@@ -368,6 +702,30 @@ class Emotion:
 		if hasattr(self, f'_update_parameters') and callable(getattr(self, f'_update_parameters')):
 			getattr(self, f'_update_parameters')()
 
+	def plan(self):
+		"""
+		Returns the Blend_Plan from any status to the standard face and colour of the emotion, compiled on first use.
+		"""
+		plan = _PLANS.get(self.name)
+		if plan is None:
+			plan = Blend_Plan(((self.FACE or {}, self.FACE_TIME, Time_Profiles.ease_in_out),
+							   (self.COLOUR, self.COLOUR_TIME, Time_Profiles.ease_in_out)))
+			_PLANS[self.name] = plan
+		return plan
+
+	def enter(self):
+		"""
+		Blends the face and lamp into the emotion, replacing the animations of the same properties that are still
+		running or queued, and restarts the triggers.
+		"""
+		for trigger in self.triggers.values():
+			trigger.reset()
+		self.State.blend_animation(self.plan())
+
+	def _standard_face(self, force=False):
+		if self.FACE is not None:
+			self.State.trigger_animation(self.FACE, self.FACE_TIME, Time_Profiles.ease_in_out, force=force)
+
 	def trigger_standard_face(self):
 		if hasattr(self.State.Emotion.emotion, f'_standard_face') and callable(getattr(self.State.Emotion.emotion, f'_standard_face')):
 			print(f"TESSTTTTT")
@@ -391,7 +749,7 @@ class Emotion:
 		Triggers a face move animation.
 		"""
 		tired_addition = int(1000 * (1 / (1 + exp(-0.1 * (self.tired_value - 80)))))
-		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(100, 140)}, random.randint(500+tired_addition, 1500+tired_addition) + tired_addition, Time_Profiles.ease_in_out, dont_lock=True)
+		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(100, 140)}, random.randint(500+tired_addition, 1500+tired_addition) + tired_addition, Time_Profiles.ease_in_out)
 	
 	def trigger_background(self):
 		"""
@@ -410,258 +768,14 @@ class Emotion:
 		elif (self.tired_value < 0.8):
 			AnimationBank.yawn(self.State)
 		else:
-			Options = {'yawn': 0.5, 'falling_asleep': 0.5}
-			choice = weighted_choice(list(Options.keys()), weights=Options.values())
+			choice = TIRED_CHOICES.pick()
 			if choice == 'yawn':
 				AnimationBank.yawn(self.State)
 			elif choice == 'falling_asleep':
 				AnimationBank.falling_asleep(self.State)
 
 
-class Happy(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "happy"
-		
-		self._standard_face(force=True)
-		self.State.trigger_animation({"y": 120,"hue": 50, "saturation": 1, "value": 1}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 1, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.0, 
-								'smile': 1, 'smirk': 0, 'cheeks': 0, 'mouth_width': 40, 'yawn': 0}, 
-								3000, Time_Profiles.ease_in_out, force=force)
-
-	def _trigger_background(self):
-		if self.tired_value < 0.8:
-			Options = {'wink': 0.4, 'shake_yes': 0.4, 'dance': 0.2}
-		else:
-			Options = {'wink': 0.75, 'shake_yes': 0.25}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-		print(f"Happy background animation: {choice}")
-		if choice == 'wink':
-			AnimationBank.wink(self.State)
-		elif choice == 'shake_yes':
-			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
-		elif choice == 'dance':
-			AnimationBank.dancing(self.State, amount=random.randint(2,5))
-		
-
-class Angry(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "angry"
-
-		self._standard_face(force=True)
-		self.State.trigger_animation({"hue": 0, "saturation": 1, "value": 1}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 0.8, 'eyebrow_angle': 1.0, 'under_eye_lid': 0.3, 
-								'cheeks' : 0, 'smile': -1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0,}, 
-								3000, Time_Profiles.ease_in_out, force=force)
-
-	def _trigger_face_move(self):
-		tired_addition = int(1000 * (1 / (1 + exp(-0.1 * (self.tired_value - 80)))))
-		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(100, 130)}, random.randint(500+tired_addition,1000+tired_addition), Time_Profiles.ease_in_out, dont_lock=True)
-
-	def _trigger_background(self):
-		Options = {'shake_no': 1}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-
-		if choice == 'shake_no':
-			saved_state = self.State.get_final_state(dont_lock=True)
-			for i in range(random.randint(1,2)):
-				self.State.trigger_animation({'x': 140}, 100, Time_Profiles.ease_in_out, dont_lock=True)
-				self.State.trigger_wait_animation(200, dont_lock=True)
-				self.State.trigger_animation({'x': 100}, 100, Time_Profiles.ease_in_out, dont_lock=True)
-			self.State.trigger_animation({'x': saved_state['x']}, 200, Time_Profiles.ease_out, dont_lock=True)
-
-class Sad(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "sad"
-
-		self.update_parameters()
-		self._standard_face(force=True)
-		self.State.trigger_animation({"y": 140,"hue": 240, "saturation": 1, "value": 1}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 0.65, 'eyebrow_angle': -1.0, 'under_eye_lid': 0.0, 
-								'cheeks' : 0, 'smile': -1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0}, 
-								3000, Time_Profiles.ease_in_out, force=force)
-
-	def _update_parameters(self):
-		self.triggers['background'].change_function = lambda t: 1e-2*t**2
-
-	def _trigger_face_move(self):
-		tired_addition = int(1000 * (1 / (1 + exp(-0.1 * (self.tired_value - 80)))))
-		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(125, 150)}, random.randint(500+tired_addition,1500+tired_addition), Time_Profiles.ease_in_out, dont_lock=True)
-
-	def _trigger_background(self):
-		Options = {'shake_no': 0.25, 'tear': 0.5, 'crying': 0.25}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-
-		if choice == 'shake_no':
-			AnimationBank.shake_no(self.State, amount=random.randint(2,4))
-		elif choice == 'tear':
-			status = self.State.get_current_state(dont_lock=True)
-			under_y = self.State.face.eye_height-status['under_eye_lid']*self.State.face.eye_height/2+status['y']-65
-
-			tear = Tear((status['x']+45*random.choice([-1, 1]), under_y+5, pi/2))
-			tear.scale(0.75)
-			self.State.spawn_particle(tear, dont_lock=True)
-		elif choice == 'crying':
-			status = self.State.get_current_state(dont_lock=True)
-			under_y = self.State.face.eye_height-status['under_eye_lid']*self.State.face.eye_height/2+status['y']-65
-
-			self.State.trigger_animation({'y': 140}, 250, Time_Profiles.ease_in_out, force=True,  dont_lock=True)
-			for i in range(0, random.randint(3, 6)):
-				self.State.trigger_animation({'y': 120}, 500, Time_Profiles.ease_in_out, dont_lock=True)
-				self.State.trigger_animation({'y': 140}, 250, Time_Profiles.ease_in_out, dont_lock=True)
-
-				for side in [-1, 1]:
-					tear = Tear((status['x']+45*side, under_y+5, pi/2))
-					tear.scale(0.75)
-					self.State.queue_particle(tear, 750*i, dont_lock=True)
-				
-			self.State.trigger_animation({'y': status['y']}, 200, Time_Profiles.ease_out, dont_lock=True)
-			for side in [-1, 1]:
-					tear = Tear((status['x']+45*side, under_y+5, pi/2))
-					tear.scale(0.75)
-					self.State.queue_particle(tear, 750*(i+1), dont_lock=True)
-
-class Okay(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "okay"
-
-		self._standard_face(force=True)
-		self.State.trigger_animation({"hue": 120, "saturation": 1, "value": 0}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 1, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.4, 
-								'smile': 0,'cheeks' : 0, 'smirk': 0, 'mouth_width': 55, 'yawn': 0}, 
-								3000, Time_Profiles.ease_in_out, force=force)
-
-class Horny(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "horny"
-
-		self._standard_face()
-		self.State.trigger_animation({"hue": 275, "saturation": 1, "value": 1}, 2000, Time_Profiles.ease_in_out, force=True)
-		
-	def _standard_face(self):
-		self.State.trigger_animation({'eye_open': 0.7, 'eyebrow_angle': 0.3, 'under_eye_lid': 0.2, 
-									'smile': 1, 'smirk': random.choice([-1,1]), 'cheeks' : 0, 'mouth_width': 60}, 
-									3000, Time_Profiles.ease_in_out, force=True)
-
-	def _trigger_background(self):
-		Options = {'wink': 0.2, 'shake_yes': 0.05, 'dance': 0.05, 'eye_brows_raise': 0.3, 'fast_blinking': 0.2, 'kiss': 0.2}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-		print(f"Happy background animation: {choice}")
-		if choice == 'wink':
-			AnimationBank.wink(self.State)
-		elif choice == 'shake_yes':
-			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
-		elif choice == 'dance':
-			AnimationBank.dancing(self.State, amount=random.randint(2,5))
-		elif choice == 'eye_brows_raise':
-			AnimationBank.eye_brows_raise(self.State, amount=random.randint(2,5))
-		elif choice == 'fast_blinking':
-			for i in range(random.randint(4, 6)):
-				AnimationBank.blink(self.State)
-		elif choice == 'kiss':
-			AnimationBank.kiss(self.State)
-
-class Love(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "love"
-
-		self._standard_face(force=True)
-		self.State.trigger_animation({"hue": 300, "saturation": 1, "value": 1}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 1.0, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.5, 
-								'smile': 1, 'cheeks' : 1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0, }, 3000, Time_Profiles.ease_in_out, force=force)
-
-	def _trigger_background(self):
-		Options = {'fast_blinking': 0.2, 'wink': 0.2, 'kiss': 0.25, 'shake_yes': 0.1, 'dance': 0.1, 'hearts_flying': 0.25}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-
-		print(f"Happy background animation: {choice}")
-		if choice == 'wink':
-			AnimationBank.wink(self.State)
-		elif choice == 'fast_blinking':
-			for i in range(random.randint(4, 6)):
-				AnimationBank.blink(self.State)
-		elif choice == 'kiss':
-			AnimationBank.kiss(self.State)
-		elif choice == "shake_yes":
-			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
-		elif choice == "dance":
-			AnimationBank.dancing(self.State, amount=random.randint(2,5))
-		elif choice == 'hearts_flying':
-			for i in range(random.randint(10, 50)):
-				heart = Heart((random.randint(60, 180), random.randint(40, 80), random.uniform(-3*pi/4, -pi/4)))
-				heart.scale(0.45)
-				self.State.queue_particle(heart, (i**1.4)*100, dont_lock=True)
-				del heart
-		
-class Sleeping(Emotion):
-	def __init__(self, State, social_value=50, tired_value=50):
-		super().__init__(State, social_value, tired_value)
-		self.name = "sleeping"
-
-		self._standard_face(force=True)
-		self.State.trigger_animation({'x': 120, "y": 150,"hue": 0, "saturation": 0, "value": 0}, 2000, Time_Profiles.ease_in_out, force=True)
-
-	def _standard_face(self, force=False):
-		self.State.trigger_animation({'eye_open': 0.15, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.1, 
-								'smile': 0,'cheeks' : 0, 'smirk': 0, 'mouth_width': 40, 'yawn': 0}, 3000, Time_Profiles.ease_in_out, force=force)
-		
-	def _update_parameters(self):
-		self.triggers['blink'].change_function = lambda t: 0
-		self.triggers['face_move'].change_function = lambda t: 0.1
-		self.triggers['tired'].change_function = lambda t:  0
-
-	def _trigger_face_move(self):
-		self.State.trigger_animation({'x': 120, 'y': random.randint(110,130)}, random.randint(4000,6000), Time_Profiles.ease_in_out, dont_lock=True)
-		self.State.trigger_animation({'y': 150}, random.randint(4000,6000), Time_Profiles.ease_in_out, dont_lock=True)
-
-	def _trigger_background(self):
-		Options = {'wake_up_fall_asleep': 0.2, 'Z_particles': 0.6, 'look_around': 0.1, 'drooling': 0.1}
-		choice = weighted_choice(list(Options.keys()), weights=Options.values())
-
-		if choice == 'wake_up_fall_asleep':
-			AnimationBank.wake_up_fall_asleep(self.State)
-		if choice == 'Z_particles':
-			for i in range(random.randint(6,10)):
-				saved_state = self.State.get_current_state(dont_lock=True)
-				Z_particle = Z((saved_state['x']+45, saved_state['y']+20, -pi/4))
-				Z_particle.scale(random.randint(20, 40)/100)
-				self.State.queue_particle(Z_particle, (i**1.6)*500, dont_lock=True)
-				del Z_particle
-		if choice == 'look_around':
-			side = random.choice([-1, 1])
-			saved_state = self.State.get_current_state(dont_lock=True)
-			self.State.trigger_animation({'eye_open': 0.4}, 1000, Time_Profiles.ease_in_out, dont_lock=True)
-			self.State.trigger_animation({'x': 120+side*random.randint(20,40), 'y': saved_state['y']-random.randint(20,30)}, 2000, Time_Profiles.ease_in_out, dont_lock=True)
-			self.State.trigger_wait_animation(random.randint(800,1500), dont_lock=True)
-			self.State.trigger_animation({'x': saved_state['x'], 'y': saved_state['y'], 'eye_open':saved_state['eye_open']}, 2000, Time_Profiles.ease_in_out, dont_lock=True)
-		if choice == 'drooling':
-			side = random.choice([-1, 1])
-			saved_state = self.State.get_current_state(dont_lock=True)
-			tear = Tear((saved_state['x']+(saved_state['mouth_width']//4)*side, saved_state['y']+50, pi/2))
-			tear.scale(0.5)
-			tear.velocities = (lambda t: 1/3000*(t)**3, lambda t: sin(t*4+random.choice([0, pi])))
-			self.State.trigger_wait_animation(self.State.get_final_time()+200)
-			self.State.queue_particle(tear, 0, dont_lock=True)
-			self.State.trigger_wait_animation(2000)
-
 class start_up(Emotion):
 	def __init__(self, State, social_value=50, tired_value=50):
 		super().__init__(State, social_value, tired_value)
 		self.name = "start_up"
-
-EMOTIONS = {'happy': Happy, 'angry': Angry, 'sad': Sad, 'okay': Okay, 'love': Love, 'horny': Horny, 'sleeping': Sleeping}
\ No newline at end of file
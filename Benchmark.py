@@ -0,0 +1,1044 @@
+"""
+Benchmarks and self-checks for the animation and render code.
+
+The benchmarks only use MicroPython APIs, so they run on the board (e.g. `mpremote run Benchmark.py`)
+as well as on a host, where the Simulator provides those modules with a clock running at real time.
+
+animation_suite() drives every emotion and AnimationBank routine and can be kept as a JSON baseline to compare
+later versions against:
+
+	python Benchmark.py suite --save
+	python Benchmark.py suite --threshold 0.2
+
+startup_imports() measures the imports of the boot and has to run in a fresh interpreter:
+
+	python Benchmark.py startup
+"""
+import sys
+if sys.implementation.name != 'micropython':
+	import Simulator
+	Simulator.install(speed=1)
+
+from utime import ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_ms
+import random
+import json
+from array import array
+
+SUITE_EMOTIONS = ('happy', 'angry', 'sad', 'okay', 'love', 'horny', 'sleeping')
+SUITE_ROUTINES = ('blink', 'wink', 'shake_yes', 'shake_no', 'dancing', 'kiss', 'eye_brows_raise', 'yawn',
+				  'falling_asleep', 'wake_up_fall_asleep')
+BASELINE_FILE = 'benchmark_baseline.json'
+REGRESSION_METRICS = ('animate_us', 'draw_us', 'pixels_pushed', 'heap_peak')
+# The modules main_system loads at boot, in the order they are first imported, and those it only loads when needed
+BOOT_MODULES = ('Locker', 'Trace', 'Timers', 'Particle', 'Screen', 'Animation', 'Journal', 'Http', 'State', 'Webserver',
+				'main_system')
+ON_DEMAND_MODULES = ('Emotions', 'Local_Server')
+
+# The bytes a frame of the render path may allocate per platform, see render_allocations(), set from a measured run
+# with 7% headroom. The board has no budget until one is measured there.
+FRAME_ALLOCATION_BUDGET = {'cpython': 900}
+
+ANIMATED_PROPERTIES = ('x', 'y', 'eye_open', 'eyebrow_angle', 'under_eye_lid', 'left_right', 'mouth_width',
+					'smile', 'smirk', 'cheeks', 'yawn', 'hue', 'saturation', 'value')
+
+def _status():
+	return {'x': 120, 'y': 120, 'eye_open': 0.1, 'eyebrow_angle': 0, 'under_eye_lid': 0.4, 'left_right': 0,
+			'mouth_width': 40, 'mouth_y': 0, 'smile': 0, 'cheeks': 0, 'smirk': 0, 'yawn': 0,
+			'hue': 0, 'saturation': 1, 'value': 0}
+
+def animator_queue_depth(depths=(1, 10, 50, 100, 200), frames=200):
+	"""
+	Measures the cost of a StatusAnimator frame versus the number of queued keyframes.
+
+	Returns:
+		dict: The average frame time in microseconds per queue depth.
+	"""
+	from Animation import StatusAnimator
+	from TimeProfiles import Time_Profiles
+
+	results = {}
+	for depth in depths:
+		random.seed(depth)
+		animator = StatusAnimator()
+		status = _status()
+		for i in range(depth):
+			animator.trigger_animation({ANIMATED_PROPERTIES[i % len(ANIMATED_PROPERTIES)]: random.uniform(0, 1)},
+							  random.randint(100, 400), Time_Profiles.ease_in_out, force=i < 3)
+
+		t_start = ticks_us()
+		for i in range(frames):
+			status.update(animator.animate_status(status))
+		results[depth] = ticks_diff(ticks_us(), t_start)/frames
+		print(f"Queue depth {depth}: {results[depth]:.1f} us/frame")
+	return results
+
+def easing_cost(properties=14, frames=2000):
+	"""
+	Measures the cost of a StatusAnimator frame with properties interpolated at once, with the easing lookup tables
+	and with the timing profile functions called, and the largest difference between the frames and the functions.
+	The frames are 1 ms apart; on a host on a stepped clock without heap tracing, with the calls timed in real time
+	with ticks_cpu. Heap tracing is restarted afterwards, so on a host gc.mem_alloc() is not comparable across it.
+
+	Returns:
+		dict: The average frame time in microseconds for 'functions' and 'luts', and the 'max_error' of the tables
+			  for properties animated over a range of 200.
+	"""
+	import Animation
+	from Animation import StatusAnimator
+	from TimeProfiles import Time_Profiles
+	profiles = (Time_Profiles.linear, Time_Profiles.ease_in, Time_Profiles.ease_out, Time_Profiles.ease_in_out)
+
+	host = sys.implementation.name != 'micropython'
+	timer = ticks_us
+	if host:
+		Simulator.install(heap=False)
+		from utime import ticks_cpu as timer
+	results = {'max_error': 0}
+	try:
+		for mode in ('functions', 'luts'):
+			Animation.EASING_LUTS = mode == 'luts'
+			animator = StatusAnimator()
+			status = _status()
+			props = ANIMATED_PROPERTIES[:properties]
+			for i in range(properties):
+				animator.trigger_animation({props[i]: status[props[i]]+200}, frames+1000, profiles[i % len(profiles)], force=True)
+			t_start = ticks_ms()
+			total = 0
+			for frame in range(frames):
+				t_frame = timer()
+				new_status = animator.animate_status(status)
+				total += ticks_diff(timer(), t_frame)
+				elapsed = ticks_diff(ticks_ms(), t_start)
+				for i in range(properties):
+					start = status[props[i]]
+					error = abs(new_status[props[i]]-profiles[i % len(profiles)](start, start+200, elapsed, frames+1000))
+					results['max_error'] = max(results['max_error'], error)
+				sleep_ms(1)
+			results[mode] = total/frames
+	finally:
+		Animation.EASING_LUTS = True
+		if host:
+			Simulator.install(speed=1)
+	print(f"Easing {properties} properties: {results['functions']:.1f} us/frame with functions, "
+		  f"{results['luts']:.1f} us/frame with tables, max error {results['max_error']:.4f} of 200")
+	return results
+
+def animator_projection_consistency(seed=0, steps=2000, tolerance_ms=2):
+	"""
+	Checks the projected final status and end time of the StatusAnimator against a full recompute over a
+	randomized sequence of triggers, waits, frames, direct writes and resets.
+
+	Returns:
+		int: The number of mismatches found.
+	"""
+	from Animation import StatusAnimator
+	from TimeProfiles import Time_Profiles
+	profiles = (Time_Profiles.linear, Time_Profiles.ease_in, Time_Profiles.ease_out, Time_Profiles.ease_in_out)
+
+	random.seed(seed)
+	animator = StatusAnimator()
+	status = _status()
+	end_time = animator.time_animation_done
+	mismatches = 0
+	for step in range(steps):
+		action = random.random()
+		if action < 0.4:
+			end_config = {}
+			for i in range(random.randint(1, 3)):
+				end_config[random.choice(ANIMATED_PROPERTIES)] = random.uniform(-1, 1)
+			duration = random.randint(0, 500)
+			force = random.random() < 0.2
+			if force and ticks_diff(ticks_ms()+duration, end_time) > 0:
+				end_time = ticks_ms()+duration
+			animator.trigger_animation(end_config, duration, random.choice(profiles), force=force)
+		elif action < 0.5:
+			animator.trigger_wait_animation(random.randint(0, 500))
+		elif action < 0.9:
+			sleep_ms(random.randint(0, 50))
+			status.update(animator.animate_status(status))
+		elif action < 0.98:
+			prop = random.choice(ANIMATED_PROPERTIES)
+			status[prop] = random.uniform(-1, 1)
+			animator.sync_status(prop, status[prop])
+		else:
+			animator.reset_queue()
+			end_time = animator.time_animation_done
+		if ticks_diff(animator.time_animation_done, end_time) > 0:
+			end_time = animator.time_animation_done
+
+		projected = animator.get_final_status(status)
+		if projected != animator.compute_final_status(status):
+			print(f"Step {step}: projected status {projected} differs from {animator.compute_final_status(status)}")
+			mismatches += 1
+		expected_time = max(ticks_diff(end_time, ticks_ms()), 0)
+		if abs(animator.get_final_time()-expected_time) > tolerance_ms:
+			print(f"Step {step}: projected end time {animator.get_final_time()} differs from {expected_time}")
+			mismatches += 1
+	print(f"Projection consistency: {mismatches} mismatches in {steps} steps")
+	return mismatches
+
+def particle_idle_spawn(idle_ms=10000, frame_time=33):
+	"""
+	Checks that a particle spawned after the particles were not advanced for a while only moves by one frame on its
+	first advance, as the render loop stops drawing while nothing animates.
+	On a host this runs on a stepped virtual clock.
+
+	Returns:
+		float: The distance in pixels the particle moved in its first frame.
+	"""
+	from math import pi, sqrt
+	from Particle import ParticleSystem, Heart
+
+	host = sys.implementation.name != 'micropython'
+	if host:
+		Simulator.install(heap=False)
+	try:
+		particles = ParticleSystem()
+		particles.advance()
+		sleep_ms(idle_ms)
+		particles.spawn(Heart, (120, 60, -pi/2))
+		sleep_ms(frame_time)
+		particles.advance()
+		moved = sqrt((particles.x[0]-120)**2 + (particles.y[0]-60)**2)
+	finally:
+		if host:
+			Simulator.install(speed=1)
+	limit = 2*Heart.speed*frame_time/1000
+	print(f"Particle spawned after {idle_ms} ms idle moved {moved:.1f} px in its first frame, limit {limit:.1f} px")
+	if moved > limit:
+		raise AssertionError(f"Particle moved {moved:.1f} px in its first frame after an idle gap")
+	return moved
+
+def screen_pixels(scenarios=('idle', 'blink', 'dancing'), frames=150, frame_time=20):
+	"""
+	Counts the pixels pushed to the display per frame while running face scenarios.
+
+	Returns:
+		dict: Per scenario the frames drawn, the average and the maximum pixels pushed per frame.
+	"""
+	import machine
+	from Light import Lights
+	from State import State
+	from Animation import AnimationBank
+
+	state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+	results = {}
+	for scenario in scenarios:
+		random.seed(0)
+		state.reset_animation()
+		state.draw_state(state.get_current_state().copy())
+		if scenario == 'blink':
+			AnimationBank.blink(state)
+		elif scenario == 'dancing':
+			AnimationBank.dancing(state, amount=2)
+
+		pushed = []
+		for i in range(frames):
+			state.face.pixels_pushed = 0
+			state.draw_state()
+			pushed.append(state.face.pixels_pushed)
+			sleep_ms(frame_time)
+		results[scenario] = {'frames': frames, 'average': sum(pushed)/frames, 'max': max(pushed)}
+		print(f"Screen {scenario}: {results[scenario]['average']:.0f} pixels/frame (max {results[scenario]['max']})")
+	print(f"Geometry cache: {state.face.geometry_stats()}")
+	return results
+
+def http_keep_alive(requests=200, rtt_ms=0):
+	"""
+	Measures requests per second and latency against a local Fake_Server, with the connection kept alive
+	between requests and with a new connection per request. A third run drops the connection every few
+	requests to check that a kept-alive connection reconnects transparently.
+
+	Returns:
+		dict: Per mode the requests per second, the average and 95th percentile latency in milliseconds,
+			  the connects and the failed requests.
+	"""
+	from Http import HttpConnection, loads
+	from Fake_Server import Fake_Server
+
+	body = json.dumps({'user_id': 1, 'version': -1})
+	headers = {'Content-Type': 'application/json'}
+	results = {}
+	for mode in ('reuse', 'no reuse', 'reuse with resets'):
+		server = Fake_Server(rtt_ms=rtt_ms, max_requests=7 if mode == 'reuse with resets' else None)
+		connection = HttpConnection('127.0.0.1', server.port)
+		latencies = []
+		failed = 0
+		t_start = ticks_us()
+		for i in range(requests):
+			t_request = ticks_us()
+			try:
+				status_code, reply_headers, reply = connection.request("POST", "/api/v1/all/maja/get", body, headers)
+				if status_code != 200 or not loads(reply)['success']:
+					failed += 1
+			except Exception as e:
+				print(f"Request {i} failed: {e}")
+				failed += 1
+			if mode == 'no reuse':
+				connection.close()
+			latencies.append(ticks_diff(ticks_us(), t_request)/1000)
+		total = ticks_diff(ticks_us(), t_start)/1000000
+		connection.close()
+		server.stop()
+
+		latencies.sort()
+		results[mode] = {'requests_per_second': requests/total, 'average_ms': sum(latencies)/requests,
+						 'p95_ms': latencies[int(0.95*(requests-1))], 'connects': connection.stats['connects'], 'failed': failed}
+		print(f"HTTP {mode}: {results[mode]['requests_per_second']:.0f} requests/s, {results[mode]['average_ms']:.2f} ms average, "
+			  f"{results[mode]['p95_ms']:.2f} ms p95, {results[mode]['connects']} connects, {failed} failed")
+	return results
+
+def _concatenating_request(port, request):
+	"""
+	The response reader Webserver used before HttpConnection, kept as a baseline for http_allocations().
+	"""
+	import socket
+	sock = socket.socket()
+	sock.connect(socket.getaddrinfo('127.0.0.1', port)[0][-1])
+	sock.send(request)
+	response = b""
+	while True:
+		chunk = sock.recv(1024)
+		if not chunk:
+			break
+		response += chunk
+	sock.close()
+	headers, body = response.decode().split("\r\n\r\n", 1)
+	return json.loads(body)
+
+def http_allocations(payload_sizes=(0, 2000, 8000), requests=20):
+	"""
+	Measures the heap allocated per request while fetching all/maja from a local Fake_Server, for the
+	concatenating reader that Webserver used before and for HttpConnection. The mood data of the server is
+	padded to each payload size. The numbers include the allocations of the stand-in server thread, which are
+	the same for both readers, and of the decoded JSON.
+
+	Returns:
+		dict: Per payload size the bytes allocated per request by each reader.
+	"""
+	import gc
+	from Http import HttpConnection, loads
+	from Fake_Server import Fake_Server
+
+	body = json.dumps({'user_id': 1, 'version': -1})
+	results = {}
+	for size in payload_sizes:
+		server = Fake_Server()
+		user = 3
+		while len(json.dumps(server.data['mood_data'])) < size:
+			server.data['mood_data'][str(user)] = {'mood': 'okay', 'social_value': 0.5, 'tired_value': 0.5}
+			user += 1
+		request = (f"POST /api/v1/all/maja/get HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+				   f"Connection: close\r\n\r\n{body}").encode()
+		connection = HttpConnection('127.0.0.1', server.port)
+		loads(connection.request("POST", "/api/v1/all/maja/get", body)[2])
+
+		results[size] = {}
+		for reader in ('concatenating', 'streaming'):
+			gc.collect()
+			gc.disable()
+			before = gc.mem_alloc()
+			for i in range(requests):
+				if reader == 'concatenating':
+					reply = _concatenating_request(server.port, request)
+				else:
+					reply = loads(connection.request("POST", "/api/v1/all/maja/get", body)[2])
+				del reply
+			results[size][reader] = (gc.mem_alloc()-before)/requests
+			gc.enable()
+		connection.close()
+		server.stop()
+		print(f"HTTP allocations with {size} bytes of mood data: {results[size]['concatenating']:.0f} bytes/request concatenating, "
+			  f"{results[size]['streaming']:.0f} bytes/request streaming")
+	return results
+
+def sync_idle_polling(polls=600):
+	"""
+	Measures the bytes transferred and the CPU time of StateSync.get while the state on a local Fake_Server does
+	not change, scaled to an hour of polling at 1 Hz. The modes are the full reply on every poll, a backend without
+	ETags where the reply is revisioned on a digest, and a backend answering 304 Not Modified.
+
+	Returns:
+		dict: Per mode the bytes transferred and the CPU time in milliseconds per hour.
+	"""
+	import machine
+	from Light import Lights
+	from State import State, StateSync
+	from Webserver import Webserver
+	from Fake_Server import Fake_Server
+
+	state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+	results = {}
+	for mode in ('full', 'digest', 'etag'):
+		server = Fake_Server(etag=mode == 'etag')
+		webserver = Webserver(user_id='1', ssid='', password='', base=f"http://127.0.0.1:{server.port}")
+		sync = StateSync('1', state.Lights, state)
+		cpu_time = 0
+		for i in range(polls):
+			if mode == 'full':
+				sync._StateSync__revision = None
+			t_start = ticks_us()
+			sync.get(webserver)
+			cpu_time += ticks_diff(ticks_us(), t_start)
+		webserver.disconnect()
+		server.stop()
+
+		scale = 3600/polls
+		results[mode] = {'bytes_per_hour': (server.bytes_sent+server.bytes_received)*scale, 'cpu_ms_per_hour': cpu_time/1000*scale}
+		print(f"Idle polling ({mode}): {results[mode]['bytes_per_hour']/1000:.0f} kB/hour, {results[mode]['cpu_ms_per_hour']:.0f} ms CPU/hour")
+	return results
+
+def sync_latency(changes=8):
+	"""
+	Measures the time from a colour change on a local Fake_Server to State.trigger_animation being called, for 1 Hz
+	polling with StateSync.get and for long-polling with StateSync.watch, driven as in the server loop.
+
+	Returns:
+		dict: Per mode the average and maximum latency in milliseconds.
+	"""
+	import machine
+	from Light import Lights
+	from State import State, StateSync
+	from Webserver import Webserver
+	from Timers import Periodic
+	from Fake_Server import Fake_Server
+
+	state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+	triggered = []
+	trigger_animation = state.trigger_animation
+	def record_trigger(end_config, *args, **kwargs):
+		if 'hue' in end_config:
+			triggered.append(ticks_ms())
+		return trigger_animation(end_config, *args, **kwargs)
+	state.trigger_animation = record_trigger
+
+	results = {}
+	for mode in ('polling', 'long poll'):
+		random.seed(0)
+		server = Fake_Server()
+		webserver = Webserver(user_id='1', ssid='', password='', base=f"http://127.0.0.1:{server.port}")
+		sync = StateSync('1', state.Lights, state, long_poll=mode == 'long poll')
+		light_periodic = Periodic(func=sync.get, freq=1, webserver=webserver)
+		sync.get(webserver)
+
+		latencies = []
+		for i in range(changes):
+			change_time = ticks_add(ticks_ms(), random.randint(0, 1000))
+			changed = False
+			del triggered[:]
+			while not (changed and triggered):
+				if not changed and ticks_diff(ticks_ms(), change_time) >= 0:
+					change_time = ticks_ms()
+					server.update('light_data', {'hue': random.randint(0, 360)})
+					changed = True
+				elif changed and ticks_diff(ticks_ms(), change_time) > 5000:
+					break
+				if sync.is_watching(webserver):
+					sync.watch(webserver)
+				else:
+					light_periodic.call_func()
+				sleep_ms(1)
+			latencies.append(ticks_diff(triggered[0], change_time) if triggered else 5000)
+		webserver.disconnect()
+		server.stop()
+
+		results[mode] = {'average_ms': sum(latencies)/changes, 'max_ms': max(latencies)}
+		print(f"Sync latency ({mode}): {results[mode]['average_ms']:.0f} ms average, {results[mode]['max_ms']} ms max")
+	return results
+
+def periodic_overhead(passes=20000):
+	"""
+	Measures the cost of a server loop pass in which none of its seven periodic jobs is due, polling a Periodic per
+	job against checking the earliest deadline of a Scheduler.
+
+	Returns:
+		dict: The time per pass in microseconds for 'periodic' and 'scheduler'.
+	"""
+	from Timers import Periodic, Scheduler
+
+	def job(*args, **kwargs):
+		pass
+
+	intervals = (1000, 2000, 5000, 10000, 60000, 60000, 600000)
+	periodics = [Periodic(job, 1000/interval, None, webserver=None) for interval in intervals]
+	scheduler = Scheduler()
+	for i, interval in enumerate(intervals):
+		scheduler.add(str(i), job, interval, webserver=None)
+
+	results = {}
+	t_start = ticks_us()
+	for _ in range(passes):
+		for periodic in periodics:
+			periodic.call_func()
+	results['periodic'] = ticks_diff(ticks_us(), t_start)/passes
+	t_start = ticks_us()
+	for _ in range(passes):
+		scheduler.run_pending()
+	results['scheduler'] = ticks_diff(ticks_us(), t_start)/passes
+	print(f"Idle loop pass: {results['periodic']:.2f} us with Periodic, {results['scheduler']:.2f} us with Scheduler")
+	return results
+
+def trace_overhead(spans=20000):
+	"""
+	Measures the cost of a traced span with tracing disabled and enabled, and the heap allocated while enabled.
+
+	Returns:
+		dict: The time per span in microseconds for 'disabled' and 'enabled', and the bytes allocated per enabled span.
+	"""
+	import gc
+	import Trace
+
+	results = {}
+	for mode in ('disabled', 'enabled'):
+		Trace.enable(mode == 'enabled')
+		gc.collect()
+		gc.disable()
+		allocated = gc.mem_alloc()
+		t_start = ticks_us()
+		for _ in range(spans):
+			span = Trace.begin()
+			Trace.end(Trace.DRAW_FACE, span)
+		results[mode] = ticks_diff(ticks_us(), t_start)/spans
+		allocated = gc.mem_alloc() - allocated
+		gc.enable()
+	Trace.enable(False)
+	results['bytes_per_span'] = allocated/spans
+	print(f"Trace span: {results['disabled']:.2f} us disabled, {results['enabled']:.2f} us enabled, {results['bytes_per_span']:.1f} bytes allocated per span")
+	return results
+
+def animation_suite(emotions=SUITE_EMOTIONS, routines=SUITE_ROUTINES, emotion_ms=20000, max_ms=30000, frame_time=20, seed=0):
+	"""
+	Drives each emotion for emotion_ms and each AnimationBank routine until it is done, on a new State with the random
+	generator seeded, rendering a frame every frame_time. The emotion triggers are checked every 2 seconds, as
+	main_system does.
+
+	On a host the suite runs on a stepped virtual clock, so the frames, pixels and particles are the same on every run
+	and the cost of animate_status and draw_face is timed in real time with ticks_cpu. On the board the clock is real.
+
+	Returns:
+		dict: Per scenario ('emotion:<name>' or 'routine:<name>') the frames rendered, the average and maximum cost of
+			  animate_status and draw_face in microseconds, the peak particle count, the pixels pushed and the heap
+			  high-water mark in bytes above the heap at the start.
+	"""
+	import Trace
+	host = sys.implementation.name != 'micropython'
+	if host:
+		Simulator.install()
+		from utime import ticks_cpu
+		Trace.use_clock(ticks_cpu)
+
+	results = {}
+	try:
+		for name in emotions:
+			results['emotion:' + name] = _suite_scenario(name, None, emotion_ms, frame_time, seed)
+		for name in routines:
+			results['routine:' + name] = _suite_scenario(None, name, max_ms, frame_time, seed)
+	finally:
+		Trace.enable(False)
+		if host:
+			Trace.use_clock(ticks_us)
+			Simulator.install(speed=1)
+	return results
+
+def _suite_scenario(emotion, routine, duration_ms, frame_time, seed):
+	"""
+	Runs one scenario of animation_suite().
+	"""
+	import gc
+	import machine
+	import Trace
+	from Light import Lights
+	from State import State
+	from Animation import AnimationBank
+
+	gc.collect()
+	state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+	random.seed(seed)
+	state.reset_animation()
+	state.draw_state(state.get_current_state().copy())
+	if emotion is not None:
+		state.Emotion.update(emotion=emotion, social_value=50, tired_value=50)
+	else:
+		getattr(AnimationBank, routine)(state)
+
+	gc.collect()
+	heap_start = gc.mem_alloc()
+	heap_peak = pixels = particles = 0
+	Trace.enable(False)
+	Trace.enable()
+	t_start = ticks_ms()
+	next_check = ticks_add(t_start, 2000)
+	while ticks_diff(ticks_ms(), t_start) < duration_ms:
+		if emotion is not None and ticks_diff(ticks_ms(), next_check) >= 0:
+			state.check_animation_triggers()
+			next_check = ticks_add(next_check, 2000)
+		state.face.pixels_pushed = 0
+		state.draw_state()
+		pixels += state.face.pixels_pushed
+		particles = max(particles, state.particle_count())
+		heap_peak = max(heap_peak, gc.mem_alloc() - heap_start)
+		if routine is not None and not state.is_animation_active():
+			break
+		sleep_ms(frame_time)
+	Trace.enable(False)
+
+	summary = Trace.summary()
+	animate = summary.get('animate_status', {'count': 0, 'average_us': 0, 'max_us': 0})
+	draw = summary.get('draw_face', {'count': 0, 'average_us': 0, 'max_us': 0})
+	result = {'frames': draw['count'], 'animate_us': animate['average_us'], 'animate_max_us': animate['max_us'],
+			  'draw_us': draw['average_us'], 'draw_max_us': draw['max_us'], 'peak_particles': particles,
+			  'pixels_pushed': pixels, 'heap_peak': heap_peak}
+	print(f"{emotion or routine}: {result['frames']} frames, animate {result['animate_us']} us, draw {result['draw_us']} us, "
+		  f"{particles} particles, {pixels} pixels, {heap_peak} bytes")
+	return result
+
+def mood_toggling(switches=40, interval_ms=250, frame_time=20, emotions=('happy', 'sad', 'angry', 'love'), seed=0):
+	"""
+	Switches the emotion every interval_ms while rendering a frame every frame_time, once by building a new emotion
+	that queues its standard face and colour with force as Emotion_Manager did before, and once through
+	Emotion_Manager, which blends into cached emotions.
+
+	On a host this runs on a stepped virtual clock with animate_status timed with ticks_cpu, as animation_suite().
+
+	Returns:
+		dict: Per mode ('stacked', 'blended') the peak number of running and queued keyframes, the average and maximum
+			  cost of animate_status in microseconds, the delay in milliseconds before a newly queued animation would
+			  start after the last switch, and the milliseconds until the face is at rest.
+	"""
+	import Trace
+	host = sys.implementation.name != 'micropython'
+	if host:
+		Simulator.install()
+		from utime import ticks_cpu
+		Trace.use_clock(ticks_cpu)
+
+	results = {}
+	try:
+		for mode in ('stacked', 'blended'):
+			results[mode] = _toggle_moods(mode, switches, interval_ms, frame_time, emotions, seed)
+	finally:
+		Trace.enable(False)
+		if host:
+			Trace.use_clock(ticks_us)
+			Simulator.install(speed=1)
+	return results
+
+def _toggle_moods(mode, switches, interval_ms, frame_time, emotions, seed):
+	"""
+	Runs one mode of mood_toggling().
+	"""
+	import gc
+	import machine
+	import Trace
+	from Light import Lights
+	from State import State, emotion_class
+	from TimeProfiles import Time_Profiles
+
+	gc.collect()
+	state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+	random.seed(seed)
+	state.reset_animation()
+	state.draw_state(state.get_current_state().copy())
+
+	peak = 0
+	Trace.enable(False)
+	Trace.enable()
+	for i in range(switches):
+		name = emotions[i % len(emotions)]
+		if mode == 'stacked':
+			emotion = emotion_class(name)(state, 50, 50)
+			emotion._standard_face(force=True)
+			state.trigger_animation(emotion.COLOUR, emotion.COLOUR_TIME, Time_Profiles.ease_in_out, force=True)
+		else:
+			state.Emotion.update(emotion=name, social_value=50, tired_value=50)
+		t_switch = ticks_ms()
+		while ticks_diff(ticks_ms(), t_switch) < interval_ms:
+			state.draw_state()
+			peak = max(peak, state.keyframe_count())
+			sleep_ms(frame_time)
+	Trace.enable(False)
+	queue_delay = state.get_final_time()
+
+	t_last = ticks_ms()
+	while state.is_animation_active():
+		state.draw_state()
+		sleep_ms(frame_time)
+	settle = ticks_diff(ticks_ms(), t_last)
+
+	animate = Trace.summary().get('animate_status', {'average_us': 0, 'max_us': 0})
+	result = {'peak_keyframes': peak, 'animate_us': animate['average_us'], 'animate_max_us': animate['max_us'],
+			  'queue_delay_ms': queue_delay, 'settle_ms': settle}
+	print(f"Mood toggling {mode}: {peak} keyframes at peak, animate {result['animate_us']} us (max {result['animate_max_us']} us), "
+		  f"next animation after {queue_delay} ms, at rest after {settle} ms")
+	return result
+
+def _legacy_routines():
+	"""
+	Returns the routines as they were written in Python before they became scripts, to compare with.
+	"""
+	from math import pi
+	from TimeProfiles import Time_Profiles
+	from Particle import Tear
+
+	def blink(State):
+		saved_state = State.get_final_state()
+		State.trigger_animation({'eye_open': 0.0}, 200, Time_Profiles.ease_in)
+		State.trigger_animation({'eye_open': saved_state['eye_open']}, 200, Time_Profiles.ease_out)
+
+	def shake_yes(State, amount=None):
+		saved_state = State.get_final_state()
+		if amount is None:
+			amount = random.randint(1,3)
+		for i in range(amount):
+			State.trigger_animation({'y': 140}, 400, Time_Profiles.ease_in_out)
+			State.trigger_animation({'y': 100}, 400, Time_Profiles.ease_in_out)
+		State.trigger_animation({'y': saved_state['y']}, 400, Time_Profiles.ease_out)
+
+	def dancing(State, amount=None):
+		saved_state = State.get_final_state()
+		if amount is None:
+			amount = random.randint(2,5)
+		for i in range(amount):
+			State.trigger_animation({'x': 140, 'y': 100, 'value': saved_state['value']*0.4}, 400, Time_Profiles.ease_in_out)
+			State.trigger_animation({'x': 120, 'y': 140, 'value': saved_state['value']}, 400, Time_Profiles.ease_in_out)
+			State.trigger_animation({'x': 100, 'y': 100, 'value': saved_state['value']*0.4}, 400, Time_Profiles.ease_in_out)
+			State.trigger_animation({'x': 120, 'y': 140, 'value': saved_state['value']}, 400, Time_Profiles.ease_in_out)
+		State.trigger_animation({'x': saved_state['x'], 'y': saved_state['y'], 'value': saved_state['value']}, 600, Time_Profiles.ease_out)
+
+	def yawn(State):
+		saved_state = State.get_final_state()
+		State.trigger_animation({'mouth_width': 0, 'yawn': 0.8, 'eye_open': 0.2, 'under_eye_lid': 0.5}, 1200, Time_Profiles.ease_in)
+		State.trigger_animation({'mouth_width': 0, 'yawn': 1, 'eye_open': 0.1, 'under_eye_lid': 0.7}, 800, Time_Profiles.ease_out)
+		State.trigger_animation({'mouth_width': saved_state['mouth_width'], 'yawn': 0, 'eye_open': saved_state['eye_open'], 'under_eye_lid': saved_state['under_eye_lid']}, 800, Time_Profiles.ease_in_out)
+
+	def crying(State, tear_y):
+		status = State.get_current_state()
+		State.trigger_animation({'y': 140}, 250, Time_Profiles.ease_in_out, force=True)
+		for i in range(0, random.randint(3, 6)):
+			State.trigger_animation({'y': 120}, 500, Time_Profiles.ease_in_out)
+			State.trigger_animation({'y': 140}, 250, Time_Profiles.ease_in_out)
+			for side in [-1, 1]:
+				State.queue_particle(Tear, (status['x']+45*side, tear_y, pi/2), 750*i, scale=0.75)
+		State.trigger_animation({'y': status['y']}, 200, Time_Profiles.ease_out)
+		for side in [-1, 1]:
+			State.queue_particle(Tear, (status['x']+45*side, tear_y, pi/2), 750*(i+1), scale=0.75)
+
+	return {'blink': blink, 'shake_yes': shake_yes, 'dancing': dancing, 'yawn': yawn, 'crying': crying}
+
+def routine_scheduling(routines=('blink', 'shake_yes', 'dancing', 'yawn', 'crying'), runs=200, seed=0):
+	"""
+	Measures the cost of queuing a routine, compiled from its script and as the Python it was written in before.
+	Every run queues on an empty queue with the same random numbers for both, so the queued keyframes, the final
+	status and the time the queue is done are also compared.
+
+	On a host this runs on a stepped virtual clock, so both versions queue at the same virtual time, and is timed in
+	real time with ticks_cpu.
+
+	Returns:
+		dict: Per routine the average time in microseconds to queue it as a script and in Python, and whether both
+			  queued the same.
+	"""
+	import gc
+	import machine
+	from Light import Lights
+	from State import State
+	from Animation import AnimationBank
+	import Scripts
+
+	host = sys.implementation.name != 'micropython'
+	timer = ticks_us
+	if host:
+		Simulator.install(heap=False)
+		from utime import ticks_cpu as timer
+	legacy = _legacy_routines()
+	results = {}
+	try:
+		state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+		state.draw_state(state.get_current_state().copy())
+		t_compile = timer()
+		Scripts.load()
+		compile_us = ticks_diff(timer(), t_compile)
+		print(f"Compiled the scripts in {compile_us} us")
+		for name in routines:
+			args = (150,) if name == 'crying' else ()
+			timings = array('L', [0, 0])
+			same = True
+			versions = (getattr(AnimationBank, name), legacy[name])
+			for i in range(runs):
+				outcomes = [None, None]
+				# Alternate which version runs first, so neither always runs on a freshly collected heap
+				for version in ((0, 1) if i % 2 == 0 else (1, 0)):
+					routine = versions[version]
+					state.reset_animation()
+					random.seed(seed+i)
+					gc.collect()
+					queued_until = state.get_final_time()
+					t_start = timer()
+					routine(state, *args)
+					timings[version] += ticks_diff(timer(), t_start)
+					outcomes[version] = (state.keyframe_count(), state.get_final_time()-queued_until, state.get_final_state().copy())
+				same = same and outcomes[0][:2] == outcomes[1][:2] and all(
+					abs(outcomes[0][2][key] - outcomes[1][2][key]) < 1e-3 for key in outcomes[1][2])
+			results[name] = {'script_us': timings[0]/runs, 'python_us': timings[1]/runs, 'same': same}
+			print(f"Schedule {name}: script {results[name]['script_us']:.1f} us, python {results[name]['python_us']:.1f} us, "
+				  f"{'same' if same else 'DIFFERENT'} keyframes")
+	finally:
+		if host:
+			Simulator.install(speed=1)
+	return results
+
+def render_allocations(frames=1000, frame_time=20, budget=None):
+	"""
+	Checks the heap the render path allocates per frame, with particles alive. The face is driven through a blink, a
+	nod and a dance once to record its statuses, then Screen.draw_face() replays them with four particles for at least
+	frames frames with the collector disabled, after a first replay to fill the geometry caches of the Screen. Whole
+	replays are run, so the face ends in the state it started in.
+
+	The render path is not free of allocations: the floats of the layout, the positions and rectangles passed to the
+	shape drawer and the particle positions are allocated every frame. On the board these are counted as the heap
+	allocated while the collector is disabled, on a host, where CPython frees most objects right away, as the sum of
+	the tracemalloc peaks of the frames, with the clock stepped so the particles stay in place. The bytes allocated
+	have to stay within budget per frame, and gc.mem_alloc() has to be the same after a collection as before the
+	frames.
+
+	Parameters:
+		budget (int): The bytes a frame may allocate, FRAME_ALLOCATION_BUDGET of the platform by default. Without a
+					  budget only the retained heap is checked.
+
+	Raises:
+		AssertionError: If a frame allocates more than budget bytes or the frames retain heap.
+
+	Returns:
+		dict: The bytes allocated per frame with the collector disabled and the bytes retained after a collection.
+	"""
+	import gc
+	import machine
+	from math import pi
+	from Light import Lights
+	from State import State
+	from Animation import AnimationBank
+	from Particle import ParticleSystem, Heart, Tear, Z
+
+	host = sys.implementation.name != 'micropython'
+	if host:
+		Simulator.install()
+	try:
+		random.seed(0)
+		state = State(Lights(N=8, brightness=1, pin=machine.Pin(12)))
+		state.reset_animation()
+		state.draw_state(state.get_current_state().copy())
+		AnimationBank.blink(state)
+		AnimationBank.shake_yes(state, amount=1)
+		AnimationBank.dancing(state, amount=1)
+		statuses = []
+		while state.is_animation_active():
+			state.draw_state()
+			statuses.append(state.get_current_state().copy())
+			sleep_ms(frame_time)
+
+		face = state.face
+		particles = ParticleSystem()
+		# Slow particles, so they stay on the screen while the frames are replayed on the board
+		for shape, spawn in ((Heart, (60, 60, -pi/4)), (Tear, (180, 60, pi/2)), (Z, (60, 180, -pi/4)), (Tear, (180, 180, pi/2))):
+			particles.spawn(shape, spawn, scale=0.5, speed=1)
+		for status in statuses:
+			face.draw_face(status, status, particles)
+		replays = -(-frames // len(statuses))
+		frames = replays*len(statuses)
+		# The readings are kept in an array, so on a host they are not counted as objects allocated in between
+		heap = array('L', [0]*5)
+		if host:
+			import tracemalloc
+		gc.collect()
+		heap[0] = gc.mem_alloc()
+		gc.disable()
+		heap[1] = gc.mem_alloc()
+		if host:
+			# CPython frees most objects right away, so the bytes allocated are counted as the peak of every frame
+			for i in range(replays):
+				for status in statuses:
+					tracemalloc.reset_peak()
+					heap[2] = tracemalloc.get_traced_memory()[0]
+					face.draw_face(status, status, particles)
+					heap[4] += tracemalloc.get_traced_memory()[1] - heap[2]
+		else:
+			for i in range(replays):
+				for status in statuses:
+					face.draw_face(status, status, particles)
+		heap[2] = gc.mem_alloc()
+		gc.enable()
+		gc.collect()
+		heap[3] = gc.mem_alloc()
+	finally:
+		gc.enable()
+		if host:
+			Simulator.install(speed=1)
+
+	allocated = heap[4] if host else heap[2] - heap[1]
+	retained = heap[3] - heap[0]
+	if budget is None:
+		budget = FRAME_ALLOCATION_BUDGET.get(sys.implementation.name)
+	results = {'bytes_per_frame': allocated/frames, 'retained': retained, 'particles': particles.count,
+			   'geometry': face.geometry_stats()}
+	print(f"Render allocations over {frames} frames of {len(statuses)} statuses with {particles.count} particles: "
+		  f"{results['bytes_per_frame']:.1f} bytes/frame (budget {budget}), {retained} bytes retained")
+	if budget is None:
+		print(f"No allocation budget for {sys.implementation.name}, set FRAME_ALLOCATION_BUDGET from this run")
+	elif allocated > budget*frames:
+		raise AssertionError(f"The render path allocates {results['bytes_per_frame']:.1f} bytes/frame, over the budget of {budget}")
+	if retained != 0:
+		raise AssertionError(f"The render path retains {retained} bytes")
+	return results
+
+def state_save_load(saves=20):
+	"""
+	Measures the time to save and load the state with the JSON file that State used before, which removed the file,
+	collected twice and dumped the status, and with the State_Journal. Every save writes a changed status. The files
+	are written to the working directory under their own names and removed afterwards.
+
+	Returns:
+		dict: Per path the average save and load time in milliseconds and the bytes on flash.
+	"""
+	import os
+	import gc
+	from Journal import State_Journal, RECORD_SIZE
+
+	status = _status()
+	status['yawn'] = 0
+	results = {}
+
+	path = 'benchmark_state.json'
+	t_save = t_load = 0
+	for i in range(saves):
+		status['x'] = 100 + i
+		t_start = ticks_us()
+		gc.collect()
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+		gc.collect()
+		with open(path, 'w') as file:
+			json.dump(status, file)
+		t_save += ticks_diff(ticks_us(), t_start)
+		t_start = ticks_us()
+		with open(path, 'r') as file:
+			json.load(file)
+		t_load += ticks_diff(ticks_us(), t_start)
+	results['json'] = {'save_ms': t_save/saves/1000, 'load_ms': t_load/saves/1000, 'bytes': os.stat(path)[6]}
+	os.remove(path)
+
+	slots = ('benchmark_a.bin', 'benchmark_b.bin')
+	t_save = t_load = 0
+	for i in range(saves):
+		status['x'] = 100 + i
+		journal = State_Journal(slots, legacy=None, min_interval=0)
+		t_start = ticks_us()
+		journal.load()
+		t_load += ticks_diff(ticks_us(), t_start)
+		t_start = ticks_us()
+		journal.stage(status)
+		journal.write()
+		t_save += ticks_diff(ticks_us(), t_start)
+	results['journal'] = {'save_ms': t_save/saves/1000, 'load_ms': t_load/saves/1000, 'bytes': 2*RECORD_SIZE}
+	for slot in slots:
+		os.remove(slot)
+
+	for mode, result in results.items():
+		print(f"State {mode}: save {result['save_ms']:.2f} ms, load {result['load_ms']:.2f} ms, {result['bytes']} bytes")
+	return results
+
+def startup_imports(modules=BOOT_MODULES):
+	"""
+	Measures the time and heap taken to import the modules of the boot, one by one in the order they are first
+	imported, so every module is measured without the modules it imports. This has to run before anything has imported
+	them, as the first benchmark on the board or with `python Benchmark.py startup` on a host.
+
+	Returns:
+		dict: Per module the import time in milliseconds and the heap it takes in bytes, the totals, gc.mem_free()
+			  after the imports and the ON_DEMAND_MODULES that were loaded at boot.
+	"""
+	import gc
+	loaded = [name for name in modules if name in sys.modules]
+	if loaded:
+		print(f"Startup imports: {loaded} are imported already")
+
+	results = {'modules': {}}
+	total_ms = total_bytes = 0
+	for name in modules:
+		gc.collect()
+		heap = gc.mem_alloc()
+		t_start = ticks_us()
+		__import__(name)
+		import_ms = ticks_diff(ticks_us(), t_start)/1000
+		gc.collect()
+		results['modules'][name] = {'import_ms': import_ms, 'bytes': gc.mem_alloc() - heap}
+		total_ms += import_ms
+		total_bytes += results['modules'][name]['bytes']
+		print(f"Import {name}: {import_ms:.1f} ms, {results['modules'][name]['bytes']} bytes")
+	results['import_ms'] = total_ms
+	results['bytes'] = total_bytes
+	results['mem_free'] = gc.mem_free()
+	results['on_demand_loaded'] = [name for name in ON_DEMAND_MODULES if name in sys.modules]
+	print(f"Startup imports: {total_ms:.1f} ms, {total_bytes} bytes, {results['mem_free']} bytes free, "
+		  f"on-demand modules loaded: {results['on_demand_loaded']}")
+	return results
+
+def save_baseline(results, path=BASELINE_FILE):
+	"""
+	Writes the results of animation_suite() to a JSON baseline file, together with the platform they were measured on.
+	"""
+	with open(path, 'w') as file:
+		json.dump({'platform': sys.implementation.name, 'scenarios': results}, file)
+	print(f"Saved baseline of {len(results)} scenarios to {path}")
+
+def compare_baseline(results, path=BASELINE_FILE, threshold=0.2):
+	"""
+	Compares the results of animation_suite() with a baseline file. A metric in REGRESSION_METRICS that grew by more
+	than threshold is a regression, other metrics that differ are reported as changed behaviour.
+
+	Returns:
+		list: The regressions as (scenario, metric, baseline, result).
+	"""
+	with open(path) as file:
+		baseline = json.load(file)
+	if baseline['platform'] != sys.implementation.name:
+		print(f"Baseline was measured on {baseline['platform']}, the costs are not comparable")
+
+	regressions = []
+	for scenario, result in results.items():
+		before = baseline['scenarios'].get(scenario)
+		if before is None:
+			print(f"{scenario}: not in baseline")
+			continue
+		for metric, value in result.items():
+			old = before.get(metric, 0)
+			if metric in REGRESSION_METRICS and value > old*(1+threshold):
+				regressions.append((scenario, metric, old, value))
+				print(f"REGRESSION {scenario} {metric}: {old} -> {value}")
+			elif metric not in REGRESSION_METRICS and value != old and not metric.endswith('_us'):
+				print(f"Changed {scenario} {metric}: {old} -> {value}")
+	print(f"{len(regressions)} regressions over {threshold*100:.0f}%")
+	return regressions
+
+if __name__ == '__main__':
+	if 'startup' in sys.argv:
+		startup_imports()
+		sys.exit(0)
+	if 'suite' in sys.argv:
+		results = animation_suite()
+		if '--save' in sys.argv:
+			save_baseline(results)
+		else:
+			threshold = float(sys.argv[sys.argv.index('--threshold')+1]) if '--threshold' in sys.argv else 0.2
+			failed = compare_baseline(results, threshold=threshold)
+			sys.exit(1 if failed else 0)
+		sys.exit(0)
+	animator_queue_depth()
+	animator_projection_consistency()
+	particle_idle_spawn()
+	render_allocations()
+	mood_toggling()
+	routine_scheduling()
+	state_save_load()
+	easing_cost()
@@ -0,0 +1,205 @@
+"""
+The emotions of the face. They are only needed once the emotion of the user is known, so State imports this module on
+the first change of emotion instead of at boot.
+"""
+import random
+from math import pi, exp
+
+from TimeProfiles import Time_Profiles
+from Particle import Tear, Heart, Z
+from Animation import Emotion, AnimationBank, Choices, run_script
+
+class Happy(Emotion):
+	FACE = {'eye_open': 1, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.0, 
+			'smile': 1, 'smirk': 0, 'cheeks': 0, 'mouth_width': 40, 'yawn': 0}
+	COLOUR = {"y": 120,"hue": 50, "saturation": 1, "value": 1}
+	BACKGROUND = Choices({'wink': 0.4, 'shake_yes': 0.4, 'dance': 0.2})
+	TIRED_BACKGROUND = Choices({'wink': 0.75, 'shake_yes': 0.25})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "happy"
+
+	def _trigger_background(self):
+		choice = (self.BACKGROUND if self.tired_value < 0.8 else self.TIRED_BACKGROUND).pick()
+		print(f"Happy background animation: {choice}")
+		if choice == 'wink':
+			AnimationBank.wink(self.State)
+		elif choice == 'shake_yes':
+			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
+		elif choice == 'dance':
+			AnimationBank.dancing(self.State, amount=random.randint(2,5))
+		
+
+class Angry(Emotion):
+	FACE = {'eye_open': 0.8, 'eyebrow_angle': 1.0, 'under_eye_lid': 0.3, 
+			'cheeks' : 0, 'smile': -1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0,}
+	COLOUR = {"hue": 0, "saturation": 1, "value": 1}
+	BACKGROUND = Choices({'shake_no': 1})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "angry"
+
+	def _trigger_face_move(self):
+		tired_addition = int(1000 * (1 / (1 + exp(-0.1 * (self.tired_value - 80)))))
+		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(100, 130)}, random.randint(500+tired_addition,1000+tired_addition), Time_Profiles.ease_in_out)
+
+	def _trigger_background(self):
+		choice = self.BACKGROUND.pick()
+
+		if choice == 'shake_no':
+			run_script(self.State, 'angry_shake_no')
+
+class Sad(Emotion):
+	FACE = {'eye_open': 0.65, 'eyebrow_angle': -1.0, 'under_eye_lid': 0.0, 
+			'cheeks' : 0, 'smile': -1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0}
+	COLOUR = {"y": 140,"hue": 240, "saturation": 1, "value": 1}
+	BACKGROUND = Choices({'shake_no': 0.25, 'tear': 0.5, 'crying': 0.25})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "sad"
+
+		self.update_parameters()
+
+	def _update_parameters(self):
+		self.triggers['background'].change_function = lambda t: 1e-2*t**2
+
+	def _trigger_face_move(self):
+		tired_addition = int(1000 * (1 / (1 + exp(-0.1 * (self.tired_value - 80)))))
+		self.State.trigger_animation({'x': random.randint(100, 140), 'y': random.randint(125, 150)}, random.randint(500+tired_addition,1500+tired_addition), Time_Profiles.ease_in_out)
+
+	def _trigger_background(self):
+		choice = self.BACKGROUND.pick()
+
+		if choice == 'shake_no':
+			AnimationBank.shake_no(self.State, amount=random.randint(2,4))
+		elif choice == 'tear':
+			status = self.State.get_current_state()
+			under_y = self.State.face.eye_height-status['under_eye_lid']*self.State.face.eye_height/2+status['y']-65
+
+			self.State.spawn_particle(Tear, (status['x']+45*random.choice([-1, 1]), under_y+5, pi/2), scale=0.75)
+		elif choice == 'crying':
+			status = self.State.get_current_state()
+			under_y = self.State.face.eye_height-status['under_eye_lid']*self.State.face.eye_height/2+status['y']-65
+
+			AnimationBank.crying(self.State, tear_y=under_y+5)
+
+class Okay(Emotion):
+	FACE = {'eye_open': 1, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.4, 
+			'smile': 0,'cheeks' : 0, 'smirk': 0, 'mouth_width': 55, 'yawn': 0}
+	COLOUR = {"hue": 120, "saturation": 1, "value": 0}
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "okay"
+
+class Horny(Emotion):
+	FACE = {'eye_open': 0.7, 'eyebrow_angle': 0.3, 'under_eye_lid': 0.2, 'smile': 1, 'cheeks' : 0, 'mouth_width': 60}
+	COLOUR = {"hue": 275, "saturation": 1, "value": 1}
+	BACKGROUND = Choices({'wink': 0.2, 'shake_yes': 0.05, 'dance': 0.05, 'eye_brows_raise': 0.3, 'fast_blinking': 0.2, 'kiss': 0.2})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "horny"
+
+	def enter(self):
+		super().enter()
+		# The smirk is picked anew on every entry, so it is not part of the plan
+		self.State.retarget_animation({'smirk': random.choice([-1,1])}, self.FACE_TIME, Time_Profiles.ease_in_out)
+
+	def _standard_face(self, force=True):
+		face = self.FACE.copy()
+		face['smirk'] = random.choice([-1,1])
+		self.State.trigger_animation(face, self.FACE_TIME, Time_Profiles.ease_in_out, force=force)
+
+	def _trigger_background(self):
+		choice = self.BACKGROUND.pick()
+		print(f"Happy background animation: {choice}")
+		if choice == 'wink':
+			AnimationBank.wink(self.State)
+		elif choice == 'shake_yes':
+			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
+		elif choice == 'dance':
+			AnimationBank.dancing(self.State, amount=random.randint(2,5))
+		elif choice == 'eye_brows_raise':
+			AnimationBank.eye_brows_raise(self.State, amount=random.randint(2,5))
+		elif choice == 'fast_blinking':
+			for i in range(random.randint(4, 6)):
+				AnimationBank.blink(self.State)
+		elif choice == 'kiss':
+			AnimationBank.kiss(self.State)
+
+class Love(Emotion):
+	FACE = {'eye_open': 1.0, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.5, 
+			'smile': 1, 'cheeks' : 1, 'smirk': 0, 'mouth_width': 40, 'yawn': 0, }
+	COLOUR = {"hue": 300, "saturation": 1, "value": 1}
+	BACKGROUND = Choices({'fast_blinking': 0.2, 'wink': 0.2, 'kiss': 0.25, 'shake_yes': 0.1, 'dance': 0.1, 'hearts_flying': 0.25})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "love"
+
+	def _trigger_background(self):
+		choice = self.BACKGROUND.pick()
+
+		print(f"Happy background animation: {choice}")
+		if choice == 'wink':
+			AnimationBank.wink(self.State)
+		elif choice == 'fast_blinking':
+			for i in range(random.randint(4, 6)):
+				AnimationBank.blink(self.State)
+		elif choice == 'kiss':
+			AnimationBank.kiss(self.State)
+		elif choice == "shake_yes":
+			AnimationBank.shake_yes(self.State, amount=random.randint(2,4))
+		elif choice == "dance":
+			AnimationBank.dancing(self.State, amount=random.randint(2,5))
+		elif choice == 'hearts_flying':
+			for i in range(random.randint(10, 50)):
+				self.State.queue_particle(Heart, (random.randint(60, 180), random.randint(40, 80), random.uniform(-3*pi/4, -pi/4)), (i**1.4)*100, scale=0.45)
+		
+class Sleeping(Emotion):
+	FACE = {'eye_open': 0.15, 'eyebrow_angle': 0.0, 'under_eye_lid': 0.1, 
+			'smile': 0,'cheeks' : 0, 'smirk': 0, 'mouth_width': 40, 'yawn': 0}
+	COLOUR = {'x': 120, "y": 150,"hue": 0, "saturation": 0, "value": 0}
+	BACKGROUND = Choices({'wake_up_fall_asleep': 0.2, 'Z_particles': 0.6, 'look_around': 0.1, 'drooling': 0.1})
+
+	def __init__(self, State, social_value=50, tired_value=50):
+		super().__init__(State, social_value, tired_value)
+		self.name = "sleeping"
+
+	def _update_parameters(self):
+		self.triggers['blink'].change_function = lambda t: 0
+		self.triggers['face_move'].change_function = lambda t: 0.1
+		self.triggers['tired'].change_function = lambda t:  0
+
+	def _trigger_face_move(self):
+		self.State.trigger_animation({'x': 120, 'y': random.randint(110,130)}, random.randint(4000,6000), Time_Profiles.ease_in_out)
+		self.State.trigger_animation({'y': 150}, random.randint(4000,6000), Time_Profiles.ease_in_out)
+
+	def _trigger_background(self):
+		choice = self.BACKGROUND.pick()
+
+		if choice == 'wake_up_fall_asleep':
+			AnimationBank.wake_up_fall_asleep(self.State)
+		if choice == 'Z_particles':
+			for i in range(random.randint(6,10)):
+				saved_state = self.State.get_current_state()
+				self.State.queue_particle(Z, (saved_state['x']+45, saved_state['y']+20, -pi/4), (i**1.6)*500, scale=random.randint(20, 40)/100)
+		if choice == 'look_around':
+			side = random.choice([-1, 1])
+			saved_state = self.State.get_current_state()
+			self.State.trigger_animation({'eye_open': 0.4}, 1000, Time_Profiles.ease_in_out)
+			self.State.trigger_animation({'x': 120+side*random.randint(20,40), 'y': saved_state['y']-random.randint(20,30)}, 2000, Time_Profiles.ease_in_out)
+			self.State.trigger_wait_animation(random.randint(800,1500))
+			self.State.trigger_animation({'x': saved_state['x'], 'y': saved_state['y'], 'eye_open':saved_state['eye_open']}, 2000, Time_Profiles.ease_in_out)
+		if choice == 'drooling':
+			side = random.choice([-1, 1])
+			saved_state = self.State.get_current_state()
+			self.State.trigger_wait_animation(self.State.get_final_time()+200)
+			self.State.queue_particle(Tear, (saved_state['x']+(saved_state['mouth_width']//4)*side, saved_state['y']+50, pi/2), 0, scale=0.5, speed=0, accel=10)
+			self.State.trigger_wait_animation(2000)
+
+EMOTIONS = {'happy': Happy, 'angry': Angry, 'sad': Sad, 'okay': Okay, 'love': Love, 'horny': Horny, 'sleeping': Sleeping}
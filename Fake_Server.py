@@ -0,0 +1,271 @@
+"""
+A stand-in for the Maja backend, serving the webserver API over HTTP/1.1 on a local port.
+
+It runs in a background thread, so a Webserver or HttpConnection in the same process can be pointed at it
+for benchmarks without network access.
+"""
+import socket
+import _thread
+import select
+import json
+from time import sleep_ms, ticks_ms, ticks_diff, ticks_add
+from datetime import datetime, timedelta
+
+class Fake_Server():
+	"""
+	A minimal HTTP/1.1 server that answers the API paths of the backend from an in-memory state.
+
+	All connections are served from a single thread with select(), so a kept-alive connection does not block
+	new ones.
+
+	Attributes:
+		port (int): The port the server listens on.
+		data (dict): The light, mood and screen data of the backend.
+		revision (int): The revision of the data, increased on every change.
+		etag (bool): Whether replies to all/maja carry the revision as ETag and are answered with 304 Not Modified when unchanged.
+		long_poll (bool): Whether an unchanged all/maja request with "Prefer: wait=<seconds>" is held until the data
+						  changes or the wait is over. Changes are noticed within 5 ms.
+		batch (bool): Whether light and screen data can be posted together to all/maja, otherwise that path is not found.
+		keep_alive (bool): Whether connections are kept open between requests.
+		chunked (bool): Whether responses are sent with chunked transfer encoding.
+		rtt_ms (int): A simulated round trip time, spent once per connection and once per response.
+		max_requests (int): The number of requests after which a connection is dropped without notice, None for no limit.
+		requests (int): The number of requests served.
+		posts (int): The number of successful posts.
+		connections (int): The number of connections accepted.
+		bytes_sent (int): The number of bytes sent.
+		bytes_received (int): The number of bytes received.
+
+	Methods:
+		update(section, values): Changes the data, as the app would.
+		stop(): Stops the server.
+	"""
+
+	def __init__(self, port=0, etag=True, long_poll=True, batch=True, keep_alive=True, chunked=False, rtt_ms=0, max_requests=None):
+		self.data = {
+			'light_data': {'hue': 0, 'saturation': 1, 'value': 1, 'time': '2024-01-01T00:00:00'},
+			'mood_data': {'1': {'mood': 'happy', 'social_value': 0.5, 'tired_value': 0.2},
+						  '2': {'mood': 'happy', 'social_value': 0.5, 'tired_value': 0.2}},
+			'screen_data': {'screen_on': 1},
+		}
+		self.revision = 1
+		self.etag = etag
+		self.long_poll = long_poll
+		self.batch = batch
+		self.keep_alive = keep_alive
+		self.chunked = chunked
+		self.rtt_ms = rtt_ms
+		self.max_requests = max_requests
+		self.requests = 0
+		self.posts = 0
+		self.connections = 0
+		self.bytes_sent = 0
+		self.bytes_received = 0
+
+		self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.__sock.bind(('127.0.0.1', port))
+		self.__sock.listen(2)
+		self.port = self.__sock.getsockname()[1]
+		self.__held = []
+		self.__running = True
+		self.__stopped = False
+		_thread.start_new_thread(self.__serve, ())
+
+	def stop(self):
+		"""
+		Stops the server and waits for the server thread to end.
+		"""
+		self.__running = False
+		while not self.__stopped:
+			sleep_ms(10)
+		self.__sock.close()
+
+	def update(self, section, values):
+		"""
+		Changes the data, as the app would.
+
+		Parameters:
+			section (str): 'light_data', 'screen_data' or the user id in 'mood_data'.
+			values (dict): The values to change.
+		"""
+		if section == 'light_data' and 'time' not in values:
+			values['time'] = (datetime(2024, 1, 1) + timedelta(seconds=self.revision)).isoformat()
+		if section in self.data:
+			self.data[section].update(values)
+		else:
+			self.data['mood_data'][section].update(values)
+		self.revision += 1
+
+	def handle(self, path, request):
+		"""
+		Answers a request to the API.
+
+		Parameters:
+			path (str): The path of the request, e.g. /api/v1/all/maja/get.
+			request (dict): The decoded JSON body of the request.
+
+		Returns:
+			dict: The reply to be sent as JSON, None for an unknown path.
+		"""
+		parts = path.strip('/').split('/')
+		subdomain, action = parts[2], parts[-1]
+		if subdomain == 'all' and action == 'get':
+			reply = {'success': True}
+			reply.update(self.data)
+			return reply
+		if subdomain == 'all':
+			if not self.batch:
+				return None
+			light_data, screen_data = request.get('light_data', {}), request.get('screen_data', {})
+		else:
+			light_data = request if subdomain == 'light' else {}
+			screen_data = request if subdomain == 'screen' else {}
+		light_data = {key: light_data[key] for key in ('hue', 'saturation', 'value') if key in light_data}
+		if light_data:
+			self.update('light_data', light_data)
+		if 'screen_on' in screen_data:
+			self.update('screen_data', {'screen_on': screen_data['screen_on']})
+		self.posts += 1
+		return {'success': True}
+
+	def __serve(self):
+		clients = {}
+		while self.__running:
+			readable = select.select([self.__sock] + list(clients), [], [], 0.005 if self.__held else 0.2)[0]
+			for sock in readable:
+				if sock is self.__sock:
+					conn, addr = self.__sock.accept()
+					conn.settimeout(1)
+					self.connections += 1
+					sleep_ms(self.rtt_ms)
+					clients[conn] = [b"", 0]
+					continue
+				try:
+					chunk = sock.recv(1024)
+					keep_open = bool(chunk) and self.__handle_requests(sock, clients[sock], chunk)
+				except OSError:
+					keep_open = False
+				if not keep_open:
+					del clients[sock]
+					sock.close()
+			self.__release_held(clients)
+		for sock in clients:
+			sock.close()
+		self.__stopped = True
+
+	def __handle_requests(self, conn, client, chunk):
+		"""
+		Answers the complete requests received on a connection.
+
+		Parameters:
+			conn (socket): The connection.
+			client (list): The unanswered bytes received on the connection and the number of requests served.
+			chunk (bytes): The bytes just received.
+
+		Returns:
+			bool: Whether the connection stays open.
+		"""
+		client[0] += chunk
+		self.bytes_received += len(chunk)
+		while True:
+			buffer = client[0]
+			end = buffer.find(b"\r\n\r\n")
+			if end < 0:
+				return True
+
+			lines = buffer[:end].decode().split("\r\n")
+			path = lines[0].split(" ")[1]
+			length = 0
+			close = not self.keep_alive
+			revision = None
+			wait = None
+			for line in lines[1:]:
+				name, value = line.split(":", 1)
+				name = name.strip().lower()
+				if name == 'content-length':
+					length = int(value)
+				elif name == 'connection' and value.strip().lower() == 'close':
+					close = True
+				elif name == 'if-none-match':
+					revision = value.strip()
+				elif name == 'prefer' and self.long_poll and value.strip().startswith('wait='):
+					wait = int(value.strip()[5:])
+			if len(buffer) < end+4+length:
+				return True
+			body = buffer[end+4:end+4+length]
+			client[0] = buffer[end+4+length:]
+
+			if wait is not None and self.__etag(path) is not None and revision == self.__etag(path):
+				self.__held.append((conn, client, path, revision, close, wait, ticks_add(ticks_ms(), wait*1000)))
+				return True
+			if not self.__answer(conn, client, path, body, revision, close, wait):
+				return False
+
+	def __answer(self, conn, client, path, body, revision, close, wait):
+		"""
+		Answers a request, with 304 Not Modified if revision is the current ETag.
+
+		Returns:
+			bool: Whether the connection stays open.
+		"""
+		etag = self.__etag(path)
+		status = "200 OK"
+		if etag is not None and revision == etag:
+			reply = None
+		else:
+			reply = self.handle(path, json.loads(body) if body else {})
+			if reply is None:
+				status, reply = "404 Not Found", {'success': False}
+			reply = json.dumps(reply).encode()
+		sleep_ms(self.rtt_ms)
+		self.__send(conn, reply, close, etag, wait, status)
+		self.requests += 1
+		client[1] += 1
+		return not (close or (self.max_requests is not None and client[1] >= self.max_requests))
+
+	def __release_held(self, clients):
+		"""
+		Answers the held long-poll requests whose data changed or whose wait is over.
+		"""
+		held = []
+		for request in self.__held:
+			conn, client, path, revision, close, wait, deadline = request
+			if conn not in clients:
+				continue
+			if revision == self.__etag(path) and ticks_diff(ticks_ms(), deadline) < 0:
+				held.append(request)
+			elif not self.__answer(conn, client, path, b"", revision, close, wait):
+				del clients[conn]
+				conn.close()
+		self.__held = held
+
+	def __etag(self, path):
+		if self.etag and path.endswith('/all/maja/get'):
+			return f'"{self.revision}"'
+		return None
+
+	def __send(self, conn, reply, close, etag=None, wait=None, status="200 OK"):
+		"""
+		Sends a JSON reply, or 304 Not Modified if reply is None.
+		"""
+		head = f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n" if reply is not None else "HTTP/1.1 304 Not Modified\r\n"
+		if close:
+			head += "Connection: close\r\n"
+		if etag is not None:
+			head += f"ETag: {etag}\r\n"
+		if wait is not None:
+			head += f"Preference-Applied: wait={wait}\r\n"
+		if reply is None:
+			response = (head + "\r\n").encode()
+		elif self.chunked:
+			head += "Transfer-Encoding: chunked\r\n\r\n"
+			response = head.encode()
+			for start in range(0, len(reply), 256):
+				part = reply[start:start+256]
+				response += f"{len(part):x}\r\n".encode() + part + b"\r\n"
+			response += b"0\r\n\r\n"
+		else:
+			response = (head + f"Content-Length: {len(reply)}\r\n\r\n").encode() + reply
+		conn.sendall(response)
+		self.bytes_sent += len(response)
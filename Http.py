@@ -0,0 +1,418 @@
+import socket
+import select
+import json
+from time import ticks_ms, ticks_diff, ticks_add
+try:
+	import asyncio
+except ImportError:
+	import uasyncio as asyncio
+
+DNS_TTL = 300000
+MAX_IDLE = 5000
+RECV_SIZE = 1024
+BODY_SIZE = 2048
+ASYNC_POLL_INTERVAL = 10
+EINPROGRESS = (115, 119) # EINPROGRESS on lwIP and on Linux
+
+def loads(body):
+	"""
+	Decodes a JSON response body. MicroPython decodes straight from the buffer, CPython needs a bytes copy.
+	"""
+	if JSON_FROM_BUFFER:
+		return json.loads(body)
+	return json.loads(bytes(body))
+
+try:
+	json.loads(memoryview(b"0"))
+	JSON_FROM_BUFFER = True
+except TypeError:
+	JSON_FROM_BUFFER = False
+
+class HttpConnection():
+	"""
+	A persistent HTTP/1.1 connection to a single host.
+
+	The resolved address is cached for dns_ttl milliseconds and the socket is kept open between requests.
+	The end of every response is found from its Content-Length or chunked encoding, so the next request can
+	reuse the socket. A request on a reused socket that the server closed or reset before answering is sent
+	again on a new connection.
+
+	Responses are received into a preallocated buffer and parsed in place. The body is collected in a second
+	buffer that only grows, and is returned as a memoryview into it, so a response does not allocate copies of
+	its bytes. The body is only valid until the next request.
+
+	Attributes:
+		host (str): The host to connect to.
+		port (int): The port to connect to.
+		timeout (int): The socket timeout in seconds.
+		dns_ttl (int): The time in milliseconds a resolved address is reused.
+		max_idle (int): The time in milliseconds after which an idle socket is closed instead of reused.
+		stats (dict): The number of requests, connects, address lookups and reconnects.
+
+	Methods:
+		request(method, path, body, headers): Sends a request and returns (status code, headers, body).
+		request_async(method, path, body, headers): As request(), but yields to the asyncio loop while waiting.
+		send(method, path, body, headers): Sends a request without waiting for the response.
+		ready(): Returns whether the response to the sent request has started to arrive.
+		read_response(): Reads the response to the sent request, as request() returns it.
+		close(): Closes the socket, the next request opens a new one.
+	"""
+
+	def __init__(self, host, port=80, timeout=10, dns_ttl=DNS_TTL, max_idle=MAX_IDLE):
+		self.host = host
+		self.port = port
+		self.timeout = timeout
+		self.dns_ttl = dns_ttl
+		self.max_idle = max_idle
+		self.stats = {'requests': 0, 'connects': 0, 'lookups': 0, 'reconnects': 0}
+
+		self.__sock = None
+		self.__address = None
+		self.__resolved_time = 0
+		self.__last_used = 0
+		self.__buffer = bytearray(RECV_SIZE)
+		self.__view = memoryview(self.__buffer)
+		self.__start = 0
+		self.__end = 0
+		self.__body = bytearray(BODY_SIZE)
+		self.__body_view = memoryview(self.__body)
+		self.__readinto = None
+		self.__poller = None
+		self.__method = None
+		self.__received = 0
+
+	def request(self, method, path, body=b"", headers=None):
+		"""
+		Sends a request and reads the complete response.
+
+		Parameters:
+			method (str): The HTTP method.
+			path (str): The path of the request.
+			body (bytes or str): The body of the request.
+			headers (dict, optional): Additional request headers.
+
+		Returns:
+			tuple: The status code, the response headers with lower-case names and the body as a memoryview,
+				   which is valid until the next request.
+		"""
+		request = self.__encode(method, path, body, headers)
+		reused = self.__prepare()
+		try:
+			return self.__exchange(method, request)
+		except OSError:
+			self.close()
+			if not reused or self.__received:
+				raise
+		except Exception:
+			self.close()
+			raise
+
+		self.stats['reconnects'] += 1
+		try:
+			return self.__exchange(method, request)
+		except Exception:
+			self.close()
+			raise
+
+	async def request_async(self, method, path, body=b"", headers=None):
+		"""
+		Sends a request as request() does, but connects without blocking and yields to the asyncio loop until the
+		response starts to arrive. The response is then read as request() reads it. The address lookup still
+		blocks when the cached address has expired.
+		"""
+		request = self.__encode(method, path, body, headers)
+		reused = self.__prepare()
+		for attempt in range(2):
+			try:
+				if self.__sock is None:
+					await self.__connect_async()
+				self.__send(method, request)
+				deadline = ticks_add(ticks_ms(), self.timeout*1000)
+				while not self.ready():
+					if ticks_diff(ticks_ms(), deadline) >= 0:
+						raise OSError("Timed out")
+					await asyncio.sleep_ms(ASYNC_POLL_INTERVAL)
+				return self.read_response()
+			except OSError:
+				self.close()
+				if attempt or not reused or self.__received:
+					raise
+				self.stats['reconnects'] += 1
+			except Exception:
+				self.close()
+				raise
+
+	def send(self, method, path, body=b"", headers=None):
+		"""
+		Sends a request without waiting for the response, see ready() and read_response(). The parameters are
+		those of request().
+		"""
+		request = self.__encode(method, path, body, headers)
+		reused = self.__prepare()
+		try:
+			self.__send(method, request)
+			return
+		except OSError:
+			self.close()
+			if not reused:
+				raise
+
+		self.stats['reconnects'] += 1
+		try:
+			self.__send(method, request)
+		except Exception:
+			self.close()
+			raise
+
+	def ready(self):
+		"""
+		Returns whether the response to the request sent with send() has started to arrive, without blocking.
+		"""
+		if self.__end > self.__start:
+			return True
+		if self.__poller is None:
+			self.__poller = select.poll()
+			self.__poller.register(self.__sock, select.POLLIN)
+		return len(self.__poller.poll(0)) > 0
+
+	def read_response(self):
+		"""
+		Reads the response to the request sent with send(), see request().
+		"""
+		try:
+			status_code, headers, body, keep_alive = self.__read_response(self.__method)
+		except Exception:
+			self.close()
+			raise
+		if keep_alive:
+			self.__last_used = ticks_ms()
+		else:
+			self.close()
+		return status_code, headers, body
+
+	def close(self):
+		"""
+		Closes the socket, the next request opens a new one.
+		"""
+		if self.__sock is not None:
+			try:
+				self.__sock.close()
+			except OSError:
+				pass
+			self.__sock = None
+			self.__readinto = None
+			self.__poller = None
+		self.__start = self.__end = 0
+
+	def __encode(self, method, path, body, headers):
+		if isinstance(body, str):
+			body = body.encode()
+		head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+		if headers:
+			for name, value in headers.items():
+				head += f"{name}: {value}\r\n"
+		# A single send, so the body is not held back by Nagle's algorithm on a kept-alive socket
+		return head.encode() + b"\r\n" + body
+
+	def __prepare(self):
+		"""
+		Counts a request and closes the socket if it was idle for too long.
+
+		Returns:
+			bool: Whether the request reuses an open socket.
+		"""
+		self.stats['requests'] += 1
+		if self.__sock is not None and ticks_diff(ticks_ms(), self.__last_used) > self.max_idle:
+			self.close()
+		return self.__sock is not None
+
+	def __send(self, method, request):
+		if self.__sock is None:
+			self.__connect()
+		self.__received = 0
+		self.__method = method
+		self.__sock.sendall(request)
+
+	def __exchange(self, method, request):
+		self.__send(method, request)
+		return self.read_response()
+
+	def __connect(self):
+		address = self.__resolve()
+		sock = socket.socket()
+		sock.settimeout(self.timeout)
+		try:
+			sock.connect(address)
+		except OSError:
+			sock.close()
+			self.__address = None
+			raise
+		self.__sock = sock
+		# MicroPython sockets read into a buffer with readinto(), CPython sockets with recv_into()
+		self.__readinto = getattr(sock, 'recv_into', None) or sock.readinto
+		self.__start = self.__end = 0
+		self.stats['connects'] += 1
+
+	async def __connect_async(self):
+		address = self.__resolve()
+		sock = socket.socket()
+		sock.setblocking(False)
+		try:
+			try:
+				sock.connect(address)
+			except OSError as e:
+				if e.args[0] not in EINPROGRESS:
+					raise
+			poller = select.poll()
+			poller.register(sock, select.POLLOUT)
+			deadline = ticks_add(ticks_ms(), self.timeout*1000)
+			while not poller.poll(0):
+				if ticks_diff(ticks_ms(), deadline) >= 0:
+					raise OSError("Connect timed out")
+				await asyncio.sleep_ms(ASYNC_POLL_INTERVAL)
+		except OSError:
+			sock.close()
+			self.__address = None
+			raise
+		sock.settimeout(self.timeout)
+		self.__sock = sock
+		self.__readinto = getattr(sock, 'recv_into', None) or sock.readinto
+		self.__start = self.__end = 0
+		self.stats['connects'] += 1
+
+	def __resolve(self):
+		if self.__address is None or ticks_diff(ticks_ms(), self.__resolved_time) > self.dns_ttl:
+			self.__address = socket.getaddrinfo(self.host, self.port)[0][-1]
+			self.__resolved_time = ticks_ms()
+			self.stats['lookups'] += 1
+		return self.__address
+
+	def __read_response(self, method):
+		"""
+		Reads the status line, the headers and the body of a response.
+
+		Returns:
+			tuple: The status code, the headers, the body and whether the socket can be reused.
+		"""
+		status_code = 100
+		while 100 <= status_code < 200:
+			status_line = self.__read_line()
+			parts = status_line.split(" ", 2)
+			if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+				raise ValueError(f"Invalid status line: {status_line}")
+			status_code = int(parts[1])
+
+			headers = {}
+			while True:
+				line = self.__read_line()
+				if not line:
+					break
+				split = line.find(":")
+				if split > 0:
+					headers[line[:split].strip().lower()] = line[split+1:].strip()
+
+		keep_alive = parts[0] != "HTTP/1.0" and headers.get('connection', '').lower() != 'close'
+		if method == "HEAD" or status_code in (204, 304):
+			length = 0
+		elif 'chunked' in headers.get('transfer-encoding', '').lower():
+			length = self.__read_chunked()
+		elif 'content-length' in headers:
+			length = int(headers['content-length'])
+			self.__read_body(0, length)
+		else:
+			length = self.__read_until_closed()
+			keep_alive = False
+		return status_code, headers, self.__body_view[:length], keep_alive
+
+	def __read_chunked(self):
+		length = 0
+		while True:
+			size = int(self.__read_line().split(";")[0], 16)
+			if size == 0:
+				while self.__read_line():
+					pass
+				return length
+			self.__read_body(length, size)
+			length += size
+			self.__read_line()
+
+	def __read_until_closed(self):
+		length = self.__end - self.__start
+		self.__reserve(length)
+		self.__body[:length] = self.__view[self.__start:self.__end]
+		self.__start = self.__end = 0
+		while True:
+			self.__reserve(length + RECV_SIZE)
+			received = self.__recv_into(self.__body_view[length:])
+			if not received:
+				return length
+			length += received
+
+	def __read_line(self):
+		"""
+		Returns the next line of the response without its line ending, decoded to a str.
+		"""
+		buffer = self.__buffer
+		scan = self.__start
+		while True:
+			while scan < self.__end:
+				if buffer[scan] == 10:
+					line_end = scan-1 if scan > self.__start and buffer[scan-1] == 13 else scan
+					line = str(self.__view[self.__start:line_end], 'utf-8')
+					self.__start = scan+1
+					return line
+				scan += 1
+			scan -= self.__start
+			self.__fill()
+			scan += self.__start
+
+	def __read_body(self, offset, size):
+		"""
+		Reads size bytes of body into the body buffer at offset, first from the receive buffer and then
+		straight from the socket.
+		"""
+		self.__reserve(offset + size)
+		buffered = min(self.__end - self.__start, size)
+		self.__body[offset:offset+buffered] = self.__view[self.__start:self.__start+buffered]
+		self.__start += buffered
+		offset += buffered
+		size -= buffered
+		while size > 0:
+			received = self.__recv_into(self.__body_view[offset:offset+size])
+			if not received:
+				raise OSError("Connection closed")
+			offset += received
+			size -= received
+
+	def __reserve(self, size):
+		"""
+		Grows the body buffer to hold at least size bytes, it is kept for the next responses.
+		"""
+		if size > len(self.__body):
+			body = bytearray(max(size, 2*len(self.__body)))
+			body[:len(self.__body)] = self.__body
+			self.__body = body
+			self.__body_view = memoryview(body)
+
+	def __fill(self):
+		"""
+		Receives more data into the receive buffer, moving the unread data to the front when the end is reached.
+		"""
+		if self.__start == self.__end:
+			self.__start = self.__end = 0
+		elif self.__end == len(self.__buffer):
+			if self.__start == 0:
+				raise ValueError("Response line too long")
+			unread = self.__end - self.__start
+			self.__buffer[:unread] = self.__view[self.__start:self.__end]
+			self.__start, self.__end = 0, unread
+		received = self.__recv_into(self.__view[self.__end:])
+		if not received:
+			raise OSError("Connection closed")
+		self.__end += received
+
+	def __recv_into(self, view):
+		received = self.__readinto(view)
+		if received:
+			self.__received += received
+		return received
@@ -0,0 +1,162 @@
+"""
+A crash-safe journal of the status of the face and the lamp.
+
+The status is stored as a fixed binary record in two slot files. Record n is written to slot n % 2, so the other slot
+always holds the record before it. A record that was cut short by a power loss fails its checksum and the other slot
+is loaded instead. Nothing is removed before it is replaced.
+"""
+import os
+import json
+import struct
+from utime import ticks_ms, ticks_diff
+
+STATE_KEYS = ('x', 'y', 'eye_open', 'eyebrow_angle', 'under_eye_lid', 'left_right', 'mouth_width', 'mouth_y',
+			  'smile', 'cheeks', 'smirk', 'yawn', 'hue', 'saturation', 'value')
+MAGIC = b'MJ'
+VERSION = 1
+# Magic, version, number of values, sequence number, the values in the order of STATE_KEYS, checksum
+RECORD = '<2sBBI%dfH' % len(STATE_KEYS)
+RECORD_SIZE = struct.calcsize(RECORD)
+SLOTS = ('state_a.bin', 'state_b.bin')
+LEGACY_FILE = 'state.json'
+MIN_INTERVAL = 60000
+
+def checksum(data, length):
+	"""
+	Returns the Fletcher-16 checksum of the first length bytes of data.
+	"""
+	low = high = 0
+	for i in range(length):
+		low = (low + data[i]) % 255
+		high = (high + low) % 255
+	return high << 8 | low
+
+class State_Journal():
+	"""
+	Stores the status in A/B slot files, only when it changed and at most once per min_interval.
+
+	The status is first staged into a preallocated record, which is cheap enough to do under the state lock, and
+	written afterwards without it.
+
+	Attributes:
+		slots (tuple): The paths of the two slot files.
+		legacy (str): The JSON file of older versions, loaded when no slot is valid and removed after the first write.
+		min_interval (int): The minimum time between two writes in milliseconds, unless a write is forced.
+		sequence (int): The sequence number of the last record written or loaded, -1 if none.
+		writes (int): The number of records written.
+		skipped (int): The number of writes skipped because the record did not change.
+
+	Methods:
+		exists(): Returns whether a saved state exists.
+		load(): Returns the newest valid saved status.
+		stage(status): Packs a status into the record, returns whether it differs from the saved one.
+		write(force): Writes the staged record if it changed and min_interval has passed.
+	"""
+
+	def __init__(self, slots=SLOTS, legacy=LEGACY_FILE, min_interval=MIN_INTERVAL):
+		self.slots = slots
+		self.legacy = legacy
+		self.min_interval = min_interval
+		self.sequence = -1
+		self.writes = 0
+		self.skipped = 0
+		self.__record = bytearray(RECORD_SIZE)
+		self.__saved = bytearray(RECORD_SIZE)
+		self.__values = [0.0]*len(STATE_KEYS)
+		self.__last_write = None
+
+	def exists(self):
+		for path in self.slots if self.legacy is None else self.slots + (self.legacy,):
+			try:
+				os.stat(path)
+				return True
+			except OSError:
+				pass
+		return False
+
+	def load(self):
+		"""
+		Returns the status of the valid slot with the highest sequence number, or of the legacy JSON file if no slot
+		is valid, or None if there is no saved state.
+		"""
+		status = None
+		for path in self.slots:
+			try:
+				with open(path, 'rb') as file:
+					record = file.read(RECORD_SIZE)
+			except OSError:
+				continue
+			if len(record) != RECORD_SIZE:
+				print(f"Journal slot {path} is incomplete")
+				continue
+			magic, version, count, sequence = struct.unpack_from('<2sBBI', record)
+			if magic != MAGIC or version != VERSION or count != len(STATE_KEYS) or struct.unpack_from('<H', record, RECORD_SIZE-2)[0] != checksum(record, RECORD_SIZE-2):
+				print(f"Journal slot {path} is invalid")
+				continue
+			if sequence > self.sequence:
+				self.sequence = sequence
+				self.__saved[:] = record
+				values = struct.unpack_from('<%df' % len(STATE_KEYS), record, 8)
+				status = {key: values[i] for i, key in enumerate(STATE_KEYS)}
+		if status is not None or self.legacy is None:
+			return status
+
+		try:
+			with open(self.legacy, 'r') as file:
+				return json.load(file)
+		except (OSError, ValueError):
+			return None
+
+	def stage(self, status):
+		"""
+		Packs a status into the record. Missing keys are stored as 0.
+
+		Returns:
+			bool: Whether the record differs from the one saved last.
+		"""
+		values = self.__values
+		for i in range(len(STATE_KEYS)):
+			values[i] = status.get(STATE_KEYS[i], 0)
+		struct.pack_into(RECORD, self.__record, 0, MAGIC, VERSION, len(STATE_KEYS), self.sequence+1, *values, 0)
+		changed = self.__record[8:RECORD_SIZE-2] != self.__saved[8:RECORD_SIZE-2]
+		if not changed:
+			self.skipped += 1
+		return changed
+
+	def write(self, force=False):
+		"""
+		Writes the staged record into the slot of its sequence number.
+
+		Parameters:
+			force (bool): Write even if min_interval has not passed since the last write, e.g. before a reset.
+
+		Returns:
+			bool: Whether the saved state is now the staged one: True if it was written or did not change, False if
+				  the write was postponed or failed.
+		"""
+		if self.__record[8:RECORD_SIZE-2] == self.__saved[8:RECORD_SIZE-2]:
+			return True
+		if not force and self.__last_write is not None and ticks_diff(ticks_ms(), self.__last_write) < self.min_interval:
+			return False
+
+		sequence = self.sequence+1
+		struct.pack_into('<I', self.__record, 4, sequence)
+		struct.pack_into('<H', self.__record, RECORD_SIZE-2, checksum(self.__record, RECORD_SIZE-2))
+		try:
+			with open(self.slots[sequence % 2], 'wb') as file:
+				file.write(self.__record)
+		except OSError as e:
+			print(f"Failed to write the journal: {e}")
+			return False
+		self.sequence = sequence
+		self.__saved[:] = self.__record
+		self.__last_write = ticks_ms()
+		self.writes += 1
+
+		if self.legacy is not None:
+			try:
+				os.remove(self.legacy)
+			except OSError:
+				pass
+			self.legacy = None
+		return True
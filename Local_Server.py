@@ -0,0 +1,186 @@
+"""
+The local server of setup mode, which serves the pages to enter the WiFi network and user id with. It is only imported
+when no secrets are saved, so its pages do not take up memory otherwise.
+"""
+import network
+import time
+import json
+import socket
+import machine
+from Webserver import Webserver, Secrets
+
+html_success = """<!DOCTYPE html>
+<html>
+<head>
+	<title>Maja</title>
+	<meta name="viewport" content="width=device-width, initial-scale=1">
+	<style>
+		body {
+			font-family: Arial, sans-serif;
+			margin: 0;
+			padding: 0;
+			background-color: #C0F9B3FF;
+		}
+		.container {
+			width: 80%;
+			margin: 0 auto;
+			padding: 20px;
+			background-color: #fff;
+			border-radius: 5px;
+			box-shadow: 0 2px 5px rgba(0, 0, 0, 0.1);
+			margin-top: 50px;
+		}
+	</style>
+</head>
+<body>
+	<div class="container">
+		<h1>Data has been passed to Maja</h1>
+		<p>Maja will now try to connect. It will blink green if it worked. If it didn't connect correctly, it will blink red.</p>
+	</div>
+</body>
+</html>
+"""
+
+html_fail = """<!DOCTYPE html>
+<html>
+<head>
+	<title>Maja</title>
+	<meta name="viewport" content="width=device-width, initial-scale=1">
+	<style>
+		body {
+			font-family: Arial, sans-serif;
+			margin: 0;
+			padding: 0;
+			background-color: #E49696FF;
+		}
+		.container {
+			width: 80%;
+			margin: 0 auto;
+			padding: 20px;
+			background-color: #fff;
+			border-radius: 5px;
+			box-shadow: 0 2px 5px rgba(0, 0, 0, 0.1);
+			margin-top: 50px;
+		}
+	</style>
+</head>
+<body>
+	<div class="container">
+		<h1>Connection failed</h1>
+		<p>Something went wrong. Try again in a bit.</p>
+	</div>
+</body>
+</html>
+"""
+
+class Local_Server():
+	"""
+	A class to manage the local server for the lamp to setup the WiFi connection.
+	"""
+
+	def __init__(self, Lights=None):
+		"""
+		Initializes a new Local_Server instance.
+		"""
+		self.Lights = Lights
+
+		self.setup_network()
+		self.website()
+
+	def remove_network(self):
+		ap = network.WLAN(network.AP_IF)
+		ap.active(False)
+		print("AP Mode Is Deactivated")
+
+	def setup_network(self):
+		ap = network.WLAN(network.AP_IF)
+		ap.config(essid='Maja', security=0)
+		ap.ifconfig(('192.168.4.1', '255.255.255.0', '192.168.4.1', '8.8.8.8'))
+		time.sleep_ms(500)
+		ap.active(True)
+
+		while ap.active() == False:
+			pass
+		print('AP Mode Is Active, You can Now Connect')
+		print('IP Address To Connect to:: ' + ap.ifconfig()[0])
+
+	def blink(self, colour, N=0.3, T=4):
+		if self.Lights is not None:
+			self.Lights.blink(colour, n=N, T=T)
+
+	def website(self):
+		"""
+		Displays a simple HTML webpage with a welcome message.
+		"""
+		s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		s.bind(('', 80))
+		s.listen(5)
+
+		if self.Lights:
+			self.Lights.set_hsv((230, 1, 1))
+
+		while True:
+
+			conn, addr = s.accept()
+			print('Got a connection from %s' % str(addr))
+			request = conn.recv(1024)
+			request = str(request)
+			print(f"Content = {request}")
+
+			start = request.find('?input=') + len('?input=')
+			end = request.find('?end')
+			if start == -1 or end == -1:
+				self.show_page(conn, html_fail)
+			else:
+				json_string = request[start:end]
+				print(f"json_string: {json_string}")
+				try:
+					print(json_string.replace("%22", '"').replace("%20", ""))
+					json_dict = json.loads(json_string.replace("%22", '"').replace("%20", ""))
+				except ValueError:
+					json_dict = None
+
+				if json_dict is None:
+					print("Failed to parse JSON")
+					self.show_page(conn, html_fail)
+				else:
+					user_id = json_dict.get('user_id', None)
+					ssid = json_dict.get('ssid', None)
+					password = json_dict.get('password', None)
+					print(f"user_id: {user_id}, SSID: {ssid}, Password: {password}")
+
+					if user_id is None or ssid is None or password is None:
+						self.show_page(conn, html_fail)
+					else:
+						self.show_page(conn, html_success)
+						ws = Webserver(user_id=user_id, ssid=ssid, password=password)
+						ws.connect()
+						Secrets().save_secrets(json_dict)
+						machine.reset()
+
+	def show_page(self, conn, html):
+		"""
+		Sends an HTML page to the client.
+
+		Parameters:
+			conn (socket): The socket connection to the client.
+			html (str): The HTML content to send to the client.
+		"""
+		response = 'HTTP/1.1 200 OK\n'
+		response += 'Content-Type: text/html\n'
+		response += '\n'
+		response += html
+		conn.send(response)
+		conn.close()
+
+	def parse_query_string(self, query_string):
+		"""
+		Parses the query string into a dictionary.
+		"""
+		params = {}
+		pairs = query_string.split('&')
+		for pair in pairs:
+			if '=' in pair:
+				key, value = pair.split('=')
+				params[key] = value
+		return params
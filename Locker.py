@@ -1,6 +1,100 @@
 import _thread
 from time import ticks_ms, ticks_diff, sleep_ms
 
+LOCK_STATS = {}
+
+def lock_stats():
+    """
+    Returns the contention statistics of all named locks.
+
+    Returns:
+        dict: Per lock name the number of acquisitions, the number of acquisitions that had to wait,
+              the number of timeouts, and the total and maximum wait in milliseconds.
+    """
+    return {name: {'acquisitions': stats[0], 'waits': stats[1], 'timeouts': stats[2], 'total_wait': stats[3], 'max_wait': stats[4]}
+            for name, stats in LOCK_STATS.items()}
+
+def acquire_lock(lock, timeout):
+    """
+    Acquires a _thread lock, giving up after timeout milliseconds.
+
+    The MicroPython port ignores the timeout argument of lock.acquire(), so the lock is polled with
+    non-blocking acquires and the thread sleeps in between instead of spinning.
+
+    Parameters:
+        lock (_thread.lock): The lock to acquire.
+        timeout (int): The timeout in milliseconds.
+
+    Returns:
+        int: The time waited in milliseconds, or -1 if the lock was not acquired.
+    """
+    if lock.acquire(0):
+        return 0
+    start_time = ticks_ms()
+    while not lock.acquire(0):
+        if ticks_diff(ticks_ms(), start_time) > timeout:
+            return -1
+        sleep_ms(1)
+    return ticks_diff(ticks_ms(), start_time)
+
+class NamedLock:
+    """
+    A re-entrant lock that records contention statistics under its name.
+
+    The thread holding the lock can acquire it again, so methods that take the lock can call each other.
+
+    Attributes:
+        name (str): The name the statistics are recorded under.
+        lock (_thread.lock): The underlying lock.
+        owner (int): The identifier of the thread holding the lock, None if it is free.
+        depth (int): The number of times the owner acquired the lock.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = _thread.allocate_lock()
+        self.owner = None
+        self.depth = 0
+        self.__stats = LOCK_STATS.setdefault(name, [0, 0, 0, 0, 0])
+
+    def acquire(self, timeout=10000):
+        """
+        Acquires the lock, giving up after timeout milliseconds.
+
+        Returns:
+            bool: True if the lock was acquired.
+        """
+        thread_id = _thread.get_ident()
+        if self.owner == thread_id:
+            self.depth += 1
+            return True
+
+        waited = acquire_lock(self.lock, timeout)
+        stats = self.__stats
+        if waited < 0:
+            stats[1] += 1
+            stats[2] += 1
+            stats[3] += timeout
+            stats[4] = max(stats[4], timeout)
+            return False
+        stats[0] += 1
+        if waited > 0:
+            stats[1] += 1
+            stats[3] += waited
+            stats[4] = max(stats[4], waited)
+        self.owner = thread_id
+        self.depth = 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            self.lock.release()
+
+    def locked(self):
+        return self.lock.locked()
+
 class ConditionalLock:
     """
     A context manager for conditional locking.
@@ -8,7 +102,7 @@ class ConditionalLock:
     This class is designed to manage a lock conditionally, based on a given condition. It can be used to control access to a shared resource only under certain conditions, thereby providing more flexibility than a standard lock.
 
     Attributes:
-        lock (_thread.lock): The lock object to be managed.
+        lock (NamedLock or _thread.lock): The lock object to be managed.
         condition (bool): The condition that determines whether the lock should be acquired or released.
         timeout (int): The timeout for acquiring the lock in milliseconds.
 
@@ -24,7 +118,7 @@ class ConditionalLock:
         Initializes the ConditionalLock with a lock, a condition, and a timeout.
 
         Parameters:
-            lock (_thread.lock): The lock object to be managed.
+            lock (NamedLock or _thread.lock): The lock object to be managed. A NamedLock is re-entrant and records contention statistics.
             condition (bool): The condition that determines whether the lock should be acquired or released. Defaults to True.
             timeout (int): The timeout for acquiring the lock in milliseconds. Defaults to 10000 milliseconds (10 seconds).
         """
@@ -35,17 +129,19 @@ class ConditionalLock:
 
     def __enter__(self):
         """
-        Acquires the lock if the condition is True.
+        Acquires the lock if the condition is True, waiting at most timeout milliseconds.
 
         This method is automatically called when entering the context managed by this class.
+
+        Returns:
+            bool: False if the lock could not be acquired within the timeout, True otherwise.
         """
         if self.condition:
-            start_time = ticks_ms()
-            while self.lock.locked():
-                if ticks_diff(ticks_ms(), start_time) > self.timeout:
-                    return False
-            self.lock.acquire()
-            self.acquired = True
+            if isinstance(self.lock, NamedLock):
+                self.acquired = self.lock.acquire(self.timeout)
+            else:
+                self.acquired = acquire_lock(self.lock, self.timeout) >= 0
+            return self.acquired
         return True
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -61,4 +157,4 @@ class ConditionalLock:
         """
         if self.condition and self.acquired:
             self.lock.release()
-            self.acquired = False
\ No newline at end of file
+            self.acquired = False
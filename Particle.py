@@ -1,7 +1,10 @@
 from math import sin, cos, pi
-from utime import ticks_ms, ticks_diff
+from utime import ticks_ms, ticks_diff, ticks_add
+from array import array
 import random
 
+DEAD = 255
+
 def manhattan_distance(point_1, point_2):
 	return (abs(point_1[0]-point_2[0]) + abs(point_1[1]-point_2[1]))
 
@@ -10,109 +13,244 @@ def distance(point_1, point_2):
 
 
 class Particle_Queue():
+	"""
+	Holds the particles on the face and the particles that are scheduled to spawn later.
+
+	Scheduled spawns are kept in a min-heap on their absolute spawn tick, compared with ticks_diff so the
+	order survives the wraparound of ticks_ms().
+	"""
+
 	def __init__(self):
-		self.__particles = []
-		self.__particle_queue = {}
+		self.__particles = ParticleSystem()
+		self.__due = []
+		self.__spawns = []
 
 	def get_particles(self):
 		self.__check_queue()
 		return self.__particles
 
-	def add_particle(self, particle):
-		self.__particles.append(particle)
+	def add_particle(self, shape, spawn, scale=1, speed=None, accel=0):
+		self.__particles.spawn(shape, spawn, scale, speed, accel)
 
-	def queue_particle(self, particle, time_ms):
-		self.__particle_queue[particle] = {'time': time_ms, 'start_time': ticks_ms()}
+	def queue_particle(self, shape, spawn, time_ms, scale=1, speed=None, accel=0):
+		self.__due.append(ticks_add(ticks_ms(), int(time_ms)))
+		self.__spawns.append((shape, spawn, scale, speed, accel))
+		self.__sift_up(len(self.__due)-1)
 
 	def running(self):
 		self.__check_queue()
-		return len(self.__particles)>0
+		return self.__particles.count>0
+
+	def next_spawn_in_ms(self):
+		"""
+		Returns the number of milliseconds until the next scheduled spawn, or None if nothing is scheduled.
+		"""
+		if not self.__due:
+			return None
+		return max(ticks_diff(self.__due[0], ticks_ms()), 0)
 
 	def __check_queue(self):
-		for particle, time_dict in self.__particle_queue.items():
-			if ticks_diff(ticks_ms(), time_dict['start_time'])>=time_dict['time']:
-				particle.reset_time()
-				self.__particles.append(particle)
-				self.__particle_queue.pop(particle, None)
-		
-
-class Particle():
-	def __init__(self, spawn, center, points, radii, colour=1):
-		"""
-		spawn: (x, y, orientation)
-		center: (x, y)
-		points: list of points
-		radii: list of radii
-		"""
-
-		self.points = list(points)
-		self.__points_org = list(points)
-		self.radii = list(radii)
-		self.__radii_org = list(radii)
-		self.__colour = colour
-
-		self.__scale = 1
-		self.__center = center
-		self.__location = spawn[0:2]
-		self.__orientation = spawn[2]  # Initial orientation in radians
-		self.velocities = (lambda t: 40, lambda t: sin(t*4))  # (forward_velocity, angular_velocity)
-
-		self.__saved_time = ticks_ms()
-		self.bounding = ((0,0), (1,1))
-
-	def scale(self, scale):
-		for i in range(len(self.__points_org)):
-			# Calculate the vector from the center to the point
-			vector = (self.__points_org[i][0] - self.__center[0], self.__points_org[i][1] - self.__center[1])
-			scaled_vector = (vector[0] * scale, vector[1] * scale)
-
-			self.points[i] = (int(self.__center[0] + scaled_vector[0]), int(self.__center[1] + scaled_vector[1]))
-			self.radii[i] = int(self.__radii_org[i] * scale)
-			self.__scale = scale
-
-	def save_bounding(self, bounding):
-		self.bounding = bounding
-
-	def get_bounding(self):
-		return self.bounding
-
-	def reset_time(self):
-		self.__saved_time = ticks_ms()
-
-	def get_particle(self):
-		time_diff = ticks_diff(ticks_ms(), self.__saved_time)
-		self.__saved_time = ticks_ms()
-
-		self.__orientation += self.velocities[1](ticks_ms()/1000) * time_diff / 1000
-
-		dx = self.velocities[0](ticks_ms()/1000) * cos(self.__orientation) * time_diff / 1000
-		dy = self.velocities[0](ticks_ms()/1000) * sin(self.__orientation) * time_diff / 1000
-		self.__location = (self.__location[0] + dx, self.__location[1] + dy)
-
-		return ((int(self.__location[0] - self.__center[0] * self.__scale), int(self.__location[1] - self.__center[1] * self.__scale)), self.points, self.radii, self.__colour)
-
-class Heart(Particle):
-	def __init__(self, spawn):
-		points = ((0,0), (int(0.34*30), int(-0.93*30)), 
-				(int(0.8*30), int(0.2*30)), (0, int(1*30)), 
-				(int(-0.8*30), int(0.2*30)), (int(-0.34*30), int(-0.93*30)))
-		radii = (0, 10, 15, 0, 15, 10)
-		super().__init__(spawn, (30,30), points, radii, colour=2)
-
-class Tear(Particle):
-	def __init__(self, spawn):
-		points = ((15,0), (int(1*15+15), int(1.8*15)), 
-				(int(15), int(2.5*15)), (0, int(1.8*15)))
-		radii = (0, 10, 5, 10)
-		super().__init__(spawn, (15, 2.5/2*15), points, radii)
-		self.velocities = (lambda t: 60, lambda t: sin(t*4+random.choice([0, pi])))
-
-class Z(Particle):
-	def __init__(self, spawn):
-		points = ((-30, -30), (30, -30), 
-			(30, -20), (-10,20), 
+		current_time = ticks_ms()
+		while self.__due and ticks_diff(current_time, self.__due[0]) >= 0:
+			self.__particles.spawn(*self.__pop())
+
+	def __pop(self):
+		"""
+		Removes the earliest scheduled spawn from the heap and returns its arguments.
+		"""
+		spawn = self.__spawns[0]
+		due = self.__due.pop()
+		last = self.__spawns.pop()
+		if self.__due:
+			self.__due[0] = due
+			self.__spawns[0] = last
+			self.__sift_down(0)
+		return spawn
+
+	def __sift_up(self, i):
+		due = self.__due
+		while i > 0:
+			parent = (i-1) >> 1
+			if ticks_diff(due[i], due[parent]) >= 0:
+				break
+			self.__swap(i, parent)
+			i = parent
+
+	def __sift_down(self, i):
+		due = self.__due
+		length = len(due)
+		while True:
+			child = 2*i+1
+			if child >= length:
+				break
+			if child+1 < length and ticks_diff(due[child+1], due[child]) < 0:
+				child += 1
+			if ticks_diff(due[child], due[i]) >= 0:
+				break
+			self.__swap(i, child)
+			i = child
+
+	def __swap(self, i, j):
+		self.__due[i], self.__due[j] = self.__due[j], self.__due[i]
+		self.__spawns[i], self.__spawns[j] = self.__spawns[j], self.__spawns[i]
+
+
+class Shape():
+	"""
+	A particle shape template, shared by all particles of that shape.
+
+	Attributes:
+		points (tuple): The corner points of the shape.
+		radii (tuple): The corner radii of the shape.
+		center (tuple): The point the shape is scaled around and moves with.
+		colour (int): The palette index of the shape.
+		speed (float): The default forward velocity in pixels per second.
+		phases (tuple): The phases of the angular velocity, one is picked at random per particle.
+	"""
+
+	def __init__(self, points, radii, center, colour=1, speed=40, phases=(0,)):
+		self.points = tuple(points)
+		self.radii = tuple(radii)
+		self.center = center
+		self.colour = colour
+		self.speed = speed
+		self.phases = phases
+		self.__variants = {}
+
+	def variant(self, scale):
+		"""
+		Returns the index of the scaled variant of the shape in VARIANTS, creating it on first use.
+
+		A variant is (points, radii, colour, center_x, center_y, min_x, min_y, max_x, max_y), where the
+		extents are relative to the origin the polygon is drawn at.
+		"""
+		key = round(scale*100)
+		index = self.__variants.get(key)
+		if index is None:
+			scale = key/100
+			points = tuple((int(self.center[0] + (point[0]-self.center[0])*scale), int(self.center[1] + (point[1]-self.center[1])*scale)) for point in self.points)
+			radii = tuple(int(radius*scale) for radius in self.radii)
+			VARIANTS.append((points, radii, self.colour, self.center[0]*scale, self.center[1]*scale,
+							min(point[0] for point in points), min(point[1] for point in points),
+							max(point[0] for point in points), max(point[1] for point in points)))
+			index = len(VARIANTS)-1
+			self.__variants[key] = index
+		return index
+
+VARIANTS = []
+
+Heart = Shape(((0,0), (int(0.34*30), int(-0.93*30)),
+			(int(0.8*30), int(0.2*30)), (0, int(1*30)),
+			(int(-0.8*30), int(0.2*30)), (int(-0.34*30), int(-0.93*30))),
+			(0, 10, 15, 0, 15, 10), (30,30), colour=2)
+
+Tear = Shape(((15,0), (int(1*15+15), int(1.8*15)),
+			(int(15), int(2.5*15)), (0, int(1.8*15))),
+			(0, 10, 5, 10), (15, 2.5/2*15), speed=60, phases=(0, pi))
+
+Z = Shape(((-30, -30), (30, -30),
+			(30, -20), (-10,20),
 			(30, 20), (30, 30),
-			(-30, 30), (-30, 20), 
-			(10, -20), (-30, -20))
-		radii = (2, 2, 2, 0, 2, 2, 2, 2, 0, 2)
-		super().__init__(spawn, (0,0), points, radii, colour=1)
+			(-30, 30), (-30, 20),
+			(10, -20), (-30, -20)),
+			(2, 2, 2, 0, 2, 2, 2, 2, 0, 2), (0,0), colour=1)
+
+
+class ParticleSystem():
+	"""
+	Stores all particles in preallocated array columns and advances them together.
+
+	Every particle moves forward along its orientation, while the orientation itself wobbles with
+	sin(4t + phase). The forward velocity is speed + accel*age^3.
+
+	Attributes:
+		count (int): The number of particles alive, stored in the first count slots of every column.
+		x, y (array): The location of each particle.
+		orientation (array): The heading of each particle in radians.
+		scale (array): The scale of each particle.
+		variant (array): The index of the scaled shape in VARIANTS.
+		rect_x, rect_y, rect_w, rect_h (array): The rectangle of each particle on screen, width 0 if none.
+	"""
+
+	def __init__(self, capacity=64):
+		self.count = 0
+		self.__last_time = ticks_ms()
+		self.__allocate(capacity)
+
+	def spawn(self, shape, spawn, scale=1, speed=None, accel=0):
+		"""
+		Spawns a particle.
+
+		:param shape: The Shape of the particle.
+		:param spawn: (x, y, orientation) of the particle.
+		:param scale: The scale of the shape.
+		:param speed: The forward velocity in pixels per second, defaults to the speed of the shape.
+		:param accel: The cubic growth of the forward velocity over the age of the particle.
+		"""
+		if self.count == 0:
+			# advance() is not called while nothing is drawn, the first particle after that starts from now
+			self.__last_time = ticks_ms()
+		if self.count == len(self.x):
+			self.__allocate(2*self.count)
+		i = self.count
+		self.x[i] = spawn[0]
+		self.y[i] = spawn[1]
+		self.orientation[i] = spawn[2]
+		self.scale[i] = scale
+		self.speed[i] = shape.speed if speed is None else speed
+		self.accel[i] = accel
+		self.phase[i] = random.choice(shape.phases)
+		self.age[i] = 0
+		self.variant[i] = shape.variant(scale)
+		self.rect_w[i] = 0
+		self.count += 1
+
+	def advance(self):
+		"""
+		Moves all particles to the current time, using a single timestamp.
+		"""
+		current_time = ticks_ms()
+		time_diff = ticks_diff(current_time, self.__last_time) / 1000
+		self.__last_time = current_time
+		t = current_time / 1000
+		for i in range(self.count):
+			self.orientation[i] += sin(t*4+self.phase[i]) * time_diff
+			self.age[i] += time_diff
+			velocity = self.speed[i] + self.accel[i]*self.age[i]**3
+			self.x[i] += velocity * cos(self.orientation[i]) * time_diff
+			self.y[i] += velocity * sin(self.orientation[i]) * time_diff
+
+	def kill(self, i):
+		"""
+		Marks a particle as dead, it is removed by the next compact().
+		"""
+		self.variant[i] = DEAD
+
+	def compact(self):
+		"""
+		Removes dead particles by moving the living ones to the front of the columns.
+		"""
+		kept = 0
+		for i in range(self.count):
+			if self.variant[i] != DEAD:
+				if kept != i:
+					for column in self.__columns:
+						column[kept] = column[i]
+				kept += 1
+		self.count = kept
+
+	def __allocate(self, capacity):
+		"""
+		Allocates the columns for capacity particles, keeping the particles that are alive.
+		"""
+		columns = []
+		for typecode in 'ffffffffBhhhh':
+			column = array(typecode, [0]*capacity)
+			columns.append(column)
+		if self.count:
+			for old, new in zip(self.__columns, columns):
+				for i in range(self.count):
+					new[i] = old[i]
+		self.__columns = columns
+		(self.x, self.y, self.orientation, self.scale, self.speed, self.accel, self.phase,
+			self.age, self.variant, self.rect_x, self.rect_y, self.rect_w, self.rect_h) = columns
@@ -3,18 +3,28 @@ from math import cos, sin, pi
 from shapeDrawer import shapeDrawer
 import gc
 import micropython as mp
+from array import array
 from tft_config import SCREEN_SIZE, rgb_to_rgb565
-from Particle import *
+from Particle import VARIANTS
 from time import sleep
+import Trace
 
 COLOURS = {'BLACK': 0x0000, 'WHITE': rgb_to_rgb565(230, 230, 230), 'RED': 0xF800, 'GREEN': 0x07E0, 'BLUE': 0x001F, 'CYAN': 0x07FF, 'MAGENTA': 0xF81F, 'YELLOW': 0xFFE0, 'PINK': 0xF810}
+PALETTE = (COLOURS['BLACK'], COLOURS['WHITE'], COLOURS['PINK'], COLOURS['BLUE'])
 
-def bound_to_rect(bound):
-	# TODO: add_bound in c function draw_boundary
-	return (clamp_coordinates(bound[0][0]-1, bound[0][1]-1), (min(bound[1][0]-bound[0][0]+4, SCREEN_SIZE[0]-bound[0][0]+1), min(bound[1][1]-bound[0][1]+4, SCREEN_SIZE[1]-bound[0][1]+1)))
+MAX_DAMAGE = 16
+# A collection is only forced before the bitmap is fetched when less heap than this is free
+RENDER_HEADROOM = 32*1024
 
-def clamp_coordinates(x, y):
-	return (max(min(x, SCREEN_SIZE[0]+1), 0), max(min(y, SCREEN_SIZE[1]+1), 0))
+def write_bound(rect, min_x, min_y, max_x, max_y):
+	"""
+	Writes the screen rectangle (x, y, width, height) around a bound into rect, with a margin for the rounded corners.
+	"""
+	# TODO: add_bound in c function draw_boundary
+	rect[0] = max(min(min_x-1, SCREEN_SIZE[0]+1), 0)
+	rect[1] = max(min(min_y-1, SCREEN_SIZE[1]+1), 0)
+	rect[2] = min(max_x-min_x+4, SCREEN_SIZE[0]-min_x+1)
+	rect[3] = min(max_y-min_y+4, SCREEN_SIZE[1]-min_y+1)
 
 def calculate_bound(points, offset = (0,0)):
 	min_x = int(min(points, key=lambda x: x[0])[0]+offset[0])
@@ -23,6 +33,12 @@ def calculate_bound(points, offset = (0,0)):
 	max_y = int(max(points, key=lambda x: x[1])[1]+offset[1])
 	return ((min_x, min_y), (max_x, max_y))
 
+def quantize(value, scale, low, high):
+	"""
+	Quantizes a status value to whole steps of 1/scale, clamped to [low, high].
+	"""
+	return max(min(round(value*scale), high), low)
+
 def overwrite_bound(bound, points, offset = (0,0)):
 	min_x = min(int(min(points, key=lambda x: x[0])[0]+offset[0]), bound[0][0][0])
 	min_y = min(int(min(points, key=lambda x: x[1])[1]+offset[1]), bound[0][0][1])
@@ -30,6 +46,132 @@ def overwrite_bound(bound, points, offset = (0,0)):
 	max_y = max(int(max(points, key=lambda x: x[1])[1]+offset[1]), bound[0][1][1])
 	return ((min_x, min_y), (max_x, max_y))
 
+GEOMETRY_CACHE_SIZE = 32
+
+EYE_KEYS = ('x', 'y', 'eye_open', 'eyebrow_angle', 'under_eye_lid', 'left_right')
+MOUTH_KEYS = ('x', 'y', 'mouth_width', 'mouth_y', 'smile', 'smirk', 'yawn')
+CHEEK_KEYS = ('x', 'y', 'cheeks')
+
+class Feature():
+	"""
+	A part of the face that is composited onto the screen.
+
+	The layout is written into the feature instead of being returned, so laying out a feature whose geometry is
+	cached does not allocate. Only when its origin moves a new position tuple is made for the shape drawer.
+
+	Attributes:
+		name (str): The name of the feature, used as key for the shape drawer.
+		keys (tuple): The status keys the feature depends on.
+		layout (callable): Lays the feature out for a status into next_geometry, next_x, next_y and next_rect.
+		paint (callable): Draws the feature as it is on screen.
+		geometry: The cached geometry currently on screen, None if nothing is drawn.
+		x, y (int): The origin of the feature on screen.
+		position (tuple): The origin as (x, y), for the shape drawer.
+		rect (array): The rectangle (x, y, width, height) currently on screen, width 0 if nothing is drawn.
+		dirty (bool): Whether the feature is drawn again in this frame.
+	"""
+
+	def __init__(self, name, keys, layout, paint):
+		self.name = name
+		self.keys = keys
+		self.layout = layout
+		self.paint = paint
+		self.geometry = None
+		self.x = 0
+		self.y = 0
+		self.position = (0, 0)
+		self.rect = array('h', [0]*4)
+		self.dirty = False
+		self.next_geometry = None
+		self.next_x = 0
+		self.next_y = 0
+		self.next_rect = array('h', [0]*4)
+
+	def changed(self):
+		"""
+		Returns True if the next layout differs from what is on screen.
+		"""
+		return self.next_geometry != self.geometry or self.next_x != self.x or self.next_y != self.y
+
+	def apply(self):
+		"""
+		Makes the next layout the one on screen.
+		"""
+		if self.next_x != self.x or self.next_y != self.y:
+			self.x = self.next_x
+			self.y = self.next_y
+			self.position = (self.x, self.y)
+		self.geometry = self.next_geometry
+		rect, next_rect = self.rect, self.next_rect
+		for i in range(4):
+			rect[i] = next_rect[i] if self.geometry is not None else 0
+
+	def depends_on(self, newstatus):
+		"""
+		Returns True if one of the keys of the feature is in the changed status.
+		"""
+		for key in self.keys:
+			if key in newstatus:
+				return True
+		return False
+
+class GeometryCache():
+	"""
+	A bounded least recently used cache that maps packed, quantized status values to feature geometry.
+
+	Attributes:
+		size (int): The maximum number of entries.
+		hits (int): The number of lookups that found an entry.
+		misses (int): The number of lookups that did not find an entry.
+		evictions (int): The number of entries dropped to make room.
+	"""
+
+	def __init__(self, size=GEOMETRY_CACHE_SIZE):
+		self.size = size
+		self.__entries = {}
+		self.__used = {}
+		self.__clock = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key):
+		"""
+		Returns the geometry stored for key, or None.
+		"""
+		geometry = self.__entries.get(key)
+		if geometry is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.__clock += 1
+		self.__used[key] = self.__clock
+		return geometry
+
+	def put(self, key, geometry):
+		"""
+		Stores the geometry for key, evicting the least recently used entry when the cache is full.
+		"""
+		if key not in self.__entries and len(self.__entries) >= self.size:
+			oldest = None
+			for used_key, used in self.__used.items():
+				if oldest is None or used < self.__used[oldest]:
+					oldest = used_key
+			del self.__entries[oldest]
+			del self.__used[oldest]
+			self.evictions += 1
+		self.__clock += 1
+		self.__entries[key] = geometry
+		self.__used[key] = self.__clock
+
+	def stats(self):
+		"""
+		Returns the size, hits, misses, evictions and hit rate of the cache.
+		"""
+		lookups = self.hits+self.misses
+		return {'size': len(self.__entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+				'hit_rate': self.hits/lookups if lookups else 0}
+
 class Screen():
 	def __init__(self, eye_size = (30,90), mouth_size = (60,40)):
 		self.eye_height = eye_size[1]
@@ -45,9 +187,19 @@ class Screen():
 
 		print(f"Memory left: {gc.mem_free()} (Pre)")
 		self.__screen_drawer = shapeDrawer(SCREEN_SIZE, 2)
-		self.bitmap = self.__screen_drawer.get_bitmap((COLOURS['BLACK'], COLOURS['WHITE'], COLOURS['PINK'], COLOURS['BLUE']))
+		self.bitmap = self.__screen_drawer.get_bitmap(PALETTE)
 		
-		self.__bounding = {}
+		self.__features = (Feature('left_eye', EYE_KEYS, self.__layout_left_eye, self.__paint_polygon),
+							Feature('right_eye', EYE_KEYS, self.__layout_right_eye, self.__paint_polygon),
+							Feature('mouth', MOUTH_KEYS, self.__layout_mouth, self.__paint_mouth),
+							Feature('left_cheek', CHEEK_KEYS, self.__layout_left_cheek, self.__paint_cheek),
+							Feature('right_cheek', CHEEK_KEYS, self.__layout_right_cheek, self.__paint_cheek))
+		self.__damage = array('h', [0]*4*MAX_DAMAGE)
+		self.__damage_count = 0
+		self.__rect = array('h', [0]*4)
+		self.__eye_cache = GeometryCache(GEOMETRY_CACHE_SIZE)
+		self.__mouth_cache = GeometryCache(GEOMETRY_CACHE_SIZE)
+		self.pixels_pushed = 0
 		self.__make_black = True
 		print(f"Memory left: {gc.mem_free()} (Post)\n\n")
 
@@ -70,145 +222,306 @@ class Screen():
 			self.screen_turn(True)
 
 	def draw_face(self, newstatus, status, particles):
-		Count = 0
-		if (not self.__make_black and 
-				len(particles) == 0 and 
-				not any(key in newstatus.keys() for key in ['left_eye', 'right_eye', 'mouth', 'x', 'y', 
-															'eye_open', 'left_right', 'eyebrow_angle', 'under_eye_lid', 
-															'mouth_width', 'mouth_y', 'smile', 'cheeks', 'smirk', 'yawn'])):
-			return
-
-		# todo: The face is always updated. Not only when the face changes. This is not optimal.
-		# self.__bounding = self.__screen_drawer.get_boundaries()
-		self.__screen_drawer.reset_bounding_boxes()
+		"""
+		Composites the face onto the screen.
 
-		for key in ('left_eye', 'right_eye', 'mouth', 'particle', 'cheeks'):
-			if key in self.__bounding:
-				Count = 1
-				for bound in self.__bounding[key]:
-					self.__screen_drawer.draw_rect(*bound_to_rect(bound), 0, key='black')
+		Only features that depend on a changed status key are laid out again, and only when their layout
+		changed they are redrawn. The union of the old and new rectangle of every redrawn feature is cleared,
+		other features overlapping those rectangles are repainted, and only these rectangles are pushed.
 
-		self.__bounding = {}
+		The rectangles are kept in preallocated arrays, so a frame only allocates the positions and sizes that
+		the shape drawer is called with for the areas that changed.
 
-		if self.__make_black:
-			print("Test")
+		:param newstatus: The status keys that changed since the last frame.
+		:param status: The complete current status.
+		:param particles: The ParticleSystem with the particles that are alive.
+		"""
+		force = self.__make_black
+		if force:
 			self.__screen_drawer.draw_circle((SCREEN_SIZE[0]//2, SCREEN_SIZE[1]//2), SCREEN_SIZE[0]//2, 0, key='black')
 			self.tft.fill_circle(SCREEN_SIZE[0]//2, SCREEN_SIZE[1]//2, SCREEN_SIZE[0]//2, 0)
 			self.__make_black = False
 
-		if True or any(key in ['eye_open', 'eyebrow_angle', 'under_eye_lid', 'left_right', 'x', 'y'] for key in newstatus.keys()):
-			self.__draw_eyes(status)
-	
-			
-		if True or any(key in ['x', 'y', 'mouth_width', 'mouth_y', 'smile', 'smirk', 'yawn'] for key in newstatus.keys()):
-			self.__draw_mouth(status)
+		self.__damage_count = 0
+		redraw = False
+		for feature in self.__features:
+			feature.dirty = False
+			if force or feature.depends_on(newstatus):
+				feature.layout(feature, status)
+				if force or feature.changed():
+					if not force:
+						self.__add_damage(feature.rect, feature.next_rect if feature.next_geometry is not None else None)
+					feature.apply()
+					feature.dirty = True
+					redraw = True
 
-		if True or any('cheeks' in newstatus.keys()):
-			self.__draw_cheeks(status)
-			
-		if len(particles)>0:
-			self.__draw_particles(particles)
+		particles.advance()
+		rect = self.__rect
+		for i in range(particles.count):
+			variant = VARIANTS[particles.variant[i]]
+			x = int(particles.x[i]-variant[3])
+			y = int(particles.y[i]-variant[4])
+			if (x-120)*(x-120) + (y-120)*(y-120) <= 150*150:
+				write_bound(rect, x+variant[5], y+variant[6], x+variant[7], y+variant[8])
+			else:
+				particles.kill(i)
+				rect[2] = 0
+			self.__add_particle_damage(particles, i, rect)
+		particles.compact()
+
+		if not redraw and self.__damage_count == 0:
+			return
+
+		self.__screen_drawer.reset_bounding_boxes()
+		pixels = 0
+		damage = self.__damage
+		for i in range(0, 4*self.__damage_count, 4):
+			self.__screen_drawer.draw_rect((damage[i], damage[i+1]), (damage[i+2], damage[i+3]), 0, key='black')
+			pixels += damage[i+2]*damage[i+3]
+
+		# Features that were not changed but are overlapped by a cleared rectangle are painted again
+		for feature in self.__features:
+			if feature.dirty:
+				if feature.geometry is not None:
+					feature.paint(feature)
+			elif feature.geometry is not None and self.__overlaps_damage(feature.rect):
+				feature.paint(feature)
+				pixels += feature.rect[2]*feature.rect[3]
+		for i in range(particles.count):
+			variant = VARIANTS[particles.variant[i]]
+			self.__screen_drawer.draw_polygon_rounded((int(particles.x[i]-variant[3]), int(particles.y[i]-variant[4])), variant[0], variant[1], variant[2], key='Particle')
+		if force:
+			pixels = SCREEN_SIZE[0]*SCREEN_SIZE[1]
+		self.pixels_pushed = pixels
 
-		# gc.collect()
 		try:
-			del self.bitmap
-			gc.collect()
-			self.bitmap = self.__screen_drawer.get_bitmap((COLOURS['BLACK'], COLOURS['WHITE'], COLOURS['PINK'], COLOURS['BLUE']))
-			# print(f"Bitmap: {len(self.bitmap['BOUNDING'])}")
+			self.bitmap = None
+			if gc.mem_free() < RENDER_HEADROOM:
+				Trace.collect()
+			span = Trace.begin()
+			self.bitmap = self.__screen_drawer.get_bitmap(PALETTE)
+			Trace.end(Trace.GET_BITMAP, span)
 			if len(self.bitmap['BOUNDING']) > 0:
+				span = Trace.begin()
 				self.tft.pbitmap(self.bitmap, 1)
-				Count += 1
+				Trace.end(Trace.PBITMAP, span)
 		except Exception as e:
 			print(f"Error during drawing ({gc.mem_free()}): {e}")
 
-		if Count < 2:
-			print("\n\n---- No bounding box painted\n\n")
+	def __add_damage(self, rect_1, rect_2):
+		"""
+		Adds the union of two rectangles (x, y, width, height) to the damage. Either may be None or have width 0.
+		When the damage is full the union is merged into the last rectangle.
+		"""
+		if rect_1 is None or rect_1[2] <= 0:
+			rect_1, rect_2 = rect_2, None
+		if rect_1 is None or rect_1[2] <= 0:
+			return
+		x0, y0 = rect_1[0], rect_1[1]
+		x1, y1 = x0+rect_1[2], y0+rect_1[3]
+		if rect_2 is not None and rect_2[2] > 0:
+			x0, y0 = min(x0, rect_2[0]), min(y0, rect_2[1])
+			x1, y1 = max(x1, rect_2[0]+rect_2[2]), max(y1, rect_2[1]+rect_2[3])
+		self.__store_damage(x0, y0, x1, y1)
 
-	def __draw_eyes(self, status):
-		gc.collect()
-		under_y = self.eye_height-status['under_eye_lid']*self.eye_height/2
+	def __add_particle_damage(self, particles, i, rect):
+		"""
+		Adds the union of the rectangle of particle i on screen and its new rectangle to the damage, and stores the
+		new rectangle in the particle.
+		"""
+		if particles.rect_w[i] > 0:
+			x0, y0 = particles.rect_x[i], particles.rect_y[i]
+			x1, y1 = x0+particles.rect_w[i], y0+particles.rect_h[i]
+			if rect[2] > 0:
+				x0, y0 = min(x0, rect[0]), min(y0, rect[1])
+				x1, y1 = max(x1, rect[0]+rect[2]), max(y1, rect[1]+rect[3])
+			self.__store_damage(x0, y0, x1, y1)
+		elif rect[2] > 0:
+			self.__store_damage(rect[0], rect[1], rect[0]+rect[2], rect[1]+rect[3])
+		particles.rect_x[i] = rect[0]
+		particles.rect_y[i] = rect[1]
+		particles.rect_w[i] = max(rect[2], 0)
+		particles.rect_h[i] = rect[3]
 
-		if (status['eye_open']>0):
-			height_eye = under_y-status['eye_open']*(self.eye_height-status['under_eye_lid']*self.eye_height/2)
-			rounded_corners = round(min((under_y-height_eye)/2,15))
-			angle_eyebrow = min(max((under_y-height_eye-2*rounded_corners)/(1-10/45),0),45)/45*-status['eyebrow_angle']
+	def __store_damage(self, x0, y0, x1, y1):
+		damage = self.__damage
+		if self.__damage_count == MAX_DAMAGE:
+			i = 4*(MAX_DAMAGE-1)
+			x0, y0 = min(x0, damage[i]), min(y0, damage[i+1])
+			x1, y1 = max(x1, damage[i]+damage[i+2]), max(y1, damage[i+1]+damage[i+3])
+		else:
+			i = 4*self.__damage_count
+			self.__damage_count += 1
+		damage[i] = x0
+		damage[i+1] = y0
+		damage[i+2] = x1-x0
+		damage[i+3] = y1-y0
 
-			left_eye_coord = [	(0, round(max(height_eye+max(angle_eyebrow*45,0), -min(status['left_right'], 0)*self.eye_height/2))), 
-					(self.eye_width, round(max(height_eye+max(-angle_eyebrow*45,0), -min(status['left_right'], 0)*self.eye_height/2))), 
-					(self.eye_width, round(min(under_y, self.eye_height+min(status['left_right'], 0)*self.eye_height/2))), 
-					(0, round(min(under_y, self.eye_height+min(status['left_right'], 0)*self.eye_height/2)))]
-			
-			self.__screen_drawer.draw_polygon_rounded(((status['x']-45)-self.eye_width//2,(status['y']-65)), 
-				left_eye_coord, 
-				[	int(max(rounded_corners-abs(max(angle_eyebrow*15,-10)),0)*(-((min(status['left_right'],0)-0.5)**2+(min(status['left_right'],0)-0.5)+0.25)+1)),
-	 				int(max(rounded_corners-abs(min(angle_eyebrow*15,10)),0)*(-((min(status['left_right'],0)-0.5)**2+(min(status['left_right'],0)-0.5)+0.25)+1)), 
-					int(rounded_corners*(-((min(status['left_right'],0)-0.5)**2+(min(status['left_right'],0)-0.5)+0.25)+1)), 
-					int(rounded_corners*(-((min(status['left_right'],0)-0.5)**2+(min(status['left_right'],0)-0.5)+0.25)+1))], 
-					1, key='left_eye')
-
-			self.__bounding['left_eye'] = [calculate_bound(left_eye_coord, offset = ((status['x']-45)-self.eye_width//2,(status['y']-65)))]
-			
-			right_eye_coord = [(0, round(max(height_eye+max(-angle_eyebrow*45,0), max(status['left_right'], 0)*self.eye_height/2))), 
-	 				(self.eye_width, round(max(height_eye+max(angle_eyebrow*45,0), max(status['left_right'], 0)*self.eye_height/2))), 
-					(self.eye_width, round(min(under_y, self.eye_height-max(status['left_right'], 0)*self.eye_height/2))), 
-					(0, round(min(under_y, self.eye_height-max(status['left_right'], 0)*self.eye_height/2)))]
-			
-			
-			self.__screen_drawer.draw_polygon_rounded(((status['x']+45)-self.eye_width//2,(status['y']-65)),
-				right_eye_coord, 
-				[int(max(rounded_corners-abs(min(angle_eyebrow*15,10)),0)*(-((max(status['left_right'],0)-0.5)**2+(max(status['left_right'],0)-0.5)+0.25)+1)),
-	 			int(max(rounded_corners-abs(max(angle_eyebrow*15,-10)),0)*(-((max(status['left_right'],0)-0.5)**2+(max(status['left_right'],0)-0.5)+0.25)+1)), 
-					int(rounded_corners*(-((max(status['left_right'],0)-0.5)**2+(max(status['left_right'],0)-0.5)+0.25)+1)), 
-					int(rounded_corners*(-((max(status['left_right'],0)-0.5)**2+(max(status['left_right'],0)-0.5)+0.25)+1))], 
-					1, key='right_eye')
-			
-			self.__bounding['right_eye'] = [calculate_bound(right_eye_coord, offset = ((status['x']+45)-self.eye_width//2,(status['y']-65)))]
+	def __overlaps_damage(self, rect):
+		damage = self.__damage
+		for i in range(0, 4*self.__damage_count, 4):
+			if (rect[0] < damage[i]+damage[i+2] and damage[i] < rect[0]+rect[2] and
+					rect[1] < damage[i+1]+damage[i+3] and damage[i+1] < rect[1]+rect[3]):
+				return True
+		return False
+
+	def __paint_polygon(self, feature):
+		"""
+		Draws the polygon of an eye into the bitmap of the shape drawer.
+		"""
+		self.__screen_drawer.draw_polygon_rounded(feature.position, feature.geometry[0], feature.geometry[1], 1, key=feature.name)
+
+	def __paint_mouth(self, feature):
+		"""
+		Draws the mouth, and the yawn ellipse if it is yawning, into the bitmap of the shape drawer.
+		"""
+		geometry = feature.geometry
+		self.__screen_drawer.draw_polygon_rounded(feature.position, geometry[0], geometry[1], 1, key=feature.name)
+		if geometry[4] is not None:
+			self.__screen_drawer.draw_elipse((feature.x+geometry[3][0], feature.y+geometry[3][1]), geometry[4], 1, key=feature.name)
+
+	def __paint_cheek(self, feature):
+		"""
+		Draws a cheek into the bitmap of the shape drawer.
+		"""
+		self.__screen_drawer.draw_circle(feature.position, feature.geometry, 2, key=feature.name)
+
+	def __layout_left_eye(self, feature, status):
+		self.__layout_eye(feature, status, -1)
+
+	def __layout_right_eye(self, feature, status):
+		self.__layout_eye(feature, status, 1)
+
+	def __layout_eye(self, feature, status, side):
+		"""
+		Lays out the left (side -1) or right (side 1) eye from the cached geometry.
+		"""
+		eye_open = quantize(status['eye_open'], self.eye_height, 0, 127)
+		if eye_open <= 0:
+			feature.next_geometry = None
+			return
+		under_eye_lid = quantize(status['under_eye_lid'], self.eye_height//2, 0, 127)
+		eyebrow_angle = quantize(status['eyebrow_angle'], 45, -63, 63)
+		look = min(status['left_right'], 0) if side < 0 else max(status['left_right'], 0)
+		look = quantize(look, self.eye_height//2, -63, 63)
+		key = (((((side > 0) << 7 | eye_open) << 7 | under_eye_lid) << 7 | (eyebrow_angle+64)) << 7) | (look+64)
+
+		geometry = self.__eye_cache.get(key)
+		if geometry is None:
+			geometry = self.__eye_geometry(eye_open/self.eye_height, eyebrow_angle/45, under_eye_lid/(self.eye_height//2), look/(self.eye_height//2), side)
+			self.__eye_cache.put(key, geometry)
+
+		x = round(status['x'])+45*side-self.eye_width//2
+		y = round(status['y'])-65
+		bound = geometry[2]
+		feature.next_geometry = geometry
+		feature.next_x = x
+		feature.next_y = y
+		write_bound(feature.next_rect, bound[0][0]+x, bound[0][1]+y, bound[1][0]+x, bound[1][1]+y)
+
+	def __eye_geometry(self, eye_open, eyebrow_angle, under_eye_lid, look, side):
+		"""
+		Computes the polygon, corner radii and bound of an eye relative to its origin.
+		"""
+		under_y = self.eye_height-under_eye_lid*self.eye_height/2
+		height_eye = under_y-eye_open*(self.eye_height-under_eye_lid*self.eye_height/2)
+		rounded_corners = round(min((under_y-height_eye)/2,15))
+		angle_eyebrow = min(max((under_y-height_eye-2*rounded_corners)/(1-10/45),0),45)/45*-eyebrow_angle
+		corner_scale = -((look-0.5)**2+(look-0.5)+0.25)+1
+
+		if side < 0:
+			eye_coord = (	(0, round(max(height_eye+max(angle_eyebrow*45,0), -look*self.eye_height/2))), 
+					(self.eye_width, round(max(height_eye+max(-angle_eyebrow*45,0), -look*self.eye_height/2))), 
+					(self.eye_width, round(min(under_y, self.eye_height+look*self.eye_height/2))), 
+					(0, round(min(under_y, self.eye_height+look*self.eye_height/2))))
+			eye_radii = (int(max(rounded_corners-abs(max(angle_eyebrow*15,-10)),0)*corner_scale),
+						int(max(rounded_corners-abs(min(angle_eyebrow*15,10)),0)*corner_scale), 
+						int(rounded_corners*corner_scale), 
+						int(rounded_corners*corner_scale))
+		else:
+			eye_coord = (	(0, round(max(height_eye+max(-angle_eyebrow*45,0), look*self.eye_height/2))), 
+					(self.eye_width, round(max(height_eye+max(angle_eyebrow*45,0), look*self.eye_height/2))), 
+					(self.eye_width, round(min(under_y, self.eye_height-look*self.eye_height/2))), 
+					(0, round(min(under_y, self.eye_height-look*self.eye_height/2))))
+			eye_radii = (int(max(rounded_corners-abs(min(angle_eyebrow*15,10)),0)*corner_scale),
+						int(max(rounded_corners-abs(max(angle_eyebrow*15,-10)),0)*corner_scale), 
+						int(rounded_corners*corner_scale), 
+						int(rounded_corners*corner_scale))
+
+		return eye_coord, eye_radii, calculate_bound(eye_coord)
 			
-	def __draw_mouth(self, status):
-		mouth_coord = [(round(self.mouth_width//2-(status['mouth_width']//2)*(1-status['smirk']*0.3)), round(status['mouth_y']*self.mouth_height//2)), 
-				 (round(self.mouth_width//2+(status['mouth_width']//2)*(1+status['smirk']*0.3)), round(status['mouth_y']*self.mouth_height//2)), 
-				 (round(self.mouth_width//2+(status['mouth_width']//2)*(1+status['smirk']*0.3)), round(self.mouth_height//2+status['mouth_y']*self.mouth_height//2)), 
-				 (round(self.mouth_width//2-status['mouth_width']//2*(1-status['smirk']*0.3)), round(self.mouth_height//2+status['mouth_y']*self.mouth_height//2))]
-		
-		mouth_radii = [round(min(status['mouth_width']/2,max(self.mouth_height//4-(status['smile']*self.mouth_height//4)*(1-status['smirk']),0))),
-				round(min(status['mouth_width']/2,max(self.mouth_height//4-status['smile']*self.mouth_height//4*(1+status['smirk']),0))),
-				round(min(status['mouth_width']/2,max(self.mouth_height//4+status['smile']*self.mouth_height//4*(1+min(status['smirk'],0))-max(status['smirk'],0),0))), 
-				round(min(status['mouth_width']/2,max(self.mouth_height//4+status['smile']*self.mouth_height//4*(1-max(status['smirk'],0))+min(status['smirk'],0),0)))]
-
-		self.__screen_drawer.draw_polygon_rounded((round(status['x']-self.mouth_width//2), status['y']+45),
-				mouth_coord, 
-				mouth_radii, 
-				1, key='mouth')
-		
-		self.__bounding['mouth'] = [calculate_bound(mouth_coord, offset=(round(status['x']-self.mouth_width//2), status['y']+45))]
+	def __layout_mouth(self, feature, status):
+		"""
+		Lays out the mouth from the cached geometry.
+		"""
+		mouth_width = quantize(status['mouth_width'], 1, 0, 127)
+		mouth_y = quantize(status['mouth_y'], self.mouth_height//2, -63, 63)
+		smile = quantize(status['smile'], 10, -15, 15)
+		smirk = quantize(status['smirk'], 10, -15, 15)
+		yawn = quantize(status.get('yawn', 0), 30, 0, 31)
+		key = ((((mouth_width << 7 | (mouth_y+64)) << 5 | (smile+16)) << 5 | (smirk+16)) << 5) | yawn
+
+		geometry = self.__mouth_cache.get(key)
+		if geometry is None:
+			geometry = self.__mouth_geometry(mouth_width, mouth_y/(self.mouth_height//2), smile/10, smirk/10, yawn/30)
+			self.__mouth_cache.put(key, geometry)
+
+		x = round(status['x'])-self.mouth_width//2
+		y = round(status['y'])+45
+		bound = geometry[2]
+		feature.next_geometry = geometry
+		feature.next_x = x
+		feature.next_y = y
+		write_bound(feature.next_rect, bound[0][0]+x, bound[0][1]+y, bound[1][0]+x, bound[1][1]+y)
+
+	def __mouth_geometry(self, mouth_width, mouth_y, smile, smirk, yawn):
+		"""
+		Computes the polygon, corner radii, bound and yawn ellipse of the mouth relative to its origin.
+		"""
+		mouth_coord = ((round(self.mouth_width//2-(mouth_width//2)*(1-smirk*0.3)), round(mouth_y*self.mouth_height//2)), 
+				 (round(self.mouth_width//2+(mouth_width//2)*(1+smirk*0.3)), round(mouth_y*self.mouth_height//2)), 
+				 (round(self.mouth_width//2+(mouth_width//2)*(1+smirk*0.3)), round(self.mouth_height//2+mouth_y*self.mouth_height//2)), 
+				 (round(self.mouth_width//2-mouth_width//2*(1-smirk*0.3)), round(self.mouth_height//2+mouth_y*self.mouth_height//2)))
 		
-		if (status.get('yawn', 0) > 0):
-			self.__screen_drawer.draw_elipse((round(status['x']), round(status['y']+45+(1.25-0.25*status['smile'])*self.mouth_height//4)), (15, round(30*status.get('yawn', 0))), 1, key='mouth')
-			self.__bounding['mouth'] = [overwrite_bound(self.__bounding['mouth'], 
-											  [(-15, -30*status.get('yawn', 0)),
-			  									(15, 30*status.get('yawn', 0))], offset=(round(status['x']), round(status['y']+45+(1.25-0.25*status['smile'])*self.mouth_height//4)))]
-	def __draw_cheeks(self, status):
-		if status['cheeks'] > 0:
-			x_offset = 60
-			y_offset = 25
-			radius = 13*status['cheeks'] 
-			self.__screen_drawer.draw_circle((round(status['x']-x_offset), round(status['y'])+y_offset), round(radius), 2, key='cheeks')
-			self.__screen_drawer.draw_circle((round(status['x']+x_offset), round(status['y'])+y_offset), round(radius), 2, key='cheeks')
-			self.__bounding['cheeks'] = [[(round(status['x']-x_offset-radius), round(status['y']+y_offset-radius)), (round(status['x']-x_offset+radius), round(status['y']+y_offset+radius))], 
-								[(round(status['x']+x_offset-radius), round(status['y']+y_offset-radius)), (round(status['x']+x_offset+radius), round(status['y']+y_offset+radius))]]
-
-	def __draw_particles(self, particles):
-		"""
-		Draws the particles with the current configuration.
-		"""
-		self.__bounding['particle'] = []
-		new_particles = []
-		for particle in particles:
-			particle_data = particle.get_particle()
-			if distance(particle_data[0], (120, 120)) <= 150:
-				new_particles.append(particle)
-				self.__bounding['particle'].append(calculate_bound(particle_data[1], offset=particle_data[0]))
-				self.__screen_drawer.draw_polygon_rounded(*particle_data, key='Particle')
-			del particle_data
-		particles[:] = new_particles  # Update the original list with the filtered particles
-		gc.collect()
\ No newline at end of file
+		mouth_radii = (round(min(mouth_width/2,max(self.mouth_height//4-(smile*self.mouth_height//4)*(1-smirk),0))),
+				round(min(mouth_width/2,max(self.mouth_height//4-smile*self.mouth_height//4*(1+smirk),0))),
+				round(min(mouth_width/2,max(self.mouth_height//4+smile*self.mouth_height//4*(1+min(smirk,0))-max(smirk,0),0))), 
+				round(min(mouth_width/2,max(self.mouth_height//4+smile*self.mouth_height//4*(1-max(smirk,0))+min(smirk,0),0))))
+
+		bound = calculate_bound(mouth_coord)
+		yawn_center = None
+		yawn_radii = None
+		if yawn > 0:
+			yawn_center = (self.mouth_width//2, round((1.25-0.25*smile)*self.mouth_height//4))
+			yawn_radii = (15, round(30*yawn))
+			bound = overwrite_bound([bound], [(-yawn_radii[0], -yawn_radii[1]), (yawn_radii[0], yawn_radii[1])], offset=yawn_center)
+		return mouth_coord, mouth_radii, bound, yawn_center, yawn_radii
+
+	def geometry_stats(self):
+		"""
+		Returns the hit rate and eviction statistics of the eye and mouth geometry caches.
+		"""
+		return {'eyes': self.__eye_cache.stats(), 'mouth': self.__mouth_cache.stats()}
+
+	def __layout_left_cheek(self, feature, status):
+		self.__layout_cheek(feature, status, -1)
+
+	def __layout_right_cheek(self, feature, status):
+		self.__layout_cheek(feature, status, 1)
+
+	def __layout_cheek(self, feature, status, side):
+		"""
+		Lays out the left (side -1) or right (side 1) cheek. Its geometry is the radius.
+		"""
+		if status['cheeks'] <= 0:
+			feature.next_geometry = None
+			return
+		x_offset = 60
+		y_offset = 25
+		radius = round(13*status['cheeks'])
+		x = round(status['x'])+side*x_offset
+		y = round(status['y'])+y_offset
+		feature.next_geometry = radius
+		feature.next_x = x
+		feature.next_y = y
+		write_bound(feature.next_rect, x-radius, y-radius, x+radius, y+radius)
@@ -0,0 +1,375 @@
+"""
+Animation routines written as data and compiled into flat action arrays.
+
+A script is a JSON object with the default values of its arguments and a list of steps:
+
+	"shake_yes": {"args": {"amount": ["randint", 1, 3]}, "steps": [
+		["repeat", "$amount", [
+			["animate", {"y": 140}, 400, "ease_in_out"],
+			["animate", {"y": 100}, 400, "ease_in_out"]]],
+		["animate", {"y": "final.y"}, 400, "ease_out"]]}
+
+Steps:
+	["animate", {property: value}, duration, profile(, "force")]: Queues an animation, with force it starts now.
+	["wait", duration]: Queues a wait period.
+	["wait_between", duration]: A wait period that is skipped in the last pass of the repeat it is in.
+	["repeat", count, [steps]]: Repeats steps count times.
+	["particle", shape, x, y, angle, offset, scale(, speed, accel)]: Queues a particle of a shape of Particle. It
+		spawns offset milliseconds after the point the routine has reached, where the routine starts when the
+		animations queued before it are done, or now once it forced an animation.
+
+Values are numbers or:
+	"final.<property>", "current.<property>", "$<argument>": The final or current status or an argument, optionally
+		followed by +, - or * and a number, e.g. "final.value*0.4".
+	["randint", a, b], ["uniform", a, b], ["choice", a, b]: A random value, picked every time the step runs.
+	["min", "final.<property>", b]: The smaller of a property of the final status and b.
+
+The scripts in SCRIPT_FILE, next to this module, are compiled on first use, so new routines can be shipped as data.
+A missing or broken file or script is reported and its routines are skipped, so an update cannot stop the face.
+Scripts compile into preallocated dictionaries and arrays, running one only fills in the values and queues the steps.
+Animation.run_script() queues the routine of a script on a State.
+"""
+import json
+import random
+from array import array
+
+from TimeProfiles import Time_Profiles
+import Particle
+
+SCRIPT_FILE = 'animations.json'
+MAX_DEPTH = 4
+
+# Actions, four slots each
+ANIMATE = 0 # config, duration operand, profile
+ANIMATE_FORCE = 1
+WAIT = 2 # duration operand
+WAIT_BETWEEN = 3 # duration operand, depth
+REPEAT = 4 # count operand, index of the END, depth
+END = 5 # index of the REPEAT, depth
+PARTICLE = 6 # shape, first of the x, y, angle, offset, scale, speed and accel operands
+
+# Operands
+CONST = 0 # b
+FINAL = 1 # final[name]*a + b
+CURRENT = 2 # current[name]*a + b
+ARG = 3 # args[name]*a + b
+RANDINT = 4 # randint(a, b)
+UNIFORM = 5 # uniform(a, b)
+CHOICE = 6 # a or b
+MIN_FINAL = 7 # min(final[name], b)
+NONE = 8 # None
+RANDOM = (RANDINT, UNIFORM, CHOICE)
+
+_SCRIPTS = {}
+_loaded = False
+
+class Script():
+	"""
+	A compiled animation script.
+
+	Attributes:
+		name (str): The name of the script.
+		arg_names (tuple): The names of the arguments.
+
+	Methods:
+		run(State, args): Queues the routine on a State.
+	"""
+
+	def __init__(self, name, source):
+		"""
+		Compiles a script.
+
+		Parameters:
+			name (str): The name of the script.
+			source (dict): The script, see the module documentation.
+		"""
+		self.name = name
+		self.__actions = array('H')
+		self.__kinds = array('B')
+		self.__refs = array('B')
+		self.__a = array('f')
+		self.__b = array('f')
+		self.__values = []
+		self.__names = []
+		self.__configs = []
+		self.__fills = []
+		self.__randoms = []
+		self.__profiles = []
+		self.__shapes = []
+		self.uses_final = False
+		self.uses_current = False
+
+		defaults = source.get('args', {})
+		self.arg_names = tuple(defaults)
+		self.__defaults = array('H', [self.__operand(defaults[arg]) for arg in self.arg_names])
+		self.__args = array('f', [0]*len(self.arg_names))
+		self.__compiled = len(self.__kinds)
+		self.__compile(source['steps'], 0)
+		self.__counters = array('i', [0]*MAX_DEPTH)
+		# Operands that do not change while the routine is queued are evaluated once per run, random ones per step
+		self.__per_run = tuple(i for i in range(len(self.__kinds)) if self.__kinds[i] in (FINAL, CURRENT, ARG, MIN_FINAL))
+		self.__fills = tuple(self.__fills)
+		self.__randoms = tuple(self.__randoms)
+		self.__names = tuple(self.__names)
+		self.__profiles = tuple(self.__profiles)
+		self.__shapes = tuple(self.__shapes)
+
+	def run(self, State, args=None):
+		"""
+		Queues the routine on a State.
+
+		Parameters:
+			State (State): The State to animate.
+			args (dict): Values of the arguments, missing or None ones take their default.
+		"""
+		final = State.get_final_state() if self.uses_final else None
+		current = State.get_current_state() if self.uses_current else None
+		evaluate = self.__value
+		arg_names = self.arg_names
+		for i in range(len(arg_names)):
+			value = args.get(arg_names[i]) if args else None
+			self.__args[i] = evaluate(self.__defaults[i], final, current) if value is None else value
+		values = self.__values
+		for i in self.__per_run:
+			values[i] = evaluate(i, final, current)
+		for config, key, i in self.__fills:
+			config[key] = values[i]
+
+		actions = self.__actions
+		counters = self.__counters
+		configs = self.__configs
+		randoms = self.__randoms
+		profiles = self.__profiles
+		trigger_animation = State.trigger_animation
+		# Particles are timed from where the animations queued before the routine end
+		base = State.get_final_time() if self.__shapes else 0
+		elapsed = 0
+		pc = 0
+		end = len(actions)
+		while pc < end:
+			op = actions[pc]
+			if op == WAIT_BETWEEN and counters[actions[pc+2]] <= 1:
+				pc += 4
+				continue
+			for i in randoms[pc >> 2]:
+				values[i] = evaluate(i, final, current)
+			if op == ANIMATE or op == ANIMATE_FORCE:
+				config, keys, operands = configs[actions[pc+1]]
+				for k in range(len(keys)):
+					config[keys[k]] = values[operands[k]]
+				duration = int(values[actions[pc+2]])
+				if op == ANIMATE_FORCE:
+					# Forcing drops the queued animations, so the routine starts now
+					base = elapsed = 0
+				trigger_animation(config, duration, profiles[actions[pc+3]], force=op == ANIMATE_FORCE)
+				elapsed += duration
+			elif op == WAIT or op == WAIT_BETWEEN:
+				duration = int(values[actions[pc+1]])
+				State.trigger_wait_animation(duration)
+				elapsed += duration
+			elif op == REPEAT:
+				count = int(values[actions[pc+1]])
+				if count <= 0:
+					pc = actions[pc+2]
+				else:
+					counters[actions[pc+3]] = count
+			elif op == END:
+				depth = actions[pc+2]
+				counters[depth] -= 1
+				if counters[depth] > 0:
+					pc = actions[pc+1]
+			elif op == PARTICLE:
+				i = actions[pc+2]
+				State.queue_particle(self.__shapes[actions[pc+1]], (values[i], values[i+1], values[i+2]),
+									 max(base + elapsed + values[i+3], 0), scale=values[i+4], speed=values[i+5],
+									 accel=values[i+6])
+			pc += 4
+
+	def __value(self, i, final, current):
+		kind = self.__kinds[i]
+		if kind == CONST:
+			return self.__b[i]
+		if kind == FINAL:
+			return final[self.__names[self.__refs[i]]]*self.__a[i] + self.__b[i]
+		if kind == CURRENT:
+			return current[self.__names[self.__refs[i]]]*self.__a[i] + self.__b[i]
+		if kind == ARG:
+			return self.__args[self.__refs[i]]*self.__a[i] + self.__b[i]
+		if kind == RANDINT:
+			return random.randint(int(self.__a[i]), int(self.__b[i]))
+		if kind == UNIFORM:
+			return random.uniform(self.__a[i], self.__b[i])
+		if kind == CHOICE:
+			return self.__a[i] if random.getrandbits(1) else self.__b[i]
+		if kind == MIN_FINAL:
+			return min(final[self.__names[self.__refs[i]]], self.__b[i])
+		return None
+
+	def __compile(self, steps, depth):
+		"""
+		Compiles steps into actions, at the depth of the repeats they are in.
+		"""
+		for step in steps:
+			kind = step[0]
+			if kind == 'animate':
+				# Constant values are filled in once, values fixed for a run at its start and random ones every step
+				config = {}
+				keys = []
+				operands = []
+				for key in step[1]:
+					operand = self.__operand(step[1][key])
+					config[key] = self.__values[operand]
+					if self.__kinds[operand] in RANDOM:
+						keys.append(key)
+						operands.append(operand)
+					elif self.__kinds[operand] != CONST:
+						self.__fills.append((config, key, operand))
+				self.__configs.append((config, tuple(keys), tuple(operands)))
+				self.__action(ANIMATE_FORCE if 'force' in step[4:] else ANIMATE, len(self.__configs)-1,
+							  self.__operand(step[2]), self.__profile(step[3]))
+			elif kind == 'wait' or kind == 'wait_between':
+				if kind == 'wait_between' and depth == 0:
+					raise ValueError(f"{self.name}: wait_between outside a repeat")
+				self.__action(WAIT if kind == 'wait' else WAIT_BETWEEN, self.__operand(step[1]), depth)
+			elif kind == 'repeat':
+				if depth+1 >= MAX_DEPTH:
+					raise ValueError(f"{self.name}: repeats nested too deep")
+				repeat = len(self.__actions)
+				self.__action(REPEAT, self.__operand(step[1]), 0, depth+1)
+				self.__compile(step[2], depth+1)
+				self.__actions[repeat+2] = len(self.__actions)
+				self.__action(END, repeat, depth+1)
+			elif kind == 'particle':
+				if step[1] not in self.__shapes:
+					self.__shapes.append(step[1])
+				# The scale, speed and accel are optional
+				values = list(step[2:9]) + [1, None, 0][len(step)-6:]
+				first = len(self.__kinds)
+				for value in values:
+					self.__operand(value)
+				self.__action(PARTICLE, self.__shapes.index(step[1]), first)
+			else:
+				raise ValueError(f"{self.name}: unknown step {kind}")
+		if depth == 0:
+			self.__shapes = [getattr(Particle, shape) if isinstance(shape, str) else shape for shape in self.__shapes]
+
+	def __action(self, op, x=0, y=0, z=0):
+		"""
+		Appends an action with the random operands compiled since the previous one, which it evaluates when it runs.
+		"""
+		kinds = self.__kinds
+		self.__randoms.append(tuple(i for i in range(self.__compiled, len(kinds)) if kinds[i] in RANDOM))
+		self.__compiled = len(kinds)
+		self.__actions.extend((op, x, y, z))
+
+	def __profile(self, name):
+		profile = getattr(Time_Profiles, name)
+		if profile not in self.__profiles:
+			self.__profiles.append(profile)
+		return self.__profiles.index(profile)
+
+	def __name(self, name):
+		if name not in self.__names:
+			self.__names.append(name)
+		return self.__names.index(name)
+
+	def __operand(self, value):
+		"""
+		Compiles a value into the operand arrays.
+
+		Returns:
+			int: The index of the operand.
+		"""
+		kind, ref, a, b = CONST, 0, 1, 0
+		if value is None:
+			kind = NONE
+		elif isinstance(value, (int, float)):
+			b = value
+		elif isinstance(value, list):
+			names = {'randint': RANDINT, 'uniform': UNIFORM, 'choice': CHOICE, 'min': MIN_FINAL}
+			if value[0] not in names:
+				raise ValueError(f"{self.name}: unknown value {value}")
+			kind = names[value[0]]
+			if kind == MIN_FINAL:
+				if not value[1].startswith('final.'):
+					raise ValueError(f"{self.name}: min takes a property of the final status")
+				ref = self.__name(value[1][6:])
+				self.uses_final = True
+			else:
+				a = value[1]
+			b = value[2]
+		else:
+			name = value
+			for op in '+-*':
+				if op in value:
+					name, number = value.split(op)
+					if op == '*':
+						a = float(number)
+					else:
+						b = float(number) if op == '+' else -float(number)
+					break
+			if name.startswith('final.'):
+				kind = FINAL
+				ref = self.__name(name[6:])
+				self.uses_final = True
+			elif name.startswith('current.'):
+				kind = CURRENT
+				ref = self.__name(name[8:])
+				self.uses_current = True
+			elif name.startswith('$') and name[1:] in self.arg_names:
+				kind = ARG
+				ref = self.arg_names.index(name[1:])
+			else:
+				raise ValueError(f"{self.name}: unknown value {value}")
+		self.__kinds.append(kind)
+		self.__values.append(b if kind == CONST else None)
+		self.__refs.append(ref)
+		self.__a.append(a)
+		self.__b.append(b)
+		return len(self.__kinds)-1
+
+def script_path(file=SCRIPT_FILE):
+	"""
+	Returns the path of a script file next to this module, as the working directory is not always the one of the code.
+	"""
+	directory = __file__.rpartition('/')[0]
+	return f"{directory}/{file}" if directory else file
+
+def load(path=None):
+	"""
+	Compiles the scripts of a JSON file, replacing compiled scripts of the same name. Scripts that do not compile are
+	reported and skipped.
+
+	Parameters:
+		path (str): The JSON file, SCRIPT_FILE next to this module by default.
+
+	Returns:
+		int: The number of scripts compiled.
+	"""
+	global _loaded
+	_loaded = True
+	with open(script_path() if path is None else path, 'r') as file:
+		sources = json.load(file)
+	compiled = 0
+	for name in sources:
+		try:
+			_SCRIPTS[name] = Script(name, sources[name])
+			compiled += 1
+		except Exception as e:
+			print("Error compiling animation script:", name, e)
+	return compiled
+
+def get(name):
+	"""
+	Returns the compiled script of a name, or None if there is none. The scripts of SCRIPT_FILE are compiled on first
+	use, a file that cannot be read is reported once.
+	"""
+	if not _loaded:
+		try:
+			load()
+		except Exception as e:
+			print("Error loading animation scripts:", e)
+	script = _SCRIPTS.get(name)
+	if script is None:
+		print("No animation script:", name)
+	return script
@@ -0,0 +1,38 @@
+"""
+Fake DHT20 climate sensor with the API of the DHT_Sensor module.
+"""
+from math import sin
+from Simulator import clock
+
+class climate_sensor():
+	"""
+	A climate sensor whose temperature and humidity drift slowly with the virtual time.
+
+	Attributes:
+		temperature (float): The rolling average of the temperature in degrees Celsius.
+		humidity (float): The rolling average of the relative humidity in percent.
+		measurements (int): The number of measurements.
+		uploads (int): The number of uploads to the server.
+
+	Methods:
+		measure(): Takes a measurement into the rolling averages.
+		update_server(webserver, force_update): Posts the averages to the server.
+	"""
+
+	def __init__(self, scl=1, sda=0, rolling_avg_factor=1e3):
+		self.rolling_avg_factor = rolling_avg_factor
+		self.temperature = 21.0
+		self.humidity = 45.0
+		self.measurements = 0
+		self.uploads = 0
+
+	def measure(self):
+		minutes = clock.CLOCK.now_us()/60e6
+		weight = 1/min(self.measurements+1, self.rolling_avg_factor)
+		self.temperature += (21 + sin(minutes/30) - self.temperature)*weight
+		self.humidity += (45 + 5*sin(minutes/45) - self.humidity)*weight
+		self.measurements += 1
+
+	def update_server(self, webserver, force_update=False):
+		self.uploads += 1
+		return webserver.post("climate/maja", {'temperature': round(self.temperature, 2), 'humidity': round(self.humidity, 2)})
@@ -0,0 +1,54 @@
+"""
+Fake NeoPixel ring with the API of the Light module.
+"""
+LIGHTS = []
+
+def hsv_to_rgb(hue, saturation, value):
+	hue = (hue % 360)/60
+	chroma = value*saturation
+	x = chroma*(1 - abs(hue % 2 - 1))
+	rgb = ((chroma, x, 0), (x, chroma, 0), (0, chroma, x), (0, x, chroma), (x, 0, chroma), (chroma, 0, x))[int(hue) % 6]
+	m = value - chroma
+	return tuple(int((channel + m)*255) for channel in rgb)
+
+class Lights():
+	"""
+	A ring of N virtual NeoPixels showing a single HSV colour.
+
+	Attributes:
+		N (int): The number of pixels.
+		brightness (float): The brightness the colour is scaled with.
+		pixels (list): The RGB colour of every pixel.
+		writes (int): The number of times the colour was written to the pixels.
+
+	Methods:
+		get_hsv() / set_hsv(colour): Return and set the colour as (hue, saturation, value).
+		increase_hue(step): Turns the hue by step degrees.
+		blink(colour, n, T): Blinks a colour n times, T is ignored.
+	"""
+
+	def __init__(self, N=8, brightness=1, pin=None):
+		self.N = N
+		self.brightness = brightness
+		self.pin = pin
+		self.pixels = [(0, 0, 0)]*N
+		self.writes = 0
+		self.__hsv = (0, 1, 0)
+		LIGHTS.append(self)
+
+	def get_hsv(self):
+		return self.__hsv
+
+	def set_hsv(self, colour):
+		self.__hsv = (colour[0] % 360, colour[1], colour[2])
+		self.pixels = [hsv_to_rgb(self.__hsv[0], self.__hsv[1], self.__hsv[2]*self.brightness)]*self.N
+		self.writes += 1
+
+	def increase_hue(self, step):
+		self.set_hsv((self.__hsv[0] + step, self.__hsv[1], self.__hsv[2]))
+
+	def blink(self, colour, n=1, T=1):
+		previous = self.__hsv
+		for _ in range(int(n)):
+			self.set_hsv(colour)
+			self.set_hsv(previous)
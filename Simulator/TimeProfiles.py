@@ -0,0 +1,26 @@
+"""
+The timing profiles of the TimeProfiles module, interpolating from start to end over duration.
+"""
+from math import cos, pi
+
+class Time_Profiles():
+	@staticmethod
+	def linear(start, end, elapsed, duration):
+		if duration <= 0:
+			return end
+		return start + (end-start)*min(elapsed/duration, 1)
+
+	@staticmethod
+	def ease_in(start, end, elapsed, duration):
+		x = min(elapsed/duration, 1) if duration > 0 else 1
+		return start + (end-start)*x*x
+
+	@staticmethod
+	def ease_out(start, end, elapsed, duration):
+		x = min(elapsed/duration, 1) if duration > 0 else 1
+		return start + (end-start)*(1 - (1-x)*(1-x))
+
+	@staticmethod
+	def ease_in_out(start, end, elapsed, duration):
+		x = min(elapsed/duration, 1) if duration > 0 else 1
+		return start + (end-start)*(1 - cos(pi*x))/2
@@ -0,0 +1,147 @@
+"""
+A host simulation of the device, so the device code runs under CPython on Linux.
+
+install() puts fake hardware modules in place of the MicroPython ones and a virtual clock in place of utime:
+
+	machine       Pins read from a scripted TouchScript, a recording WDT, reset() raises Reset.
+	gc9a01        A framebuffer-backed display.
+	shapeDrawer   A Python reference rasterizer.
+	Light         A virtual NeoPixel ring.
+	DHT_Sensor    A climate sensor that drifts with the virtual time.
+	network       A WLAN interface connected to the local host.
+	TimeProfiles, micropython, senko
+
+It has to be called before the device code is imported:
+
+	import Simulator
+	Simulator.install()
+	from State import State
+
+run_main_system() runs the real main_system against a local Fake_Server at an accelerated virtual time.
+"""
+import os
+import sys
+import gc
+import json
+import importlib
+import tempfile
+import threading
+from time import perf_counter
+
+from Simulator import clock, touch
+from Simulator.clock import Clock
+from Simulator.touch import TouchScript, LEFT, RIGHT
+
+FAKE_MODULES = ('machine', 'gc9a01', 'shapeDrawer', 'Light', 'TimeProfiles', 'DHT_Sensor', 'network', 'micropython', 'senko')
+HEAP_SIZE = 1 << 24
+
+def install(speed=None, start_ms=0, heap=True):
+	"""
+	Installs the fake modules and a virtual clock. It can be called again to replace the clock.
+
+	Parameters:
+		speed (float): How many times faster than real time the clock runs, None for a stepped clock that only moves
+					   when the code sleeps. Threads, sockets and asyncio need a running clock.
+		start_ms (int): The ticks the clock starts at, e.g. close to the wraparound at 2**30.
+		heap (bool): Whether gc.mem_alloc() reports the bytes allocated by Python, traced with tracemalloc.
+					 This slows the code down, most of all code doing integer arithmetic, as CPython allocates
+					 integers that MicroPython does not. CPython objects are larger than MicroPython ones, so only
+					 compare allocations with each other.
+
+	Returns:
+		Clock: The installed clock.
+	"""
+	clock.install(Clock(speed, start_ms))
+	for name in FAKE_MODULES:
+		sys.modules[name] = importlib.import_module(f"Simulator.{name}")
+
+	import tracemalloc
+	if heap:
+		if not tracemalloc.is_tracing():
+			tracemalloc.start()
+		gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+	else:
+		tracemalloc.stop()
+		gc.mem_alloc = lambda: 0
+	gc.mem_free = lambda: max(HEAP_SIZE - gc.mem_alloc(), 0)
+
+	import asyncio
+	asyncio.sleep_ms = _async_sleep_ms
+	return clock.CLOCK
+
+async def _async_sleep_ms(ms):
+	import asyncio
+	if clock.CLOCK.speed is None:
+		clock.CLOCK.advance(ms)
+		await asyncio.sleep(0)
+	else:
+		await asyncio.sleep(ms/1000/clock.CLOCK.speed)
+
+def run_main_system(seconds=60, runtime="threads", touches=None, server=None, **options):
+	"""
+	Runs the real main_system for a number of seconds of virtual time, then stops it as the watchdog would.
+
+	It runs in a temporary working directory with secrets for the simulated network, against server or a new
+	Fake_Server. install() must have been called with a running clock.
+
+	Parameters:
+		seconds (float): The virtual time to run for.
+		runtime (str): "threads" or "async", see main_system.start().
+		touches (TouchScript): The touch input, times are virtual milliseconds since the clock started.
+		server (Fake_Server): The backend, a new one is started and stopped if None.
+		**options: Passed on to main_system, e.g. fps, long_poll or trace.
+
+	Returns:
+		dict: The frames pushed to the display, the pixels pushed, the writes to the lights, the requests and bytes
+			  of the server, the longest gap between watchdog feeds, the boot timeline in virtual milliseconds and the
+			  real time taken.
+	"""
+	if clock.CLOCK is None or clock.CLOCK.speed is None:
+		raise RuntimeError("run_main_system() needs install(speed=...)")
+	from Fake_Server import Fake_Server
+	gc9a01, machine, Light = sys.modules['gc9a01'], sys.modules['machine'], sys.modules['Light']
+
+	own_server = server is None
+	if own_server:
+		server = Fake_Server()
+	touch.SCRIPT = touches if touches is not None else TouchScript()
+
+	cwd = os.getcwd()
+	workdir = tempfile.mkdtemp(prefix="maja-")
+	with open(os.path.join(workdir, 'secrets.json'), 'w') as file:
+		json.dump({'user_id': '1', 'ssid': 'simulator', 'password': 'simulator'}, file)
+	os.chdir(workdir)
+	del gc9a01.DISPLAYS[:], machine.WDTS[:], Light.LIGHTS[:]
+	real_start = perf_counter()
+	try:
+		main_system = importlib.import_module('main_system')
+		system = main_system.main_system(server_url=f"http://127.0.0.1:{server.port}", **options)
+		threading.Thread(target=_stop_after, args=(system, seconds), daemon=True).start()
+		try:
+			system.start(runtime)
+		except machine.Reset:
+			pass
+	finally:
+		os.chdir(cwd)
+		if own_server:
+			server.stop()
+
+	return {
+		'virtual_seconds': seconds,
+		'real_seconds': perf_counter() - real_start,
+		'frames': sum(display.bitmaps for display in gc9a01.DISPLAYS),
+		'pixels_pushed': sum(display.pixels_pushed for display in gc9a01.DISPLAYS),
+		'light_writes': sum(light.writes for light in Light.LIGHTS),
+		'server': {'requests': server.requests, 'posts': server.posts, 'connections': server.connections,
+				   'bytes_sent': server.bytes_sent, 'bytes_received': server.bytes_received},
+		'watchdog_max_gap': max((wdt.max_gap for wdt in machine.WDTS), default=0),
+		'boot': dict(system.boot.stages),
+		'workdir': workdir,
+	}
+
+def _stop_after(system, seconds):
+	clock.CLOCK.sleep_ms(seconds*1000)
+	try:
+		system.WD.kill()
+	except SystemExit:
+		pass
@@ -0,0 +1,26 @@
+"""
+Runs the real main_system in the simulator and prints a report, e.g.
+
+	python -m Simulator --seconds 120 --runtime async --speed 20
+"""
+import sys
+import json
+import argparse
+
+sys.path.insert(0, '.')
+import Simulator
+
+parser = argparse.ArgumentParser(description="Runs main_system on a simulated device")
+parser.add_argument('--seconds', type=float, default=60, help="The virtual time to run for")
+parser.add_argument('--runtime', choices=('threads', 'async'), default='threads')
+parser.add_argument('--speed', type=float, default=10, help="How many times faster than real time to run")
+parser.add_argument('--fps', type=int, default=30)
+parser.add_argument('--toggle', type=float, action='append', default=[], help="Double tap the light toggle at this virtual second")
+arguments = parser.parse_args()
+
+Simulator.install(speed=arguments.speed)
+touches = Simulator.TouchScript()
+for second in arguments.toggle:
+	touches.double_tap(Simulator.LEFT, int(second*1000))
+report = Simulator.run_main_system(arguments.seconds, arguments.runtime, touches, fps=arguments.fps)
+print(json.dumps(report, indent=1))
@@ -0,0 +1,116 @@
+"""
+A virtual clock with the MicroPython ticks API, installed as the utime module and onto the time module.
+"""
+import sys
+import time
+import types
+import threading
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD >> 1
+
+_perf_counter = time.perf_counter
+_sleep = time.sleep
+
+CLOCK = None
+
+class Clock():
+	"""
+	A virtual clock for the device code.
+
+	A stepped clock (speed None) only moves when the code sleeps or when it is advanced, so single-threaded runs are
+	deterministic. A running clock moves speed times faster than real time, which works with threads, sockets and
+	asyncio. Ticks wrap around like on MicroPython, start_ms can be set close to the wraparound to test it.
+
+	Attributes:
+		speed (float): How many times faster than real time the clock runs, None for a stepped clock.
+
+	Methods:
+		now_us(): Returns the time in microseconds since the start, without wrapping around.
+		ticks_ms() / ticks_us(): Return the wrapping ticks, as utime does.
+		sleep_ms(ms) / sleep_us(us): Sleep in virtual time.
+		advance(ms): Moves a stepped clock forward.
+	"""
+
+	def __init__(self, speed=None, start_ms=0):
+		self.speed = speed
+		self.__lock = threading.Lock()
+		self.__start_us = start_ms*1000
+		self.__stepped_us = 0
+		self.__real_start = _perf_counter()
+
+	def now_us(self):
+		if self.speed is None:
+			return self.__stepped_us
+		return int((_perf_counter() - self.__real_start)*1e6*self.speed)
+
+	def ticks_ms(self):
+		return ((self.__start_us + self.now_us())//1000) & TICKS_MAX
+
+	def ticks_us(self):
+		return (self.__start_us + self.now_us()) & TICKS_MAX
+
+	def advance(self, ms):
+		self.advance_us(int(ms*1000))
+
+	def advance_us(self, us):
+		if self.speed is not None:
+			raise ValueError("Only a stepped clock can be advanced")
+		with self.__lock:
+			self.__stepped_us += max(int(us), 0)
+
+	def sleep_us(self, us):
+		if self.speed is None:
+			self.advance_us(us)
+		elif us > 0:
+			_sleep(us/1e6/self.speed)
+
+	def sleep_ms(self, ms):
+		self.sleep_us(ms*1000)
+
+def ticks_ms():
+	return CLOCK.ticks_ms()
+
+def ticks_us():
+	return CLOCK.ticks_us()
+
+def ticks_cpu():
+	# Real time, so code can be timed under a stepped clock
+	return int(_perf_counter()*1e6) & TICKS_MAX
+
+def ticks_add(ticks, delta):
+	return (ticks + delta) & TICKS_MAX
+
+def ticks_diff(ticks1, ticks2):
+	diff = (ticks1 - ticks2) & TICKS_MAX
+	return diff - TICKS_PERIOD if diff >= TICKS_HALFPERIOD else diff
+
+def sleep_ms(ms):
+	CLOCK.sleep_ms(ms)
+
+def sleep_us(us):
+	CLOCK.sleep_us(us)
+
+def sleep(seconds):
+	CLOCK.sleep_us(seconds*1e6)
+
+def time_():
+	return CLOCK.now_us()//1000000
+
+FUNCTIONS = {'ticks_ms': ticks_ms, 'ticks_us': ticks_us, 'ticks_cpu': ticks_cpu, 'ticks_add': ticks_add,
+			'ticks_diff': ticks_diff, 'sleep_ms': sleep_ms, 'sleep_us': sleep_us, 'sleep': sleep, 'time': time_}
+
+def install(clock):
+	"""
+	Makes clock the time of the device code: it is installed as the utime module and its functions replace those
+	of the time module, so `from time import ticks_ms` and `time.sleep()` both use it.
+	"""
+	global CLOCK
+	CLOCK = clock
+	utime = sys.modules.get('utime') or types.ModuleType('utime')
+	for name, func in FUNCTIONS.items():
+		setattr(utime, name, func)
+		setattr(time, name, func)
+	sys.modules['utime'] = utime
+	return clock
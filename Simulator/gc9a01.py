@@ -0,0 +1,117 @@
+"""
+Fake GC9A01 display driver that draws into a framebuffer.
+"""
+BLACK = 0x0000
+BLUE = 0x001F
+RED = 0xF800
+GREEN = 0x07E0
+CYAN = 0x07FF
+MAGENTA = 0xF81F
+YELLOW = 0xFFE0
+WHITE = 0xFFFF
+
+DISPLAYS = []
+
+class GC9A01():
+	"""
+	A display that keeps its pixels in a framebuffer.
+
+	Every pixel holds an index into colours, so bitmaps are copied in with bytes.translate() instead of per pixel.
+
+	Attributes:
+		width (int): The width in pixels.
+		height (int): The height in pixels.
+		framebuffer (bytearray): The colour index of every pixel, row by row.
+		colours (list): The RGB565 colours indexed by the framebuffer.
+		is_on (bool): Whether the display is on.
+		bitmaps (int): The number of bitmaps pushed with pbitmap().
+		pixels_pushed (int): The number of pixels written to the display.
+
+	Methods:
+		pixel(x, y): Returns the RGB565 colour of a pixel.
+		save_ppm(path): Saves the framebuffer as an image.
+	"""
+
+	def __init__(self, spi, width, height, reset=None, cs=None, dc=None, backlight=None, rotation=0, options=0, buffer_size=0):
+		self.width = width
+		self.height = height
+		self.framebuffer = bytearray(width*height)
+		self.colours = [BLACK]
+		self.is_on = True
+		self.bitmaps = 0
+		self.pixels_pushed = 0
+		self.__rotation = rotation
+		DISPLAYS.append(self)
+
+	def init(self):
+		pass
+
+	def on(self):
+		self.is_on = True
+
+	def off(self):
+		self.is_on = False
+
+	def rotation(self, rotation):
+		self.__rotation = rotation
+
+	def fill(self, colour):
+		self.framebuffer[:] = bytes([self.__index(colour)])*len(self.framebuffer)
+		self.pixels_pushed += len(self.framebuffer)
+
+	def fill_rect(self, x, y, width, height, colour):
+		index = bytes([self.__index(colour)])
+		x0, x1 = max(x, 0), min(x+width, self.width)
+		if x1 <= x0:
+			return
+		for row in range(max(y, 0), min(y+height, self.height)):
+			start = row*self.width
+			self.framebuffer[start+x0:start+x1] = index*(x1-x0)
+			self.pixels_pushed += x1-x0
+
+	def fill_circle(self, x, y, radius, colour):
+		index = bytes([self.__index(colour)])
+		for row in range(max(y-radius, 0), min(y+radius+1, self.height)):
+			half = int((radius*radius - (row-y)*(row-y))**0.5)
+			x0, x1 = max(x-half, 0), min(x+half+1, self.width)
+			if x1 > x0:
+				start = row*self.width
+				self.framebuffer[start+x0:start+x1] = index*(x1-x0)
+				self.pixels_pushed += x1-x0
+
+	def pbitmap(self, bitmap, index=0):
+		"""
+		Pushes the bounding rectangles of a shapeDrawer bitmap to the display.
+		"""
+		table = bytearray(range(256))
+		for i, colour in enumerate(bitmap['PALETTE']):
+			table[i] = self.__index(colour)
+		table = bytes(table)
+		source, width = bitmap['BITMAP'], bitmap['WIDTH']
+		for x, y, w, h in bitmap['BOUNDING']:
+			for row in range(y, y+h):
+				start = row*width
+				self.framebuffer[row*self.width+x:row*self.width+x+w] = source[start+x:start+x+w].translate(table)
+			self.pixels_pushed += w*h
+		self.bitmaps += 1
+
+	def pixel(self, x, y):
+		return self.colours[self.framebuffer[y*self.width+x]]
+
+	def save_ppm(self, path):
+		"""
+		Saves the framebuffer as a binary PPM image.
+		"""
+		rgb = []
+		for colour in self.colours:
+			rgb.append(bytes((((colour >> 11) & 0x1F) << 3, ((colour >> 5) & 0x3F) << 2, (colour & 0x1F) << 3)))
+		with open(path, 'wb') as file:
+			file.write(f"P6 {self.width} {self.height} 255\n".encode())
+			file.write(b"".join(rgb[index] for index in self.framebuffer))
+
+	def __index(self, colour):
+		if colour not in self.colours:
+			if len(self.colours) == 256:
+				raise ValueError("More than 256 colours on the display")
+			self.colours.append(colour)
+		return self.colours.index(colour)
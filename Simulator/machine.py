@@ -0,0 +1,105 @@
+"""
+Fake machine module: pins read from the touch script, a watchdog that records its feeds, and a reset that ends the run.
+"""
+from Simulator import clock, touch
+
+WDTS = []
+
+class Reset(SystemExit):
+	"""
+	Raised by reset(). It ends the thread that resets the device, like the reset ends the program on the device.
+	"""
+
+class Pin():
+	IN = 0
+	OUT = 1
+	OPEN_DRAIN = 2
+	PULL_UP = 1
+	PULL_DOWN = 2
+	IRQ_FALLING = 4
+	IRQ_RISING = 8
+
+	def __init__(self, id, mode=-1, pull=-1, value=None):
+		self.id = id
+		self.mode = mode
+		self.pull = pull
+		self.__value = value or 0
+
+	def value(self, value=None):
+		"""
+		Returns the level of an input pin from the touch script, or sets the level of an output pin.
+		"""
+		if value is not None:
+			self.__value = 1 if value else 0
+			return None
+		if self.mode == Pin.IN:
+			return touch.SCRIPT.value(self.id)
+		return self.__value
+
+	def __call__(self, value=None):
+		return self.value(value)
+
+	def on(self):
+		self.value(1)
+
+	def off(self):
+		self.value(0)
+
+	def irq(self, handler=None, trigger=None):
+		pass
+
+class SPI():
+	def __init__(self, id, baudrate=1000000, **kwargs):
+		self.id = id
+		self.baudrate = baudrate
+
+	def write(self, buffer):
+		pass
+
+class I2C():
+	def __init__(self, id=0, scl=None, sda=None, freq=400000):
+		self.id = id
+
+	def scan(self):
+		return [0x38]
+
+class WDT():
+	"""
+	A watchdog that records its feeds. It does not reset the run, the longest gap between feeds shows whether it would have.
+
+	Attributes:
+		timeout (int): The timeout in milliseconds.
+		feeds (int): The number of feeds.
+		max_gap (int): The longest time between two feeds in milliseconds.
+	"""
+
+	def __init__(self, id=0, timeout=5000):
+		self.timeout = timeout
+		self.feeds = 0
+		self.max_gap = 0
+		self.__last_feed = clock.ticks_ms()
+		WDTS.append(self)
+
+	def feed(self):
+		current_time = clock.ticks_ms()
+		self.max_gap = max(self.max_gap, clock.ticks_diff(current_time, self.__last_feed))
+		self.__last_feed = current_time
+		self.feeds += 1
+
+	def expired(self):
+		return self.max_gap > self.timeout
+
+def reset():
+	raise Reset()
+
+def soft_reset():
+	raise Reset()
+
+def freq(hz=None):
+	return 125000000
+
+def unique_id():
+	return b'\x00\x00\x00\x00\x00\x00\x00\x01'
+
+def idle():
+	pass
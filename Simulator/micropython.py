@@ -0,0 +1,37 @@
+"""
+Fake micropython module.
+"""
+import gc
+
+def const(value):
+	return value
+
+def native(func):
+	return func
+
+def viper(func):
+	return func
+
+def opt_level(level=None):
+	return 0
+
+def alloc_emergency_exception_buf(size):
+	pass
+
+def mem_info(verbose=None):
+	print(f"mem: total={gc.mem_alloc()+gc.mem_free()}, current={gc.mem_alloc()}, free={gc.mem_free()}")
+
+def qstr_info(verbose=None):
+	pass
+
+def schedule(func, arg):
+	func(arg)
+
+def heap_lock():
+	return 0
+
+def heap_unlock():
+	return 0
+
+def kbd_intr(char):
+	pass
@@ -0,0 +1,54 @@
+"""
+Fake network module: a WLAN interface that is connected to the local host.
+"""
+STA_IF = 0
+AP_IF = 1
+
+AVAILABLE = True
+
+def country(code=None):
+	return code or "NL"
+
+class WLAN():
+	"""
+	A WLAN interface that connects straight away while AVAILABLE is True.
+
+	Attributes:
+		connects (int): The number of connects.
+	"""
+
+	def __init__(self, interface=STA_IF):
+		self.interface = interface
+		self.connects = 0
+		self.__active = False
+		self.__connected = False
+
+	def active(self, active=None):
+		if active is None:
+			return self.__active
+		self.__active = bool(active)
+		if not self.__active:
+			self.__connected = False
+
+	def connect(self, ssid=None, password=None):
+		self.connects += 1
+		self.__connected = self.__active and AVAILABLE
+
+	def disconnect(self):
+		self.__connected = False
+
+	def isconnected(self):
+		return self.__connected and AVAILABLE
+
+	def status(self, param=None):
+		return 3 if self.isconnected() else 0
+
+	def config(self, *args, **kwargs):
+		if args and args[0] == 'mac':
+			return b'\x00\x00\x00\x00\x00\x01'
+
+	def ifconfig(self, config=None):
+		return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+	def scan(self):
+		return []
@@ -0,0 +1,16 @@
+"""
+Fake senko OTA updater that never finds an update.
+"""
+CHECKS = [0]
+
+class Senko():
+	def __init__(self, user=None, repo=None, url=None, branch="master", working_dir="app", files=("boot.py", "main.py"), headers=None, debug=False):
+		self.files = files
+
+	def fetch(self):
+		CHECKS[0] += 1
+		return False
+
+	def update(self):
+		CHECKS[0] += 1
+		return False
@@ -0,0 +1,92 @@
+"""
+A Python reference rasterizer with the API of the shapeDrawer C module.
+"""
+
+class shapeDrawer():
+	"""
+	Draws filled shapes into a bitmap of palette indices and tracks the area drawn per key.
+
+	Polygons are filled with the even-odd rule along their corner points. The corner radii are not rounded off, so the
+	pixels differ slightly from the C module, the drawn areas do not.
+
+	Attributes:
+		size (tuple): The width and height of the bitmap.
+		bpp (int): The bits per pixel, the palette holds 2**bpp colours.
+		bitmap (bytearray): The palette index of every pixel, row by row.
+
+	Methods:
+		draw_rect(position, size, colour, key): Fills a rectangle.
+		draw_circle(center, radius, colour, key): Fills a circle.
+		draw_elipse(center, radii, colour, key): Fills an ellipse.
+		draw_polygon_rounded(origin, points, radii, colour, key): Fills a polygon with points relative to origin.
+		reset_bounding_boxes(): Forgets the drawn areas.
+		get_bitmap(palette): Returns the bitmap with the drawn areas, as pbitmap() of the display takes it.
+	"""
+
+	def __init__(self, size, bpp=2):
+		self.size = size
+		self.bpp = bpp
+		self.bitmap = bytearray(size[0]*size[1])
+		self.__bounds = {}
+
+	def draw_rect(self, position, size, colour, key=None):
+		x, y = int(position[0]), int(position[1])
+		for row in range(y, y+int(size[1])):
+			self.__span(row, x, x+int(size[0]), colour, key)
+
+	def draw_circle(self, center, radius, colour, key=None):
+		self.draw_elipse(center, (radius, radius), colour, key)
+
+	def draw_elipse(self, center, radii, colour, key=None):
+		cx, cy = int(center[0]), int(center[1])
+		rx, ry = max(int(radii[0]), 0), max(int(radii[1]), 0)
+		if ry == 0:
+			self.__span(cy, cx-rx, cx+rx+1, colour, key)
+			return
+		for dy in range(-ry, ry+1):
+			half = int(rx*(1 - (dy*dy)/(ry*ry))**0.5)
+			self.__span(cy+dy, cx-half, cx+half+1, colour, key)
+
+	def draw_polygon_rounded(self, origin, points, radii, colour, key=None):
+		ox, oy = int(origin[0]), int(origin[1])
+		points = [(ox+point[0], oy+point[1]) for point in points]
+		top = int(min(point[1] for point in points))
+		bottom = int(max(point[1] for point in points))
+		for row in range(top, bottom+1):
+			y = row + 0.5
+			crossings = []
+			for i in range(len(points)):
+				(x0, y0), (x1, y1) = points[i-1], points[i]
+				if (y0 <= y) != (y1 <= y):
+					crossings.append(x0 + (y-y0)*(x1-x0)/(y1-y0))
+			crossings.sort()
+			for i in range(0, len(crossings)-1, 2):
+				self.__span(row, int(crossings[i]+0.5), int(crossings[i+1]+0.5), colour, key)
+
+	def reset_bounding_boxes(self):
+		self.__bounds = {}
+
+	def get_bitmap(self, palette):
+		"""
+		Returns the bitmap as a dict with its WIDTH, HEIGHT, BPP, PALETTE, the BITMAP itself and the BOUNDING
+		(x, y, width, height) rectangles of the keys drawn since the bounding boxes were reset.
+		"""
+		bounding = [(x0, y0, x1-x0, y1-y0) for x0, y0, x1, y1 in self.__bounds.values()]
+		return {'WIDTH': self.size[0], 'HEIGHT': self.size[1], 'BPP': self.bpp, 'PALETTE': palette,
+				'BITMAP': self.bitmap, 'BOUNDING': bounding}
+
+	def __span(self, row, x0, x1, colour, key):
+		width, height = self.size
+		x0, x1 = max(x0, 0), min(x1, width)
+		if not 0 <= row < height or x1 <= x0:
+			return
+		start = row*width
+		self.bitmap[start+x0:start+x1] = bytes([colour or 0])*(x1-x0)
+		bounds = self.__bounds.get(key)
+		if bounds is None:
+			self.__bounds[key] = [x0, row, x1, row+1]
+		else:
+			bounds[0] = min(bounds[0], x0)
+			bounds[1] = min(bounds[1], row)
+			bounds[2] = max(bounds[2], x1)
+			bounds[3] = max(bounds[3], row+1)
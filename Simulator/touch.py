@@ -0,0 +1,50 @@
+"""
+Scripted input for the touch pads.
+"""
+from Simulator import clock
+
+LEFT = 17
+RIGHT = 19
+
+class TouchScript():
+	"""
+	Presses of the touch pads at virtual times, read by machine.Pin.value().
+
+	Times are milliseconds of virtual time since the clock started. TouchManager calls the pad on pin 17 'left' and
+	the pad on pin 19 'right'.
+
+	Methods:
+		press(pin, at, duration): Touches a pad from at for duration milliseconds.
+		tap(pin, at): A short touch.
+		double_tap(pin, at): Two short touches.
+		hold(pin, at, duration): A long touch.
+		value(pin): Returns 1 while the pad is touched.
+	"""
+
+	def __init__(self):
+		self.__presses = []
+
+	def press(self, pin, at, duration=100):
+		self.__presses.append((pin, at, at+duration))
+		return self
+
+	def tap(self, pin, at):
+		return self.press(pin, at, 80)
+
+	def double_tap(self, pin, at):
+		return self.press(pin, at, 80).press(pin, at+160, 80)
+
+	def hold(self, pin, at, duration=2000):
+		return self.press(pin, at, duration)
+
+	def clear(self):
+		self.__presses = []
+
+	def value(self, pin):
+		current_time = clock.CLOCK.now_us()//1000
+		for press_pin, start, end in self.__presses:
+			if press_pin == pin and start <= current_time < end:
+				return 1
+		return 0
+
+SCRIPT = TouchScript()
@@ -1,26 +1,27 @@
-from machine import Pin, I2C
-from utime import sleep, time, sleep_ms, ticks_ms, ticks_diff
+from utime import ticks_ms, ticks_diff, ticks_add
 from datetime import datetime
-from math import cos, sin, pi
-import random
 import _thread
-import os
-import json
 
-from shapeDrawer import shapeDrawer
 from Light import Lights
-from Locker import ConditionalLock
+from Locker import ConditionalLock, NamedLock
 from TimeProfiles import Time_Profiles
 
-import gc9a01
-import tft_config
 from tft_config import SCREEN_SIZE
 import gc
-from Animation import StatusAnimator, EMOTIONS, start_up
+from Animation import StatusAnimator, start_up
 from Screen import Screen
 from Particle import Particle_Queue
+from Journal import State_Journal
+import Trace
 
 CHANGE_TIME = 4500
+RETRY_TIME = 1000
+POST_QUIET_TIME = 250
+POST_MAX_DELAY = 1000
+POST_BACKOFF = 500
+POST_MAX_BACKOFF = 16000
+LIGHT_KEYS = ('hue', 'saturation', 'value')
+POST_SUBDOMAINS = {'light_data': 'light/maja', 'screen_data': 'screen/maja'}
 COLOURS = {'BLACK': 0x0000, 'WHITE': 0xFFFF, 'RED': 0xF800, 'GREEN': 0x07E0, 'BLUE': 0x001F, 'CYAN': 0x07FF, 'MAGENTA': 0xF81F, 'YELLOW': 0xFFE0}
 
 def get_user_id(mood_data_keys, user_id):
@@ -37,9 +38,14 @@ class Queue():
 	def __init__(self):
 		self.__queue = {}
 		self.__lock = _thread.allocate_lock()
+		self.__first_add = 0
+		self.__last_add = 0
 
 	def add(self, data, force = True):
 		with self.__lock:
+			self.__last_add = ticks_ms()
+			if self.__queue == {}:
+				self.__first_add = self.__last_add
 			if force:
 				self.__queue.update(data)
 			else:
@@ -57,15 +63,37 @@ class Queue():
 		with self.__lock:
 			return self.__queue != {}
 
+	def ready(self, quiet_time, max_delay):
+		"""
+		Returns whether the item should be processed: nothing was added for quiet_time milliseconds, or the oldest
+		change has waited max_delay milliseconds while changes kept coming.
+		"""
+		with self.__lock:
+			if self.__queue == {}:
+				return False
+			current_time = ticks_ms()
+			return ticks_diff(current_time, self.__last_add) >= quiet_time or ticks_diff(current_time, self.__first_add) >= max_delay
+
+def emotion_class(name):
+	"""
+	Returns the class of an emotion by name. The emotions are imported on first use, not at boot.
+	"""
+	from Emotions import EMOTIONS
+	return EMOTIONS[name]
+
 class Emotion_Manager():
+	"""
+	Keeps the emotion of the face. An emotion is built once and kept, switching to it again blends the face into it.
+	"""
 	def __init__(self, State):
 		self.State = State
 		self.emotion = start_up(State)
+		self.__emotions = {self.emotion.name: self.emotion}
 	
 	def update(self, emotion=None, social_value=None, tired_value=None):
 		changed = False
 		if self.emotion.name != emotion:
-			self.emotion = EMOTIONS[emotion](self.State, self.emotion.social_value, self.emotion.tired_value)
+			self.emotion = self.__switch(emotion)
 			# print("Emotion changed")
 			changed = True
 		if self.emotion.social_value != social_value:
@@ -80,18 +108,40 @@ class Emotion_Manager():
 			self.State.save_status = True
 			print(f"Changed to: {self.emotion}, Social: {self.emotion.social_value}, Tired: {self.emotion.tired_value}")
 
+	def __switch(self, name):
+		"""
+		Returns the emotion of a name, built on first use, after blending the face into it. It takes over the social
+		and tired value of the current emotion.
+		"""
+		emotion = self.__emotions.get(name)
+		if emotion is None:
+			emotion = emotion_class(name)(self.State, self.emotion.social_value, self.emotion.tired_value)
+			self.__emotions[name] = emotion
+		else:
+			emotion.social_value = self.emotion.social_value
+			emotion.tired_value = self.emotion.tired_value
+			emotion.update_parameters()
+		emotion.enter()
+		return emotion
+
 class StateSync():
-	def __init__(self, user_id, LEDs, state):
+	def __init__(self, user_id, LEDs, state, long_poll=False, batch=False):
 		self.user_id = user_id
 		self.LEDs = LEDs
 		self.state = state
 		self.queue = Queue()
+		self.long_poll = long_poll
+		self.batch = batch
 
 		self.time_saved = datetime(2022, 7, 10)
 		self.__block_get = False
 		self.__post_retry_count = 0
+		self.__revision = None
+		self.__watch_retry_time = ticks_ms()
+		self.__next_post_time = ticks_ms()
+		self.__server_state = {}
 
-		self.__lock = _thread.allocate_lock()
+		self.__lock = NamedLock('StateSync')
 
 	def set_block_get(self, block:bool=False):
 		with ConditionalLock(self.__lock) as aquired:
@@ -100,15 +150,56 @@ class StateSync():
 			self.__block_get = block
 
 	def get(self, webserver):
-		result = webserver.get("all/maja")
+		"""
+		Gets the state from the server and applies it. The revision of the last applied reply is sent along, so an
+		unchanged state comes back as a small not-modified reply and is not diffed again.
+		"""
+		result = webserver.get("all/maja", revision=self.__revision)
+		self.__apply(result)
+		return result
+
+	def watch(self, webserver):
+		"""
+		Long-polls the state on the server and applies it when it changes, see Webserver.watch(). This does not block.
+		No request is held open while local changes are waiting to be posted or gets are blocked, and a failed request
+		is retried after RETRY_TIME.
+
+		Returns:
+			dict: The reply of the server, None while waiting for it.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired or self.queue.check() or self.__block_get or ticks_diff(ticks_ms(), self.__watch_retry_time) < 0:
+				return None
+		result = webserver.watch("all/maja", revision=self.__revision)
+		if result is None:
+			return None
+		if not result.get('success'):
+			self.__watch_retry_time = ticks_add(ticks_ms(), RETRY_TIME)
+		self.__apply(result)
+		return result
+
+	def is_watching(self, webserver):
+		"""
+		Returns whether the state is long-polled with watch() instead of polled with get().
+		"""
+		return self.long_poll and webserver.long_poll_supported is not False
+
+	def __apply(self, result):
+		"""
+		Applies a reply with the state of the server, unless local changes are waiting to be posted or gets are blocked.
+		"""
 		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
+			if result.get('success') and 'light_data' in result and 'screen_data' in result:
+				self.__remember_server_state(result['light_data'])
+				self.__remember_server_state(result['screen_data'])
 			if not self.queue.check() and not self.__block_get:
 				success_value = result.get('success')
 				# if success_value:
 				# 	print(get_user_id(list(result['mood_data'].keys()), self.user_id))
 				if success_value and all(key in result for key in ['light_data', 'mood_data', 'screen_data']):
+					self.__revision = result.get('revision')
 					if get_user_id(list(result['mood_data'].keys()), self.user_id) in result['mood_data']:
 						self.__change_face(result['mood_data'][get_user_id(list(result['mood_data'].keys()), self.user_id)]) 
 
@@ -120,41 +211,130 @@ class StateSync():
 					if result_time > self.time_saved:
 						self.time_saved = result_time
 						self.__change_light(result['light_data'], force=self.time_saved==datetime(2022, 7, 10))
-		return result
+
+	def post_due(self):
+		"""
+		Returns whether queued changes should be posted: they were coalesced for POST_QUIET_TIME (or POST_MAX_DELAY
+		while they keep coming) and the backoff after a failed post is over.
+		"""
+		return self.queue.ready(POST_QUIET_TIME, POST_MAX_DELAY) and ticks_diff(ticks_ms(), self.__next_post_time) >= 0
 
 	def post(self, webserver):
+		"""
+		Posts the queued changes. Only the light and screen data that differ from the last known state of the server
+		are sent, together in a single all/maja post if batching is on. A failed post is retried after a backoff that
+		doubles from POST_BACKOFF; once it would exceed POST_MAX_BACKOFF the changes are dropped and the state of the
+		server is applied again.
+		"""
 		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
-			queue_item = self.queue.get()
-			current_state = self.state.get_final_state().copy()
-			if queue_item:
-				success_value = True
-				current_state.update(queue_item)
-				if (key in ['hue', 'saturation', 'value'] for key in queue_item.keys()):
-					send = {
-						'hue': current_state['hue'],
-						'saturation': current_state['saturation'],
-						'value': current_state['value']
-					}
-					result = webserver.post("light/maja", send)
-					success_value = success_value and result.get('success', False)
-				
-				if (key in ['screen_on'] for key in queue_item.keys()):
-					send = {
-						'screen_on': self.state.face.is_on
-					}
-					result = webserver.post("screen/maja", send)
-					success_value = success_value and result.get('success', False)
-				
-				if success_value == False and self.__post_retry_count < 5:
-					print(f"Posting failed: Will try again next time! ({result['message']})")
-					self.__post_retry_count += 1
-					self.queue.add(queue_item, force=False)
-				elif success_value == False and self.__post_retry_count >= 5:
-					self.__post_retry_count = 0
-					self.time_saved = datetime(2022, 7, 10) # Force get update
-					self.state.reset_animation()
+			queue_item, changes = self.__take_changes()
+			if not changes:
+				return
+			requests = self.__post_requests(changes)
+			try:
+				request = next(requests)
+				while True:
+					request = requests.send(webserver.post(*request))
+			except StopIteration as done:
+				self.__posted(queue_item, done.value)
+
+	async def get_async(self, webserver):
+		"""
+		As get(), but yields to the asyncio loop while waiting for the server.
+		"""
+		result = await webserver.get_async("all/maja", revision=self.__revision)
+		self.__apply(result)
+		return result
+
+	async def post_async(self, webserver):
+		"""
+		As post(), but yields to the asyncio loop while waiting for the server. The lock is not held while waiting,
+		the asyncio runtime runs all tasks in one thread.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return
+			queue_item, changes = self.__take_changes()
+		if not changes:
+			return
+		requests = self.__post_requests(changes)
+		try:
+			request = next(requests)
+			while True:
+				request = requests.send(await webserver.post_async(*request))
+		except StopIteration as done:
+			self.__posted(queue_item, done.value)
+
+	def __take_changes(self):
+		"""
+		Takes the queued changes from the queue.
+
+		Returns:
+			tuple: The queued item and, per subsystem, the data that differs from the last known state of the server.
+		"""
+		queue_item = self.queue.get()
+		if not queue_item:
+			return queue_item, None
+		current_state = self.state.get_final_state().copy()
+		current_state.update(queue_item)
+		changes = {}
+		if any(key in LIGHT_KEYS for key in queue_item):
+			light_data = {key: current_state[key] for key in LIGHT_KEYS}
+			if not all(self.__server_state.get(key) == round(light_data[key], 3) for key in LIGHT_KEYS):
+				changes['light_data'] = light_data
+		if 'screen_on' in queue_item and self.__server_state.get('screen_on') != self.state.face.is_on:
+			changes['screen_data'] = {'screen_on': self.state.face.is_on}
+		return queue_item, changes
+
+	def __post_requests(self, changes):
+		"""
+		Yields the (subdomain, data) posts for the changes and is sent their replies, so post() and post_async()
+		share the batching. Returns the reply of the last post.
+		"""
+		result = None
+		if self.batch and len(changes) > 1:
+			result = yield "all/maja", dict(changes)
+			# Any HTTP error, e.g. 404 or 405 of a backend without the endpoint, turns batching off, network errors do not
+			if str(result.get('message', '')).startswith('HTTP '):
+				print(f"Batched posting is not supported by the server ({result.get('message')})")
+				self.batch = False
+				result = None
+			elif result.get('success', False):
+				for send in changes.values():
+					self.__remember_server_state(send)
+		if result is None:
+			for subsystem, send in changes.items():
+				result = yield POST_SUBDOMAINS[subsystem], dict(send)
+				if not result.get('success', False):
+					break
+				self.__remember_server_state(send)
+		return result
+
+	def __posted(self, queue_item, result):
+		"""
+		Resets the backoff after a successful post, or queues the changes again after a failed one.
+		"""
+		if result.get('success', False):
+			self.__post_retry_count = 0
+		else:
+			self.__post_retry_count += 1
+			backoff = POST_BACKOFF << (self.__post_retry_count-1)
+			if backoff <= POST_MAX_BACKOFF:
+				print(f"Posting failed: Will try again in {backoff} ms! ({result.get('message')})")
+				self.__next_post_time = ticks_add(ticks_ms(), backoff)
+				self.queue.add(queue_item, force=False)
+			else:
+				self.__post_retry_count = 0
+				self.time_saved = datetime(2022, 7, 10) # Force get update
+				self.__revision = None
+				self.state.reset_animation()
+
+	def __remember_server_state(self, data):
+		for key in LIGHT_KEYS + ('screen_on',):
+			if key in data:
+				self.__server_state[key] = round(data[key], 3)
 
 	def __change_light(self, result, force = False):
 		state = self.state.get_final_state()
@@ -191,10 +371,10 @@ class State():
 		__draw_mouth(): Draws the mouth with the current configuration.
 	"""
 	
-	def __init__(self, lights=Lights()):
-		self.__lock = _thread.allocate_lock()
+	def __init__(self, lights=None):
+		self.__lock = NamedLock('State')
 		self.face = Screen()
-		self.Lights = lights
+		self.Lights = Lights() if lights is None else lights
 
 		self.__animator = StatusAnimator()
 		self.__current_status = {'x': SCREEN_SIZE[0]//2, 'y': SCREEN_SIZE[1]//2,
@@ -202,26 +382,30 @@ class State():
 						   		'mouth_width': 40, 'mouth_y':0, 'smile': 0, 'cheeks': 0, 'smirk': 0,
 								"hue": 0, "saturation": 1, "value": 0}
 		self.save_status = True
+		self.__journal = State_Journal()
 		
 		self.__particles_queue = Particle_Queue()
 		self.update_status_lamp()
 
 		self.Emotion = Emotion_Manager(self)
 	
-	def draw_state(self, status=None, dont_lock=False):
+	def draw_state(self, status=None):
 		"""
 		Draws the face with the current configuration.
 		"""
 		new_status = status
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			if status:
-				self.__current_status.update(status)
+				for key, value in status.items():
+					self.__set_status(key, value)
 			else:
+				span = Trace.begin()
 				new_status = self.__animator.animate_status(self.__current_status)
+				Trace.end(Trace.ANIMATE_STATUS, span)
 				Changed = False
-				for keys in new_status.keys():
+				for keys in new_status:
 					if self.__current_status.get(keys, None) != new_status.get(keys, None):
 						Changed = True
 					self.__current_status[keys] = new_status.get(keys, self.__current_status.get(keys, None))
@@ -229,9 +413,13 @@ class State():
 				if not Changed and not self.__particles_queue.running():
 					return
 				
+			span = Trace.begin()
 			self.face.draw_face(new_status, self.__current_status, self.__particles_queue.get_particles())
-			if any(key in ['hue', 'saturation', 'value'] for key in new_status.keys()):
-				self.__draw_lamp(new_status)
+			Trace.end(Trace.DRAW_FACE, span)
+			for key in LIGHT_KEYS:
+				if key in new_status:
+					self.__draw_lamp(new_status)
+					break
 
 
 	def is_animation_active(self):
@@ -244,7 +432,7 @@ class State():
 				return False
 			return self.__animator.is_animation_active() or self.__particles_queue.running()
 
-	def trigger_animation(self, end_config, duration, timing_profile=Time_Profiles.linear, force = False, dont_lock=False):
+	def trigger_animation(self, end_config, duration, timing_profile=Time_Profiles.linear, force = False):
 		"""
 		Triggers a new animation.
 
@@ -252,40 +440,115 @@ class State():
 		:param duration: The duration of the animation in milliseconds.
 		:param timing_profile: The timing function used to interpolate the animation.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			self.__animator.trigger_animation(end_config, duration, timing_profile, force=force)
 
-	def trigger_wait_animation(self, duration, dont_lock=False):
+	def retarget_animation(self, end_config, duration, timing_profile=Time_Profiles.linear):
+		"""
+		Animates properties to a new target from now on, replacing their running and queued animations.
+
+		:param end_config: The target configuration of the face at the end of the animation.
+		:param duration: The duration of the animation in milliseconds.
+		:param timing_profile: The timing function used to interpolate the animation.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return
+			self.__animator.retarget(end_config, duration, timing_profile)
+
+	def blend_animation(self, plan):
+		"""
+		Animates the face to a Blend_Plan from now on, replacing the running and queued animations of its properties.
+		Properties that are at their target already are left alone.
+
+		:param plan: The Blend_Plan, e.g. of an emotion.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return
+			self.__animator.blend(plan, self.__current_status)
+
+	def trigger_wait_animation(self, duration):
 		"""
 		Triggers a wait period as an animation.
 
 		:param duration: The duration of the wait period in milliseconds.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			self.__animator.trigger_wait_animation(duration)
 
-	def spawn_particle(self, particle, dont_lock=False):
+	def spawn_particle(self, shape, spawn, scale=1, speed=None, accel=0):
 		"""
 		Spawns a particle on the face.
 
-		:param particle: The particle to spawn.
+		:param shape: The Shape of the particle.
+		:param spawn: (x, y, orientation) of the particle.
+		:param scale: The scale of the shape.
+		:param speed: The forward velocity in pixels per second, defaults to the speed of the shape.
+		:param accel: The cubic growth of the forward velocity over the age of the particle.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
-			self.__particles_queue.add_particle(particle)
+			self.__particles_queue.add_particle(shape, spawn, scale, speed, accel)
 
-	def queue_particle(self, particle, time_ms, dont_lock=False):
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+	def queue_particle(self, shape, spawn, time_ms, scale=1, speed=None, accel=0):
+		"""
+		Spawns a particle on the face after time_ms milliseconds, see spawn_particle().
+		"""
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
-			self.__particles_queue.queue_particle(particle, time_ms)
+			self.__particles_queue.queue_particle(shape, spawn, time_ms, scale, speed, accel)
 
 
+	def next_event_in_ms(self):
+		"""
+		Returns 0 while the face is animating, otherwise the number of milliseconds until the next keyframe
+		or particle spawn, or None if nothing is scheduled.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return None
+			if self.__particles_queue.running():
+				return 0
+			next_event = self.__animator.next_keyframe_in_ms()
+			next_spawn = self.__particles_queue.next_spawn_in_ms()
+			if next_event is None or (next_spawn is not None and next_spawn < next_event):
+				next_event = next_spawn
+			return next_event
+
+	def next_spawn_in_ms(self):
+		"""
+		Returns the number of milliseconds until the next queued particle spawns, or None if none is queued.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return None
+			return self.__particles_queue.next_spawn_in_ms()
+
+	def particle_count(self):
+		"""
+		Returns the number of particles alive on the face.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return 0
+			return self.__particles_queue.get_particles().count
+
+	def keyframe_count(self):
+		"""
+		Returns the number of keyframes that are running or queued.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return 0
+			return self.__animator.keyframe_count()
+
 	def reset_animation(self):
 		"""
 		Resets the animation queue and active status.
@@ -296,84 +559,115 @@ class State():
 			self.__animator.reset_queue()
 
 	def check_animation_triggers(self):
-		if (self.face.is_on):
-			self.Emotion.emotion.check_triggers()
+		"""
+		Checks the triggers of the current emotion. The lock is held for the whole check, so a triggered routine is queued as a whole.
+		"""
+		with ConditionalLock(self.__lock) as aquired:
+			if not aquired:
+				return
+			if (self.face.is_on):
+				self.Emotion.emotion.check_triggers()
 
-	def get_current_state(self, dont_lock=False):
+	def get_current_state(self):
 		"""
 		Returns the current state.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			self.update_status_lamp()
 			return self.__current_status
 
-	def get_final_state(self, dont_lock=False):
+	def get_final_state(self):
 		"""
-		Returns the final configuration.
+		Returns the final configuration. The returned dictionary must not be modified.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			self.update_status_lamp()
 			return self.__animator.get_final_status(self.__current_status)
 		
-	def get_final_time(self, dont_lock=False):
+	def get_final_time(self):
 		"""
 		Returns the final time.
 		"""
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
+		with ConditionalLock(self.__lock) as aquired:
 			if not aquired:
 				return
 			return self.__animator.get_final_time()
 		
-	def check_save_state(self, dont_lock = False):
-		with ConditionalLock(self.__lock, not dont_lock) as aquired:
-			if not aquired:
-				return
-			print(f"Save status: {self.save_status}")
-			if self.save_status:
-				self.save_state()
-				self.save_status = False
-		
-	def save_state(self):
+	def check_save_state(self):
+		"""
+		Saves the state if it was marked as changed. A save postponed by the rate limit of the journal is retried on
+		the next check.
+		"""
+		if not self.save_status:
+			return
+		self.save_status = False
+		if not self.save_state():
+			self.save_status = True
+
+	def save_state(self, force=False):
+		"""
+		Saves the final state to the journal, only if it differs from the saved one. The state is packed under the
+		lock, the journal is written after releasing it, so rendering is not stalled by the flash write.
+
+		:param force: Write even if the journal wrote less than its min_interval ago, e.g. before a reset.
+		:return: True if the saved state is up to date, False if the write was postponed or failed.
+		"""
 		time_start = ticks_ms()
-		self.update_status_lamp()
-		gc.collect()
+		span = Trace.begin()
 		try:
-			os.remove('state.json')
-		except OSError as e:
-			print("state.json file does not exist, skipping removal.")
-		gc.collect()
-		state = self.get_final_state(dont_lock=True)
-		with open('state.json', 'w') as file:
-			json.dump(state, file)
-		print(f"Saved state: {state}")
-		print(f"""Time to save: {ticks_diff(ticks_ms(), time_start)}""")
+			with ConditionalLock(self.__lock) as aquired:
+				if not aquired:
+					return False
+				self.update_status_lamp()
+				changed = self.__journal.stage(self.__animator.get_final_status(self.__current_status))
+			if not changed:
+				return True
+			saved = self.__journal.write(force)
+		finally:
+			Trace.end(Trace.SAVE_STATE, span)
+		if saved:
+			print(f"Saved state {self.__journal.sequence} in {ticks_diff(ticks_ms(), time_start)} ms")
+		return saved
+
+	def has_saved_state(self):
+		"""
+		Returns whether a saved state exists.
+		"""
+		return self.__journal.exists()
 	
 	def load_state(self, reset=True):
 		if reset:
-			try:
-				with open('state.json', 'r') as file:
-					self.__current_status = json.load(file).copy()
-					print(f"Current state: {self.__current_status}")
-					self.draw_state(self.__current_status, dont_lock=True)
-					print(f"Loaded state: {self.__current_status}")
-			except OSError:
+			status = self.__journal.load()
+			if status is None:
 				print("No state file found!")
+			else:
+				self.__current_status = status
+				self.__animator.reset_projection()
+				self.draw_state(self.__current_status)
+				print(f"Loaded state: {self.__current_status}")
 		else:
-			self.__make_black = True
-			EMOTIONS['happy'](self, 50, 50)
+			self.face.make_black()
+			self.Emotion.update('happy', 50, 50)
 
-	def update_status_lamp(self, dont_lock=False):
+	def update_status_lamp(self):
 		"""
 		Updates the status of the lamp.
 		"""
-		colour = self.Lights.get_hsv(dont_lock=dont_lock)
-		self.__current_status['hue'] = colour[0]
-		self.__current_status['saturation'] = colour[1]
-		self.__current_status['value'] = colour[2]
+		colour = self.Lights.get_hsv()
+		self.__set_status('hue', colour[0])
+		self.__set_status('saturation', colour[1])
+		self.__set_status('value', colour[2])
+
+	def __set_status(self, key, value):
+		"""
+		Writes a property of the current status and keeps the projected final status in sync.
+		"""
+		self.__current_status[key] = value
+		self.__animator.sync_status(key, value)
 
 	def __draw_lamp(self, new_status={}):
 		"""
@@ -387,6 +681,8 @@ class State():
 if __name__ == '__main__':
 	import machine
 	import random
+	import gc9a01
+	import tft_config
 
 	tft = tft_config.config(tft_config.TALL)
 	tft.init()
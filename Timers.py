@@ -1,7 +1,8 @@
-from _thread import allocate_lock
-from time import ticks_ms, ticks_diff
+from time import ticks_ms, ticks_diff, ticks_add, sleep_ms
+from array import array
+from random import randint
 from machine import reset, WDT
-from Locker import ConditionalLock
+from Locker import ConditionalLock, NamedLock
 
 class Periodic():
 	"""
@@ -62,6 +63,327 @@ class Periodic():
 			self.bypass_timing = False
 		return result
 
+class Job():
+	"""
+	A periodic job of a Scheduler.
+
+	Attributes:
+		name (str): The name the job is addressed and reported by.
+		func (callable): The function to run.
+		interval (int): The time between two runs in milliseconds.
+		fixed_rate (bool): Whether runs are spaced from their scheduled start (fixed rate) or from the end of the previous run (fixed delay).
+		jitter (int): The largest random delay in milliseconds added to every deadline, so jobs with the same interval drift apart.
+		args (tuple): The arguments to pass to the function.
+		kwargs (dict): The keyword arguments to pass to the function.
+		deadline (int): The tick at which the job is due.
+		runs (int): The number of runs.
+		overruns (int): The number of runs that ended after the next run was due.
+		total_time (int): The total runtime in milliseconds.
+		forced (bool): Whether the job was forced while running, it is then due again when it ends.
+	"""
+
+	def __init__(self, name, func, interval, fixed_rate=True, jitter=0, args=(), kwargs=None):
+		self.name = name
+		self.func = func
+		self.interval = int(interval)
+		self.fixed_rate = fixed_rate
+		self.jitter = jitter
+		self.args = args
+		self.kwargs = kwargs or {}
+		self.runs = 0
+		self.overruns = 0
+		self.total_time = 0
+		self.forced = False
+		self.scheduled = ticks_add(ticks_ms(), self.interval)
+		self.deadline = self.__jittered(self.scheduled)
+
+	def reschedule(self, start, end):
+		"""
+		Records a run from start to end and sets the next deadline. Missed fixed-rate runs are skipped, not caught up on.
+		"""
+		self.runs += 1
+		self.total_time += ticks_diff(end, start)
+		next_run = ticks_add(self.scheduled, self.interval)
+		late = ticks_diff(end, next_run)
+		if late >= 0:
+			self.overruns += 1
+		if not self.fixed_rate:
+			next_run = ticks_add(end, self.interval)
+		elif late >= 0:
+			next_run = ticks_add(next_run, (late//self.interval + 1)*self.interval)
+		self.scheduled = next_run
+		self.deadline = end if self.forced else self.__jittered(next_run)
+		self.forced = False
+
+	def __jittered(self, tick):
+		return ticks_add(tick, randint(0, self.jitter)) if self.jitter else tick
+
+class Scheduler():
+	"""
+	Runs periodic jobs at their deadlines. The jobs are kept in a min-heap on their deadline, compared with ticks_diff
+	so the order survives the wraparound of ticks_ms(), and a loop only has to check the earliest deadline.
+
+	Attributes:
+		jobs (dict): The jobs by name.
+
+	Methods:
+		add(name, func, interval, fixed_rate, jitter, *args, **kwargs): Adds a job.
+		run_pending(): Runs the jobs that are due.
+		run_pending_async(): Runs and awaits the jobs that are due, for jobs that are coroutine functions.
+		force(name): Makes a job due now, also while it is running.
+		sleep_time(max_sleep): Returns how long the loop may sleep until the next job is due.
+		stats(): Returns the run count, overrun count and average runtime per job.
+	"""
+
+	def __init__(self):
+		self.jobs = {}
+		self.__heap = []
+		self.__running = None
+
+	def add(self, name, func, interval, fixed_rate=True, jitter=0, *args, **kwargs):
+		"""
+		Adds a job that is first due after interval milliseconds.
+
+		Parameters:
+			name (str): The name of the job.
+			func (callable): The function to run.
+			interval (int): The time between two runs in milliseconds.
+			fixed_rate (bool): True to space runs from their scheduled start, False to space them from the end of the previous run.
+			jitter (int): The largest random delay in milliseconds added to every deadline.
+			*args: Optional positional arguments to pass to the function.
+			**kwargs: Optional keyword arguments to pass to the function.
+
+		Returns:
+			Job: The added job.
+		"""
+		job = Job(name, func, interval, fixed_rate, jitter, args, kwargs)
+		self.jobs[name] = job
+		self.__heap.append(job)
+		self.__sift_up(len(self.__heap)-1)
+		return job
+
+	def run_pending(self):
+		"""
+		Runs the jobs that are due, earliest deadline first. Every job runs at most once per call, also when it
+		forces itself.
+
+		Returns:
+			int: The number of jobs run.
+		"""
+		heap = self.__heap
+		current_time = ticks_ms()
+		ran = 0
+		for _ in range(len(heap)):
+			if not heap or ticks_diff(current_time, heap[0].deadline) < 0:
+				break
+			job = self.__pop()
+			self.__running = job
+			start = ticks_ms()
+			try:
+				job.func(*job.args, **job.kwargs)
+			finally:
+				self.__running = None
+				job.reschedule(start, ticks_ms())
+				heap.append(job)
+				self.__sift_up(len(heap)-1)
+			ran += 1
+		return ran
+
+	async def run_pending_async(self):
+		"""
+		As run_pending(), but for jobs that are coroutine functions, which are awaited one at a time.
+
+		Returns:
+			int: The number of jobs run.
+		"""
+		heap = self.__heap
+		current_time = ticks_ms()
+		ran = 0
+		for _ in range(len(heap)):
+			if not heap or ticks_diff(current_time, heap[0].deadline) < 0:
+				break
+			job = self.__pop()
+			self.__running = job
+			start = ticks_ms()
+			try:
+				await job.func(*job.args, **job.kwargs)
+			finally:
+				self.__running = None
+				job.reschedule(start, ticks_ms())
+				heap.append(job)
+				self.__sift_up(len(heap)-1)
+			ran += 1
+		return ran
+
+	def force(self, name):
+		"""
+		Makes a job due now, replacing Periodic.bypass_timing. A job that forces itself while running is due again
+		when it ends.
+		"""
+		job = self.jobs[name]
+		if job is self.__running:
+			job.forced = True
+			return
+		job.deadline = ticks_ms()
+		self.__sift_up(self.__heap.index(job))
+
+	def sleep_time(self, max_sleep=None):
+		"""
+		Returns the number of milliseconds until the next job is due, at most max_sleep.
+		"""
+		if not self.__heap:
+			return max_sleep
+		sleep_time = max(ticks_diff(self.__heap[0].deadline, ticks_ms()), 0)
+		return sleep_time if max_sleep is None else min(sleep_time, max_sleep)
+
+	def stats(self):
+		"""
+		Returns per job the number of runs, the number of overruns and the average runtime in milliseconds.
+		"""
+		return {name: {'runs': job.runs, 'overruns': job.overruns, 'avg_time': job.total_time/job.runs if job.runs else 0}
+				for name, job in self.jobs.items()}
+
+	def __pop(self):
+		heap = self.__heap
+		job = heap[0]
+		last = heap.pop()
+		if heap:
+			heap[0] = last
+			self.__sift_down(0)
+		return job
+
+	def __sift_up(self, i):
+		heap = self.__heap
+		while i > 0:
+			parent = (i-1) >> 1
+			if ticks_diff(heap[i].deadline, heap[parent].deadline) >= 0:
+				break
+			heap[i], heap[parent] = heap[parent], heap[i]
+			i = parent
+
+	def __sift_down(self, i):
+		heap = self.__heap
+		length = len(heap)
+		while True:
+			child = 2*i+1
+			if child >= length:
+				break
+			if child+1 < length and ticks_diff(heap[child+1].deadline, heap[child].deadline) < 0:
+				child += 1
+			if ticks_diff(heap[child].deadline, heap[i].deadline) >= 0:
+				break
+			heap[i], heap[child] = heap[child], heap[i]
+			i = child
+
+class FrameScheduler():
+	"""
+	Paces a render loop at a target frame rate and tells it how long it may sleep.
+
+	Attributes:
+		fps (int): The target frame rate, capped at max_fps.
+		max_fps (int): The highest frame rate that can be configured.
+		frame_time (int): The time between two frames in milliseconds.
+		poll_interval (int): The longest time the loop may sleep, e.g. to keep polling the touch sensors.
+		frames (int): The number of frames rendered.
+		dropped (int): The number of frame deadlines that were missed.
+
+	Methods:
+		frame_due(): Returns True if the next frame should be rendered.
+		begin_frame() / end_frame(): Mark the start and end of a rendered frame.
+		wait(next_event_ms): Sleeps until the next frame, event or poll.
+		stats(): Returns the achieved frame rate, frame time percentiles and dropped frames.
+	"""
+
+	def __init__(self, fps=30, max_fps=60, poll_interval=20, window=64):
+		"""
+		Parameters:
+			fps (int): The target frame rate.
+			max_fps (int): The cap for the target frame rate.
+			poll_interval (int): The longest time to sleep in milliseconds.
+			window (int): The number of frame times kept for the percentiles.
+		"""
+		self.max_fps = max_fps
+		self.set_fps(fps)
+		self.poll_interval = poll_interval
+		self.frames = 0
+		self.dropped = 0
+
+		self.__frame_times = array('H', [0]*window)
+		self.__index = 0
+		self.__filled = 0
+		self.__next_frame = ticks_ms()
+		self.__frame_start = self.__next_frame
+		self.__stats_time = self.__next_frame
+		self.__stats_frames = 0
+
+	def set_fps(self, fps):
+		"""
+		Sets the target frame rate, capped at max_fps.
+		"""
+		self.fps = max(1, min(fps, self.max_fps))
+		self.frame_time = 1000//self.fps
+
+	def frame_due(self):
+		return ticks_diff(ticks_ms(), self.__next_frame) >= 0
+
+	def begin_frame(self):
+		current_time = ticks_ms()
+		if ticks_diff(current_time, self.__next_frame) > self.frame_time:
+			# The loop was idle, not late
+			self.__next_frame = current_time
+		self.__frame_start = current_time
+
+	def end_frame(self):
+		current_time = ticks_ms()
+		duration = ticks_diff(current_time, self.__frame_start)
+		self.__frame_times[self.__index] = min(duration, 0xFFFF)
+		self.__index = (self.__index+1) % len(self.__frame_times)
+		self.__filled = min(self.__filled+1, len(self.__frame_times))
+		self.frames += 1
+		self.__stats_frames += 1
+
+		self.__next_frame = ticks_add(self.__next_frame, self.frame_time)
+		late = ticks_diff(current_time, self.__next_frame)
+		if late >= 0:
+			self.dropped += late//self.frame_time + 1
+			self.__next_frame = current_time
+
+	def sleep_time(self, next_event_ms=None):
+		"""
+		Returns how long the loop may sleep in milliseconds.
+
+		Parameters:
+			next_event_ms (int): Milliseconds until the next animation event, 0 while animating, None if idle.
+		"""
+		sleep_time = self.poll_interval
+		if next_event_ms is not None:
+			if next_event_ms <= 0:
+				next_event_ms = ticks_diff(self.__next_frame, ticks_ms())
+			sleep_time = min(sleep_time, next_event_ms)
+		return max(sleep_time, 0)
+
+	def wait(self, next_event_ms=None):
+		sleep_time = self.sleep_time(next_event_ms)
+		if sleep_time > 0:
+			sleep_ms(sleep_time)
+
+	def stats(self):
+		"""
+		Returns the achieved frame rate since the previous call, the 50th/95th/99th percentile frame time
+		in milliseconds, and the number of frames rendered and dropped.
+		"""
+		current_time = ticks_ms()
+		elapsed = ticks_diff(current_time, self.__stats_time)
+		fps = self.__stats_frames*1000/elapsed if elapsed > 0 else 0
+		self.__stats_time = current_time
+		self.__stats_frames = 0
+
+		frame_times = sorted(self.__frame_times[:self.__filled])
+		percentiles = {}
+		for percentile in (50, 95, 99):
+			percentiles[f'p{percentile}'] = frame_times[min(len(frame_times)*percentile//100, len(frame_times)-1)] if frame_times else 0
+		return {'fps': fps, 'frame_time': percentiles, 'frames': self.frames, 'dropped': self.dropped}
+
 class WatchDog():
 	"""
 	A class to implement a watchdog timer for multiple threads. It helps in monitoring the activity of threads
@@ -71,7 +393,7 @@ class WatchDog():
 		timeout (int): The timeout value in milliseconds after which a thread is considered unresponsive.
 		last_updates (dict): A dictionary to track the last update time of each thread. The keys are thread identifiers,
 							 and the values are the last update timestamps.
-		__lock (_thread.lock): A lock to ensure thread-safe updates to the last_updates dictionary.
+		__lock (NamedLock): A lock to ensure thread-safe updates to the last_updates dictionary.
 
 	Methods:
 		kill(): Marks the first thread in the last_updates dictionary as killed by setting its last update time to -1.
@@ -90,7 +412,7 @@ class WatchDog():
 		self.timeout = timeout
 		self.stop_routine = stop_routine
 		self.last_updates = {}  # Dictionary to track last update per thread
-		self.__lock = allocate_lock()
+		self.__lock = NamedLock('WatchDog')
 		self.wdt = WDT(timeout = 8388)
 
 	def kill(self):
@@ -144,4 +466,66 @@ class WatchDog():
 			for key in self.last_updates.keys():
 				if ticks_diff(current_time, self.last_updates.get(key, current_time)) > self.timeout:
 					return False
-		return True
\ No newline at end of file
+		return True
+
+class Boot_Timeline():
+	"""
+	Records when the stages of the boot are reached, so the time to the first pixel and to the first sync with the
+	server can be tracked. Stages can be marked from both threads.
+
+	Attributes:
+		start (int): The tick the boot started at.
+		stages (list): (stage, milliseconds since start) per stage reached, in the order they were reached.
+
+	Methods:
+		mark(stage): Records that a stage is reached, only the first time.
+		reached(stage): Returns whether a stage is reached.
+		elapsed(stage): Returns the milliseconds from the start to a stage.
+		report(): Returns the timeline as a line of text.
+	"""
+
+	def __init__(self, start=None):
+		"""
+		Parameters:
+			start (int): The tick the boot started at, defaults to now.
+		"""
+		self.start = ticks_ms() if start is None else start
+		self.stages = []
+
+	def mark(self, stage):
+		"""
+		Records that a stage is reached. A stage is only recorded the first time, e.g. the first sync.
+
+		Returns:
+			bool: Whether the stage was reached for the first time.
+		"""
+		if self.reached(stage):
+			return False
+		self.stages.append((stage, ticks_diff(ticks_ms(), self.start)))
+		return True
+
+	def reached(self, stage):
+		for name, elapsed in self.stages:
+			if name == stage:
+				return True
+		return False
+
+	def elapsed(self, stage):
+		"""
+		Returns the milliseconds from the start to a stage, None if it is not reached.
+		"""
+		for name, elapsed in self.stages:
+			if name == stage:
+				return elapsed
+		return None
+
+	def report(self):
+		"""
+		Returns the timeline as text, e.g. "state 310 ms (+310), first_pixel 420 ms (+110)".
+		"""
+		parts = []
+		previous = 0
+		for name, elapsed in self.stages:
+			parts.append(f"{name} {elapsed} ms (+{elapsed-previous})")
+			previous = elapsed
+		return ", ".join(parts)
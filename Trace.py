@@ -0,0 +1,237 @@
+"""
+Low-overhead tracing of named spans into a preallocated ring buffer.
+
+A span is timed at its call site:
+
+	start = Trace.begin()
+	...
+	Trace.end(Trace.DRAW_FACE, start)
+
+While tracing is disabled begin() returns -1 and end() returns straight away. While it is enabled a span is written
+into fixed arrays, so tracing does not allocate per event. The oldest spans are overwritten once the buffer is full.
+The trace is dumped as JSON or in the Chrome trace format (chrome://tracing, Perfetto) over the serial console with
+dump(), or served over HTTP by a Trace_Server. Per span name the count, total and maximum duration are also kept since
+tracing was turned on, so summary() is not limited to the spans still in the buffer.
+"""
+import gc
+import json
+import socket
+import select
+import _thread
+from array import array
+from time import ticks_us, ticks_diff
+
+CAPACITY = 512
+MAX_NAMES = 32
+
+NAMES = []
+
+def register(name):
+	"""
+	Registers a span name.
+
+	Returns:
+		int: The id of the span, passed to end().
+	"""
+	if name in NAMES:
+		return NAMES.index(name)
+	if len(NAMES) >= MAX_NAMES:
+		raise ValueError("Too many span names")
+	NAMES.append(name)
+	return len(NAMES)-1
+
+ANIMATE_STATUS = register('animate_status')
+DRAW_FACE = register('draw_face')
+GET_BITMAP = register('get_bitmap')
+PBITMAP = register('pbitmap')
+WEB_GET = register('webserver_get')
+WEB_POST = register('webserver_post')
+GC_COLLECT = register('gc_collect')
+SAVE_STATE = register('save_state')
+
+_enabled = False
+_ids = array('B', bytes(CAPACITY))
+_threads = array('B', bytes(CAPACITY))
+_starts = array('L', [0]*CAPACITY)
+_durations = array('L', [0]*CAPACITY)
+_counts = array('L', [0]*MAX_NAMES)
+_totals = array('Q', [0]*MAX_NAMES)
+_maxima = array('L', [0]*MAX_NAMES)
+_index = 0
+_count = 0
+_thread_ids = {}
+_clock = ticks_us
+
+def use_clock(ticks):
+	"""
+	Sets the ticks function spans are timed with, ticks_us by default. The durations are in its unit.
+	"""
+	global _clock
+	_clock = ticks
+
+def enable(enabled=True):
+	"""
+	Turns tracing on or off at runtime. Turning it on clears the buffer.
+	"""
+	global _enabled, _index, _count
+	if enabled and not _enabled:
+		_index = _count = 0
+		for i in range(MAX_NAMES):
+			_counts[i] = _totals[i] = _maxima[i] = 0
+		_thread_ids.clear()
+		_thread_ids[_thread.get_ident()] = 0
+	_enabled = enabled
+
+def enabled():
+	return _enabled
+
+def begin():
+	"""
+	Returns the start of a span, -1 while tracing is disabled.
+	"""
+	return _clock() if _enabled else -1
+
+def end(span, start):
+	"""
+	Writes a span into the ring buffer. Spans ended on both cores at the same moment may overwrite each other.
+
+	Parameters:
+		span (int): The id of the span, see register().
+		start (int): The start returned by begin().
+	"""
+	global _index, _count
+	if start < 0 or not _enabled:
+		return
+	index = _index
+	_index = (index+1) % CAPACITY
+	_ids[index] = span
+	_threads[index] = _thread_ids.get(_thread.get_ident(), 1)
+	_starts[index] = start
+	duration = ticks_diff(_clock(), start)
+	_durations[index] = duration
+	_counts[span] += 1
+	_totals[span] += duration
+	if duration > _maxima[span]:
+		_maxima[span] = duration
+	if _count < CAPACITY:
+		_count += 1
+
+def collect():
+	"""
+	Runs gc.collect() as a GC_COLLECT span.
+	"""
+	start = begin()
+	gc.collect()
+	end(GC_COLLECT, start)
+
+def events():
+	"""
+	Yields the traced spans from oldest to newest as (name, start, duration, thread). The start is in microseconds
+	since the oldest span, so it does not suffer from the wraparound of ticks_us().
+	"""
+	first = (_index - _count) % CAPACITY
+	origin = _starts[first]
+	for i in range(_count):
+		index = (first + i) % CAPACITY
+		yield NAMES[_ids[index]], ticks_diff(_starts[index], origin), _durations[index], _threads[index]
+
+def write(stream, chrome=True):
+	"""
+	Writes the trace to a stream one span at a time, so no string of the whole trace is built.
+
+	Parameters:
+		stream: An object with a write(str) method, e.g. sys.stdout or a socket.
+		chrome (bool): True for the Chrome trace format, False for a JSON list of spans.
+	"""
+	stream.write('{"traceEvents":[' if chrome else '[')
+	separator = ''
+	for name, start, duration, thread in events():
+		if chrome:
+			stream.write(f'{separator}{{"name":"{name}","ph":"X","ts":{start},"dur":{duration},"pid":0,"tid":{thread}}}')
+		else:
+			stream.write(f'{separator}{{"name":"{name}","start":{start},"duration":{duration},"thread":{thread}}}')
+		separator = ','
+	stream.write(']}' if chrome else ']')
+
+def dump(chrome=True):
+	"""
+	Prints the trace on the serial console, see write().
+	"""
+	import sys
+	write(sys.stdout, chrome)
+	print()
+
+def summary():
+	"""
+	Returns per span name the number of spans since tracing was turned on, and their average and maximum duration
+	in microseconds.
+	"""
+	return {NAMES[i]: {'count': _counts[i], 'average_us': _totals[i]//_counts[i], 'max_us': _maxima[i]}
+			for i in range(len(NAMES)) if _counts[i]}
+
+class _SocketWriter():
+	def __init__(self, conn):
+		self.conn = conn
+
+	def write(self, text):
+		self.conn.sendall(text.encode())
+
+class Trace_Server():
+	"""
+	Serves the trace over HTTP without blocking the loop that polls it.
+
+	Paths:
+		/trace: The trace in the Chrome trace format.
+		/trace.json: The trace as a JSON list of spans.
+		/trace/summary: The summary() of the trace.
+		/trace/on, /trace/off: Turns tracing on or off.
+
+	Methods:
+		poll(): Answers a pending request, if any.
+		close(): Stops listening.
+	"""
+
+	def __init__(self, port=8080):
+		self.port = port
+		self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.__sock.bind(socket.getaddrinfo('0.0.0.0', port)[0][-1])
+		self.__sock.listen(1)
+		self.__poller = select.poll()
+		self.__poller.register(self.__sock, select.POLLIN)
+
+	def poll(self):
+		"""
+		Answers a pending request, if any. Returns straight away when there is none.
+		"""
+		if not self.__poller.poll(0):
+			return
+		conn, addr = self.__sock.accept()
+		try:
+			conn.settimeout(2)
+			request = conn.recv(512)
+			parts = request.split(b" ")
+			path = parts[1].decode() if len(parts) > 1 else ""
+			if path == "/trace/on" or path == "/trace/off":
+				enable(path == "/trace/on")
+				self.__send(conn, "200 OK", json.dumps({'enabled': _enabled}))
+			elif path == "/trace/summary":
+				self.__send(conn, "200 OK", json.dumps(summary()))
+			elif path == "/trace" or path == "/trace.json":
+				self.__send(conn, "200 OK")
+				write(_SocketWriter(conn), chrome=path == "/trace")
+			else:
+				self.__send(conn, "404 Not Found", json.dumps({'success': False}))
+		except OSError as e:
+			print(f"Failed to serve trace: {e}")
+		finally:
+			conn.close()
+
+	def close(self):
+		self.__sock.close()
+
+	def __send(self, conn, status, body=None):
+		# Without a Content-Length the body ends when the connection is closed, so the trace can be streamed
+		conn.sendall(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n".encode())
+		if body is not None:
+			conn.sendall(body.encode())
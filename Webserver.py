@@ -2,13 +2,20 @@ import network
 import time
 import json
 import gc
-import socket
-from Light import Lights
+import hashlib
+from binascii import hexlify
 import machine
+try:
+	import asyncio
+except ImportError:
+	import uasyncio as asyncio
+from Http import HttpConnection, loads
+import Trace
 
 MAX_DELTA_T = 20
 SLEEP_TIME = 2
 RETRY_INTERVAL = 1
+LONG_POLL_WAIT = 25
 
 class Webserver():
 	"""
@@ -21,14 +28,21 @@ class Webserver():
 		__ssid (str): The SSID of the WiFi network to connect to.
 		__password (str): The password for the WiFi network.
 		__version (int): The version number of the software.
+		__connection (HttpConnection): The kept-alive connection to the webserver.
+		__watch_connection (HttpConnection): The connection used for long-polling, so it does not hold up other requests.
+		long_poll_supported (bool): Whether the webserver holds long-poll requests, None until the first reply.
 
 	Methods:
 		__init__(self, user_id, ssid, password, base): Initializes a new Webserver instance.
 		isconnected(self): Checks if the device is currently connected to a WiFi network.
 		connect(self): Attempts to connect to the specified WiFi network.
+		connect_async(self): As connect(), for the asyncio runtime.
 		disconnect(self): Disconnects from the currently connected WiFi network.
-		get(self, subdomain): Placeholder for a method to perform GET requests.
+		get(self, subdomain, data): Initiates a POST (to get data) request to a specified subdomain.
 		post(self, subdomain, data): Initiates a POST request to a specified subdomain with given data.
+		watch(self, subdomain, data, revision, wait): Long-polls a subdomain without blocking.
+		get_async(self, subdomain, data, revision) / post_async(self, subdomain, data): As get() and post(), for the asyncio runtime.
+		connection_stats(self): Returns the statistics of the connection to the webserver.
 	"""
 
 	def __init__(self, user_id, ssid, password, base='https://thomasbendington.pythonanywhere.com', version="-1"):
@@ -48,6 +62,17 @@ class Webserver():
 		self.__password = password
 		self.__version = version
 
+		host = base.replace("http://", "").replace("https://", "").split("/")[0]  # Extract domain
+		port = 80  # Port 80 unless given in the base URL, MicroPython lacks native TLS
+		if ":" in host:
+			host, port = host.split(":")
+			port = int(port)
+		self.__connection = HttpConnection(host, port)
+		self.__watch_connection = HttpConnection(host, port)
+		self.__watch_deadline = None
+		self.__watch_revision = None
+		self.long_poll_supported = None
+
 	def isconnected(self):
 		"""
 		Checks if the device is currently connected to a WiFi network.
@@ -66,6 +91,7 @@ class Webserver():
 		"""
 		t_start = time.time()
 
+		self.__close_connections()
 		self.__wlan.active(True)
 		if self.__wlan.isconnected():
 			self.__wlan.disconnect()
@@ -96,86 +122,74 @@ class Webserver():
 		time.sleep(SLEEP_TIME)
 		return is_connected
 
+	async def connect_async(self):
+		"""
+		As connect(), but yields to the asyncio loop while waiting for the network.
+
+		Returns:
+			bool: True if the connection was successful, False otherwise.
+		"""
+		t_start = time.ticks_ms()
+
+		self.__close_connections()
+		self.__wlan.active(True)
+		if self.__wlan.isconnected():
+			self.__wlan.disconnect()
+			await asyncio.sleep_ms(SLEEP_TIME*1000)
+		await asyncio.sleep_ms(500)
+		for i in range(0, 5):
+			try:
+				self.__wlan.connect(self.__ssid, self.__password)
+				break
+			except:
+				if i == 4:
+					print("Failed to connect to network")
+					return False
+				await asyncio.sleep_ms(RETRY_INTERVAL*1000)
+		self.__wlan.config(pm=0xa11140)
+		while not (self.__wlan.isconnected()) and (time.ticks_diff(time.ticks_ms(), t_start) < MAX_DELTA_T*1000):
+			print(f"Connecting to network: {time.ticks_diff(time.ticks_ms(), t_start)//1000}/20s", end="\r")
+			await asyncio.sleep_ms(100)
+		print("")
+
+		is_connected = self.__wlan.isconnected()
+		if is_connected:
+			print("Connection successful")
+			print("IP address:", self.__wlan.ifconfig()[0])
+		else:
+			print("Connection failed")
+		await asyncio.sleep_ms(SLEEP_TIME*1000)
+		return is_connected
+
 	def disconnect(self):
 		"""
 		Disconnects from the currently connected WiFi network.
 		"""
+		self.__close_connections()
 		self.__wlan.disconnect()
 		self.__wlan.active(False)
 		print("Wifi disconnected")
 
-	def get(self, subdomain: str, data: dict = None):
+	def get(self, subdomain: str, data: dict = None, revision: str = None):
 		"""
-		Initiates a POST (to get data) request to a specified subdomain with optional data using raw sockets.
+		Initiates a POST (to get data) request to a specified subdomain with optional data.
+
+		The reply carries its revision under 'revision'. When the revision of the last reply that was used is passed,
+		it is sent as If-None-Match and an unchanged reply is returned as {'success': True, 'not_modified': True}
+		without being decoded.
 
 		Parameters:
 			subdomain (str): The subdomain to append to the base URL for the POST request.
 			data (dict, optional): Additional data to be sent with the POST request. Defaults to None.
+			revision (str, optional): The revision of the last reply that was used. Defaults to None.
 		"""
-		url = self.__base_url
-		host = url.replace("http://", "").replace("https://", "").split("/")[0]  # Extract domain
-		path = f"/api/v1/{subdomain}/get"
-		port = 80  # Change to 443 for HTTPS (MicroPython lacks native TLS)
-
 		if data is None:
 			data = {}
-		data['user_id'] = self.__user_id
-		data['version'] = self.__version
-		json_data = json.dumps(data)
-
-		request = (
-			f"POST {path} HTTP/1.1\r\n"
-			f"Host: {host}\r\n"
-			f"Content-Type: application/json\r\n"
-			f"Content-Length: {len(json_data)}\r\n"
-			f"Connection: close\r\n\r\n"
-			f"{json_data}"
-		)
-
-		sock = None
-		try:
-			gc.collect()
-
-			# Open socket connection
-			addr = socket.getaddrinfo(host, port)[0][-1]
-			sock = socket.socket()
-			sock.settimeout(10)
-			sock.connect(addr)
-			sock.send(request.encode())
-
-
-			response = b""
-			while True:
-				chunk = sock.recv(1024)
-				if not chunk:
-					break
-				response += chunk
-
-			response_str = response.decode()
-			headers, body = response_str.split("\r\n\r\n", 1)
-
-			# Check HTTP status code
-			status_line = headers.split("\r\n")[0]
-			status_code = int(status_line.split(" ")[1])
-			if status_code < 200 or status_code >= 300:
-				print(f"Failed to get data: HTTP {status_code}")
-				return {'success': False, 'message': f'HTTP {status_code}'}
-			
-			return json.loads(body)
-
-		except Exception as e:
-			print(f"Failed to get data: {e}")
-			return {'success': False, 'message': str(e)}
-
-		finally:
-			if sock and isinstance(sock, socket.socket):
-				sock.close()
-				del sock
-			gc.collect()
+		return self.__request(f"/api/v1/{subdomain}/get", data, "get", revision=revision, conditional=True)
 
 	def post(self, subdomain: str, data: dict) -> dict:
 		"""
-		Initiates a POST request to a specified subdomain with given data using raw sockets.
+		Initiates a POST request to a specified subdomain with given data.
 
 		Parameters:
 			subdomain (str): The subdomain to append to the base URL for the POST request.
@@ -184,64 +198,168 @@ class Webserver():
 		Returns:
 			dict: The response from the server in JSON format or an error message.
 		"""
-		url = self.__base_url
-		host = url.replace("http://", "").replace("https://", "").split("/")[0]  # Extract domain
-		path = f"/api/v1/{subdomain}/post"
-		port = 80  # Change to 443 for HTTPS (MicroPython lacks native TLS)
+		return self.__request(f"/api/v1/{subdomain}/post", data, "post")
 
-		# Add required fields
-		data['user_id'] = self.__user_id
-		data['version'] = self.__version
-		json_data = json.dumps(data)
-
-		request = (
-			f"POST {path} HTTP/1.1\r\n"
-			f"Host: {host}\r\n"
-			f"Content-Type: application/json\r\n"
-			f"Content-Length: {len(json_data)}\r\n"
-			f"Connection: close\r\n\r\n"
-			f"{json_data}"
-		)
-
-		sock = None
+	async def get_async(self, subdomain: str, data: dict = None, revision: str = None):
+		"""
+		As get(), but yields to the asyncio loop while connecting and waiting for the reply.
+		"""
+		if data is None:
+			data = {}
+		return await self.__request_async(f"/api/v1/{subdomain}/get", data, "get", revision=revision, conditional=True)
+
+	async def post_async(self, subdomain: str, data: dict) -> dict:
+		"""
+		As post(), but yields to the asyncio loop while connecting and waiting for the reply.
+		"""
+		return await self.__request_async(f"/api/v1/{subdomain}/post", data, "post")
+
+	def watch(self, subdomain: str, data: dict = None, revision: str = None, wait: int = LONG_POLL_WAIT):
+		"""
+		Long-polls a subdomain: the server holds the request until its reply differs from revision or wait seconds
+		have passed. This does not block. The first call sends the request and calls return None until the reply has
+		arrived, which is returned as get() returns it. The next call sends a new request.
+
+		A backend that does not hold requests answers a successful or not modified reply without Preference-Applied,
+		long_poll_supported is then set to False and get() should be polled instead. Error replies leave it unchanged.
+
+		Parameters:
+			subdomain (str): The subdomain to append to the base URL for the POST request.
+			data (dict, optional): Additional data to be sent with the POST request. Defaults to None.
+			revision (str, optional): The revision of the last reply that was used. Defaults to None.
+			wait (int, optional): The time in seconds the server may hold the request. Defaults to LONG_POLL_WAIT.
+
+		Returns:
+			dict: The response from the server or an error message, None while waiting for it.
+		"""
+		connection = self.__watch_connection
+		if self.__watch_deadline is None:
+			if data is None:
+				data = {}
+			try:
+				connection.send("POST", f"/api/v1/{subdomain}/get", self.__encode(data), self.__headers(revision, wait))
+			except Exception as e:
+				print(f"Failed to watch data: {e}")
+				return {'success': False, 'message': str(e)}
+			self.__watch_revision = revision
+			self.__watch_deadline = time.ticks_add(time.ticks_ms(), (wait + connection.timeout)*1000)
+			return None
+
+		if not connection.ready():
+			if time.ticks_diff(time.ticks_ms(), self.__watch_deadline) < 0:
+				return None
+			connection.close()
+			self.__watch_deadline = None
+			print("Failed to watch data: no reply")
+			return {'success': False, 'message': 'No reply'}
+
+		self.__watch_deadline = None
 		try:
-			gc.collect()
+			status_code, reply_headers, body = connection.read_response()
+			# Error replies, e.g. of a proxy, say nothing about the backend
+			if 200 <= status_code < 300 or status_code == 304:
+				self.long_poll_supported = 'preference-applied' in reply_headers
+			return self.__reply(status_code, reply_headers, body, "watch", self.__watch_revision, True)
+		except Exception as e:
+			print(f"Failed to watch data: {e}")
+			return {'success': False, 'message': str(e)}
 
-			addr = socket.getaddrinfo(host, port)[0][-1]
-			sock = socket.socket()
-			sock.settimeout(10)
-			sock.connect(addr)
+	def connection_stats(self):
+		"""
+		Returns the number of requests, connects, address lookups and reconnects of the connection to the server.
+		"""
+		return self.__connection.stats
 
-			sock.send(request.encode())
+	def __close_connections(self):
+		self.__connection.close()
+		self.__watch_connection.close()
+		self.__watch_deadline = None
 
-			response = b""
-			while True:
-				chunk = sock.recv(1024)
-				if not chunk:
-					break
-				response += chunk
+	def __request(self, path, data, action, revision=None, conditional=False):
+		"""
+		Sends data to the server over the kept-alive connection and decodes the JSON reply.
 
-			response_str = response.decode()
-			headers, body = response_str.split("\r\n\r\n", 1)
+		Parameters:
+			path (str): The path of the request.
+			data (dict): The data to be sent, the user id and version are added.
+			action (str): The name of the action used in error messages.
+			revision (str, optional): The revision of the last reply that was used, see get().
+			conditional (bool): Whether the reply is revisioned, see get().
 
-			status_line = headers.split("\r\n")[0]
-			status_code = int(status_line.split(" ")[1])
-			if status_code < 200 or status_code >= 300:
-				print(f"Failed to post data: HTTP {status_code}")
-				return {'success': False, 'message': f'HTTP {status_code}'}
+		Returns:
+			dict: The response from the server in JSON format or an error message.
+		"""
+		json_data = self.__encode(data)
+		try:
+			gc.collect()
+			span = Trace.begin()
+			status_code, reply_headers, body = self.__connection.request("POST", path, json_data, self.__headers(revision))
+			Trace.end(Trace.WEB_GET if action == "get" else Trace.WEB_POST, span)
+			return self.__reply(status_code, reply_headers, body, action, revision, conditional)
+
+		except Exception as e:
+			print(f"Failed to {action} data: {e}")
+			return {'success': False, 'message': str(e)}
+
+		finally:
+			gc.collect()
 
-			return json.loads(body)
+	async def __request_async(self, path, data, action, revision=None, conditional=False):
+		"""
+		As __request(), but sends the request with HttpConnection.request_async().
+		"""
+		json_data = self.__encode(data)
+		try:
+			gc.collect()
+			span = Trace.begin()
+			status_code, reply_headers, body = await self.__connection.request_async("POST", path, json_data, self.__headers(revision))
+			Trace.end(Trace.WEB_GET if action == "get" else Trace.WEB_POST, span)
+			return self.__reply(status_code, reply_headers, body, action, revision, conditional)
 
 		except Exception as e:
-			print(f"Failed to post data: {e}")
+			print(f"Failed to {action} data: {e}")
 			return {'success': False, 'message': str(e)}
 
 		finally:
-			if sock and isinstance(sock, socket.socket):
-				sock.close()
-				del sock
 			gc.collect()
 
+	def __encode(self, data):
+		# Add required fields
+		data['user_id'] = self.__user_id
+		data['version'] = self.__version
+		return json.dumps(data)
+
+	def __headers(self, revision, wait=None):
+		headers = {'Content-Type': 'application/json'}
+		if revision is not None:
+			headers['If-None-Match'] = revision
+		if wait is not None:
+			headers['Prefer'] = f"wait={wait}"
+		return headers
+
+	def __reply(self, status_code, reply_headers, body, action, revision, conditional):
+		"""
+		Decodes a reply, see get() for the revisions of conditional replies.
+		"""
+		if status_code == 304:
+			return {'success': True, 'not_modified': True, 'revision': revision}
+
+		# Check HTTP status code
+		if status_code < 200 or status_code >= 300:
+			print(f"Failed to {action} data: HTTP {status_code}")
+			return {'success': False, 'message': f'HTTP {status_code}'}
+
+		if not conditional:
+			return loads(body)
+
+		# Without an ETag the reply is revisioned on a digest of its body, which still saves decoding and diffing
+		new_revision = reply_headers.get('etag') or hexlify(hashlib.sha256(body).digest()).decode()
+		if new_revision == revision:
+			return {'success': True, 'not_modified': True, 'revision': revision}
+		result = loads(body)
+		result['revision'] = new_revision
+		return result
+
 	def test_connection(self):
 		"""
 		Tests the device's ability to connect to the internet by making a GET request to a known website.
@@ -268,181 +386,45 @@ class Webserver():
 		finally:
 			gc.collect()
 		
-html_success = """<!DOCTYPE html>
-<html>
-<head>
-	<title>Maja</title>
-	<meta name="viewport" content="width=device-width, initial-scale=1">
-	<style>
-		body {
-			font-family: Arial, sans-serif;
-			margin: 0;
-			padding: 0;
-			background-color: #C0F9B3FF;
-		}
-		.container {
-			width: 80%;
-			margin: 0 auto;
-			padding: 20px;
-			background-color: #fff;
-			border-radius: 5px;
-			box-shadow: 0 2px 5px rgba(0, 0, 0, 0.1);
-			margin-top: 50px;
-		}
-	</style>
-</head>
-<body>
-	<div class="container">
-		<h1>Data has been passed to Maja</h1>
-		<p>Maja will now try to connect. It will blink green if it worked. If it didn't connect correctly, it will blink red.</p>
-	</div>
-</body>
-</html>
-"""
-
-html_fail = """<!DOCTYPE html>
-<html>
-<head>
-	<title>Maja</title>
-	<meta name="viewport" content="width=device-width, initial-scale=1">
-	<style>
-		body {
-			font-family: Arial, sans-serif;
-			margin: 0;
-			padding: 0;
-			background-color: #E49696FF;
-		}
-		.container {
-			width: 80%;
-			margin: 0 auto;
-			padding: 20px;
-			background-color: #fff;
-			border-radius: 5px;
-			box-shadow: 0 2px 5px rgba(0, 0, 0, 0.1);
-			margin-top: 50px;
-		}
-	</style>
-</head>
-<body>
-	<div class="container">
-		<h1>Connection failed</h1>
-		<p>Something went wrong. Try again in a bit.</p>
-	</div>
-</body>
-</html>
-"""
-
-class Local_Server():
-	"""
-	A class to manage the local server for the lamp to setup the WiFi connection.
+class Deferred_Post():
 	"""
+	Stands in for a Webserver for code that posts synchronously, e.g. the climate sensor. The post is recorded instead
+	of sent, so it can be sent with Webserver.post_async() without blocking the asyncio loop.
 
-	def __init__(self, Lights=None):
-		"""
-		Initializes a new Local_Server instance.
-		"""
-		self.Lights = Lights
-
-		self.setup_network()
-		self.website()
-
-	def remove_network(self):
-		ap = network.WLAN(network.AP_IF)
-		ap.active(False)
-		print("AP Mode Is Deactivated")
-
-	def setup_network(self):
-		ap = network.WLAN(network.AP_IF)
-		ap.config(essid='Maja', security=0)
-		ap.ifconfig(('192.168.4.1', '255.255.255.0', '192.168.4.1', '8.8.8.8'))
-		time.sleep_ms(500)
-		ap.active(True)
+	Attributes:
+		subdomain (str): The subdomain of the recorded post, None if nothing was posted.
+		data (dict): The data of the recorded post.
 
-		while ap.active() == False:
-			pass
-		print('AP Mode Is Active, You can Now Connect')
-		print('IP Address To Connect to:: ' + ap.ifconfig()[0])
+	Methods:
+		post(subdomain, data): Records a post.
+		send(webserver): Sends the recorded post.
+	"""
 
-	def blink(self, colour, N=0.3, T=4):
-		if self.Lights is not None:
-			self.Lights.blink(colour, n=N, T=T)
+	def __init__(self):
+		self.subdomain = None
+		self.data = None
 
-	def website(self):
+	def post(self, subdomain, data):
 		"""
-		Displays a simple HTML webpage with a welcome message.
+		Records a post, the reply is only known once it is sent, so None is returned.
 		"""
-		s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		s.bind(('', 80))
-		s.listen(5)
-
-		if self.Lights:
-			self.Lights.set_hsv((230, 1, 1))
+		self.subdomain = subdomain
+		self.data = data
+		return None
 
-		while True:
-
-			conn, addr = s.accept()
-			print('Got a connection from %s' % str(addr))
-			request = conn.recv(1024)
-			request = str(request)
-			print(f"Content = {request}")
-
-			start = request.find('?input=') + len('?input=')
-			end = request.find('?end')
-			if start == -1 or end == -1:
-				self.show_page(conn, html_fail)
-			else:
-				json_string = request[start:end]
-				print(f"json_string: {json_string}")
-				try:
-					print(json_string.replace("%22", '"').replace("%20", ""))
-					json_dict = json.loads(json_string.replace("%22", '"').replace("%20", ""))
-				except ValueError:
-					json_dict = None
-
-				if json_dict is None:
-					print("Failed to parse JSON")
-					self.show_page(conn, html_fail)
-				else:
-					user_id = json_dict.get('user_id', None)
-					ssid = json_dict.get('ssid', None)
-					password = json_dict.get('password', None)
-					print(f"user_id: {user_id}, SSID: {ssid}, Password: {password}")
-
-					if user_id is None or ssid is None or password is None:
-						self.show_page(conn, html_fail)
-					else:
-						self.show_page(conn, html_success)
-						ws = Webserver(user_id=user_id, ssid=ssid, password=password)
-						ws.connect()
-						Secrets().save_secrets(json_dict)
-						machine.reset()
-
-	def show_page(self, conn, html):
-		"""
-		Sends an HTML page to the client.
-
-		Parameters:
-			conn (socket): The socket connection to the client.
-			html (str): The HTML content to send to the client.
+	async def send(self, webserver):
 		"""
-		response = 'HTTP/1.1 200 OK\n'
-		response += 'Content-Type: text/html\n'
-		response += '\n'
-		response += html
-		conn.send(response)
-		conn.close()
+		Sends the recorded post with Webserver.post_async().
 
-	def parse_query_string(self, query_string):
-		"""
-		Parses the query string into a dictionary.
+		Returns:
+			dict: The reply of the server, None if nothing was posted.
 		"""
-		params = {}
-		pairs = query_string.split('&')
-		for pair in pairs:
-			if '=' in pair:
-				key, value = pair.split('=')
-				params[key] = value
-		return params
+		if self.subdomain is None:
+			return None
+		subdomain, data = self.subdomain, self.data
+		self.subdomain = None
+		self.data = None
+		return await webserver.post_async(subdomain, data)
 
 class Secrets():
 	def __init__(self, file_name='secrets.json'):
@@ -474,4 +456,3 @@ if __name__ == "__main__":
 	ws.test_connection()
 	ws.disconnect()
 	# print(f"Secrets: {Secrets().get_secrets()}")
-	# Test = Local_Server(Lights(N=8, brightness=1, pin=machine.Pin(2)))
\ No newline at end of file
@@ -1,23 +1,40 @@
 import _thread
-from time import ticks_ms, sleep, sleep_ms, ticks_diff
+from time import ticks_ms, sleep, sleep_ms, ticks_diff, ticks_add
 import machine
 import gc
 import json
 import os
 import micropython
-import senko
+try:
+	import asyncio
+except ImportError:
+	import uasyncio as asyncio
 
 from DHT_Sensor import climate_sensor
 from Touch_Sensor import TouchManager
 from Light import Lights
-from Timers import WatchDog, Periodic
+from Timers import WatchDog, Periodic, FrameScheduler, Scheduler, Boot_Timeline
 from State import State, StateSync, Emotion_Manager
 from TimeProfiles import Time_Profiles
-from Webserver import Webserver, Secrets, Local_Server
+from Webserver import Webserver, Secrets, Deferred_Post
+from Locker import lock_stats
+import Trace
+from Trace import Trace_Server
 
 import tft_config
 
 TOGGLE_TIME = 1500
+TARGET_FPS = 30
+MAX_FPS = 50
+TOUCH_POLL_INTERVAL = 20
+SERVER_POLL_INTERVAL = 20
+WIFI_RESTART_TIME = 2000 # The time the Wi-Fi is left off before reconnecting, after failed gets
+LONG_POLL = True
+BATCH_POST = True
+TRACE = False # Trace spans from boot, can be turned on and off at runtime with Trace.enable()
+TRACE_PORT = None # The port of a Trace_Server, e.g. 8080, None to not serve the trace
+RUNTIME = "threads" # "threads": sensor and server loops on both cores, "async": asyncio tasks on one core
+SERVER_URL = "https://thomasbendington.pythonanywhere.com"
 VERSION = "1.2.1"
 
 def file_exists(filepath):
@@ -28,29 +45,51 @@ def file_exists(filepath):
         return False
 
 class main_system():
-	def __init__(self, safety_switch=True):
+	def __init__(self, safety_switch=True, fps=TARGET_FPS, long_poll=LONG_POLL, batch_post=BATCH_POST, trace=TRACE, trace_port=TRACE_PORT, server_url=SERVER_URL):
+		# The saved face and lamp are restored first, the network and the sensor are started by the server loop
+		self.boot = Boot_Timeline()
 		gc.collect()
+		Trace.enable(trace)
+		self.fps = fps
+		self.safety_switch = safety_switch
 		micropython.alloc_emergency_exception_buf(100)
 		self.LEDS = Lights(N=8, brightness=1, pin=machine.Pin(12))
+		self.boot.mark('lights')
 		self.state = State(self.LEDS)
+		self.boot.mark('state')
 
-		self.safety_switch = safety_switch
-		gc.collect()
-		self.dht20 = climate_sensor(scl=1, sda=0, rolling_avg_factor=1e3)
+		if self.safety_switch:
+			try:
+				self.__restore()
+			except Exception as e:
+				print("Error during restore:", e)
+		else:
+			self.__restore()
 
+		self.__trace_server = Trace_Server(trace_port) if trace_port else None
+		self.dht20 = None
 		gc.collect()
 		USER_ID, SSID, PASSWORD = Secrets().get_secrets()
 		if None in (USER_ID, SSID, PASSWORD):
 			print("No secrets found! Using local server!")
+			from Local_Server import Local_Server
 			self.state.load_state(reset=False)
 			self.state.draw_state()
 			Local_Server(self.LEDS)
 		self.WD = WatchDog(30e3, stop_routine=self.stop_routine)
-		self.ws = Webserver(user_id=USER_ID, ssid = SSID, password=PASSWORD, base = "https://thomasbendington.pythonanywhere.com", version = VERSION)
+		self.ws = Webserver(user_id=USER_ID, ssid = SSID, password=PASSWORD, base = server_url, version = VERSION)
 
-		self.state_sync = StateSync(USER_ID, self.LEDS, self.state)
+		self.state_sync = StateSync(USER_ID, self.LEDS, self.state, long_poll=long_poll, batch=batch_post)
+		self.boot.mark('webserver')
 
 		self.__lock = _thread.allocate_lock()
+		self.__hue_changing = False
+		self.__get_failed_count = 0
+		self.__climate_failed = False
+		self.__climate_post = Deferred_Post()
+		self.__updating = False
+		self.__jobs = Scheduler()
+		self.__network_jobs = Scheduler()
 
 		if self.safety_switch:
 			try:
@@ -61,6 +100,15 @@ class main_system():
 			print("Safety switch disabled!")
 			self.__startup()
 
+	def start(self, runtime=RUNTIME):
+		"""
+		Starts the routine, with the sensor and server loops as two threads or as asyncio tasks.
+		"""
+		if runtime == "async":
+			self.start_async()
+		else:
+			self.start_threads()
+
 	def start_threads(self):
 		_thread.start_new_thread(self.__sensor_thread, ())
 		if self.safety_switch:
@@ -73,6 +121,21 @@ class main_system():
 			print("Safety switch disabled!")
 			self.__server_thread()
 		
+	def start_async(self):
+		"""
+		Runs touch polling, rendering, syncing, the climate sensor and the periodic checks as asyncio tasks on this
+		core. Requests to the server yield while waiting, so a slow server does not delay the other tasks.
+		"""
+		if self.safety_switch:
+			try:
+				asyncio.run(self.__async_routine())
+			except Exception as e:
+				print("Error during startup:", e)
+				self.stop_routine()
+		else:
+			print("Safety switch disabled!")
+			asyncio.run(self.__async_routine())
+
 	def stop_routine(self):
 		with self.__lock:
 			print("Start disconnecting")
@@ -80,7 +143,7 @@ class main_system():
 			self.WD.update_WDT()
 			print("Start save state")
 			print(f"Memory: {micropython.mem_info(0)}")
-			self.state.save_state()
+			self.state.save_state(force=True)
 			self.WD.update_WDT()
 			print("Ended safe state\n Start set reset")
 			print(f"Memory: {micropython.mem_info(1)}")
@@ -90,16 +153,21 @@ class main_system():
 				machine.reset()
 			# sleep_ms(2000*1000)
 
-	def __startup(self):
-		# print("--- Startup ---")
-		gc.collect()
-		reset = file_exists("state.json")
+	def __restore(self):
+		"""
+		Draws the saved face and lamp, or the happy face if there is no saved state, before anything else starts.
+		"""
+		reset = self.state.has_saved_state()
 		print(f"Reset: {reset}\n")
 		self.state.load_state(reset=reset)
 		if not reset:
 			self.state.draw_state()
+		self.boot.mark('first_pixel')
 		print("Test state loaded")
 
+	def __startup(self):
+		# print("--- Startup ---")
+		gc.collect()
 		if self.safety_switch:
 			try:
 				os.rename("_boot.py", "boot.py")
@@ -107,16 +175,36 @@ class main_system():
 				pass
 			print("\nRebooting turned on!\n")
 
-		print("Startup complete!\n----------------\n")
+		self.boot.mark('startup')
+		print(f"Startup complete! Boot: {self.boot.report()}\n----------------\n")
+
+	def __update_in_thread(self):
+		"""
+		Checks for updates on the other core, unless a check is still running.
+		"""
+		if self.__updating:
+			return
+		self.__updating = True
+		_thread.start_new_thread(self.__update_thread, ())
+
+	def __update_thread(self):
+		try:
+			self.__update()
+		except Exception as e:
+			print("Error during update:", e)
+		finally:
+			self.__updating = False
 
 	def __update(self):
+		import senko
 		OTA = senko.Senko(
 			user="coencoensmeets",
 			repo="Maja-Pico-code",
 			branch="feature/develop",
 			files = ["main_system.py", "Animation.py", "Particle.py", "Screen.py", 
 					"State.py", "tft_config.py", "Locker.py", "Timers.py", 
-					"Touch_Sensor.py", "Webserver.py"],
+					"Touch_Sensor.py", "Webserver.py", "Local_Server.py", "Http.py", "Trace.py", "Journal.py",
+					"Emotions.py", "Scripts.py", "animations.json"],
 			debug = True,
 			working_dir = None
 		)
@@ -126,14 +214,14 @@ class main_system():
 		else:
 			print("No updates found!")
 
-	def __still_up(self):
-		print("Sensor thread still running!")
+	def __still_up(self, scheduler=None):
+		print(f"Sensor thread still running! Render: {scheduler.stats()} Jobs: {self.__jobs.stats()} {self.__network_jobs.stats()} Locks: {lock_stats()}")
 
 	def __sensor_thread(self):
 		print("Start sensor thread")
 		touch_manager = TouchManager()
-		up_periodic = Periodic(func=self.__still_up, freq=1/10)
-		Hue_Changing = False
+		scheduler = FrameScheduler(fps=self.fps, max_fps=MAX_FPS, poll_interval=TOUCH_POLL_INTERVAL)
+		up_periodic = Periodic(func=self.__still_up, freq=1/10, scheduler=scheduler)
 		touch_state = {"left": 0, "right": 0}  # Initialize with 0 for none
 
 		while self.WD.running():
@@ -141,134 +229,278 @@ class main_system():
 			up_periodic.call_func()
 			self.WD.update('sensor')
 			touch_manager.update_and_manage_state(touch_state)
-
-			if Hue_Changing and touch_state['left'] < 1000:
-				Hue_Changing = False
-				colour = self.LEDS.get_hsv()
-				self.state.draw_state({'hue': colour[0], 'saturation': colour[1], 'value': colour[2]})
-				self.state_sync.queue.add({'hue': colour[0], 'saturation': colour[1], 'value': colour[2]})
-				self.state_sync.set_block_get(False)
-				self.state.save_status = True
-
-			if self.state.is_animation_active():
-				self.state.draw_state()
-
-			if touch_state['left'] == -2: #State: toggle light (Double touch right)
-				print("Light action: Toggle")
-				colour = self.LEDS.get_hsv()
-				print(f"Colour: {colour}")
-				if colour[2] == 0:
-					print("Light action: Turn on")
-					self.state.trigger_animation({"value": 1}, TOGGLE_TIME, Time_Profiles.ease_out, force=True)
-					self.state_sync.queue.add({'value': 1})
-				else:
-					print("Light action: Turn off")
-					self.state.trigger_animation({"value": 0}, TOGGLE_TIME, Time_Profiles.ease_out, force=True)
-					self.state_sync.queue.add({'value': 0})
-				self.state.save_status = True
-			elif touch_state['left'] > 1000: #State: Change colour (Hold right)
-				print("Light action: Change colour")
-				if not Hue_Changing:
-					Hue_Changing = True
-					self.state_sync.set_block_get(True)
-					colour = self.LEDS.get_hsv()
-					if colour[1] != 1 or colour[2] != 1:
-						self.state.trigger_animation({"saturation": 1, "value": 1}, TOGGLE_TIME, Time_Profiles.ease_in, force=True)
-				self.LEDS.increase_hue(360/4)
-			elif touch_state['right'] == -2: #State: Change screen (Double touch Left)
-				print("Light action: Change screen")
-				self.state.face.screen_toggle()
-				self.state_sync.queue.add({'screen_on': 0})
-				self.state.save_status = True
-			elif touch_state['right'] == -5: #State: Reset (Coding) (Hold left)
-				print("Resetting secrets!")
-				Secrets().reset_secrets()
-				print(f"Secrets reset! Restarting in 2s")
-				sleep(2)
-				self.WD.kill()
-			elif touch_state['left'] == -5: #State: Reset (Double tap left)
-				print("Resetting state!")
-				gc.collect()
-				sleep(2)
-				print("Start renaming boot.py")
-				os.rename("boot.py", "_boot.py")
-				Lights(N=8, brightness=1, pin=machine.Pin(2)).set_hsv((0,1,1))
-				self.WD.kill()
+			next_event = self.__render(scheduler)
+			self.__handle_touch(touch_state)
 			
 			if (ticks_diff(ticks_ms(), t_start) > 100):
 				print(f"Time taken (Sensor loop): {ticks_diff(ticks_ms(), t_start)}")
 
+			scheduler.wait(next_event)
+
 		print("Sensor thread is going to kill the server thread!")
 		self.WD.kill()
 
+	def __start_sensors(self):
+		"""
+		Starts the climate sensor, after the face is drawn as it has to warm up.
+		"""
+		if self.dht20 is None:
+			self.dht20 = climate_sensor(scl=1, sda=0, rolling_avg_factor=1e3)
+			self.boot.mark('sensors')
+
 	def __server_thread(self):
 		# print("Start server thread")
-		dht20_periodic = Periodic(func=self.dht20.update_server, freq=1/(60), webserver=self.ws)
-		light_periodic = Periodic(func=self.state_sync.get, freq=1, webserver=self.ws)
-		animation_periodic = Periodic(func=self.state.check_animation_triggers, freq=1/2)
-		garbage_periodic = Periodic(func=gc.collect, freq=1/5)
-		update_periodic = Periodic(func=self.__update, freq=1/(60*10))
-		save_state_periodic = Periodic(func=self.state.check_save_state, freq=1/(10))
-		standard_face_periodic = Periodic(func=self.state.Emotion.emotion.trigger_standard_face, freq=1/(60))
-
-		get_failed_count = 0
+		self.__start_sensors()
+		self.__add_jobs()
+		self.__network_jobs.add('climate', self.__upload_climate, 60000, jitter=1000)
+		self.__network_jobs.add('get', self.__poll_state, 1000)
 
 		while self.WD.running():
 			t_start = ticks_ms()
 			self.WD.update('main')
 			self.dht20.measure()
-			garbage_periodic.call_func()
-
-			if not self.ws.isconnected():
-				Success = self.ws.connect()
-				if not Success:
-					self.WD.kill()
-			
-			update_periodic.call_func()
+			self.__check_connection()
+			self.__network_jobs.run_pending()
 
-			server_return = dht20_periodic.call_func(force_update=dht20_periodic.bypass_timing)
-			if server_return:
-				success_value = server_return.get('success')
-				if success_value == False:
-					dht20_periodic.bypass_timing = True
-					print("Run next time!")
-				print(f"(Main): {server_return}")
+			if self.state_sync.is_watching(self.ws):
+				if self.__check_sync_result(self.state_sync.watch(webserver=self.ws)):
+					sleep_ms(WIFI_RESTART_TIME)
 
-			gc.collect()
-			server_return = light_periodic.call_func()
-			if server_return:
-				if server_return.get('success') == False:
-					get_failed_count += 1
-					gc.collect()
-					print(f"Memory free: {gc.mem_free()} fail counter: {get_failed_count} - {server_return.get('message', '')}")
-					if get_failed_count == 5:
-						print(f"GET failed 5 times: Restarting Wifi: {server_return.get('message', '')}")
-						print(f"Memory: {micropython.mem_info(1)}")
-						self.ws.disconnect()
-						sleep(2)
-					elif get_failed_count > 10:
-						print(f"GET failed 10 times: Doing a restart!")
-						self.WD.kill()
-				elif get_failed_count > 0:
-					get_failed_count = 0
-
-			if self.state_sync.queue.check():
+			if self.state_sync.post_due():
 				self.state_sync.post(webserver=self.ws)
 
-			animation_periodic.call_func()
-			save_state_periodic.call_func()
-			standard_face_periodic.call_func()
+			self.__jobs.run_pending()
 
 			t_end = ticks_ms()
 			if (ticks_diff(t_end, t_start) > 200):
 				print(f"Time taken (Server loop): {ticks_diff(t_end, t_start)}")
+			sleep_ms(min(self.__jobs.sleep_time(SERVER_POLL_INTERVAL), self.__network_jobs.sleep_time(SERVER_POLL_INTERVAL)))
 		print("Server thread is going to kill the sensor thread!")
 		self.WD.kill()
 
+	async def __async_routine(self):
+		print("Start async routine")
+		tasks = [asyncio.create_task(task) for task in (
+			self.__touch_task(),
+			self.__render_task(),
+			self.__sync_task(),
+			self.__jobs_task(),
+		)]
+		while self.WD.running():
+			await asyncio.sleep_ms(100)
+		for task in tasks:
+			task.cancel()
+		print("Async routine is going to kill all tasks!")
+		self.WD.kill()
+
+	async def __jobs_task(self):
+		self.__start_sensors()
+		# The update blocks while it downloads, so it runs on the other core, which the async runtime leaves free
+		self.__add_jobs(update=self.__update_in_thread)
+		self.__jobs.add('measure', self.dht20.measure, 1000)
+		while True:
+			self.__jobs.run_pending()
+			await asyncio.sleep_ms(self.__jobs.sleep_time(1000))
+
+	async def __touch_task(self):
+		touch_manager = TouchManager()
+		touch_state = {"left": 0, "right": 0}  # Initialize with 0 for none
+		while True:
+			self.WD.update('sensor')
+			touch_manager.update_and_manage_state(touch_state)
+			self.__handle_touch(touch_state)
+			await asyncio.sleep_ms(TOUCH_POLL_INTERVAL)
+
+	async def __render_task(self):
+		scheduler = FrameScheduler(fps=self.fps, max_fps=MAX_FPS, poll_interval=TOUCH_POLL_INTERVAL)
+		up_periodic = Periodic(func=self.__still_up, freq=1/10, scheduler=scheduler)
+		while True:
+			up_periodic.call_func()
+			next_event = self.__render(scheduler)
+			# Always yield, so the other tasks run while animating
+			await asyncio.sleep_ms(scheduler.sleep_time(next_event))
+
+	async def __sync_task(self):
+		"""
+		Connects to the network and syncs the state and climate with the server. All requests go through this task,
+		one at a time, as they share the connection to the server, and yield while they wait.
+		"""
+		self.__network_jobs.add('climate', self.__upload_climate_async, 60000, jitter=1000)
+		next_get = ticks_ms()
+		while True:
+			self.WD.update('main')
+			await self.__check_connection_async()
+			await self.__network_jobs.run_pending_async()
+
+			if self.state_sync.is_watching(self.ws):
+				server_return = self.state_sync.watch(webserver=self.ws)
+			elif ticks_diff(ticks_ms(), next_get) >= 0:
+				next_get = ticks_add(ticks_ms(), 1000)
+				server_return = await self.state_sync.get_async(webserver=self.ws)
+			else:
+				server_return = None
+			if self.__check_sync_result(server_return):
+				await asyncio.sleep_ms(WIFI_RESTART_TIME)
+
+			if self.state_sync.post_due():
+				await self.state_sync.post_async(webserver=self.ws)
+			await asyncio.sleep_ms(TOUCH_POLL_INTERVAL)
+
+	def __add_jobs(self, update=None):
+		"""
+		Adds the periodic checks that do not talk to the server, and the check for updates.
+
+		:param update: The function that checks for updates, __update() by default.
+		"""
+		self.__jobs.add('garbage', Trace.collect, 5000)
+		self.__jobs.add('animation', self.state.check_animation_triggers, 2000)
+		self.__jobs.add('save_state', self.state.check_save_state, 10000, fixed_rate=False)
+		self.__jobs.add('standard_face', self.state.Emotion.emotion.trigger_standard_face, 60000)
+		self.__jobs.add('update', update or self.__update, 600000, fixed_rate=False)
+		if self.__trace_server:
+			self.__jobs.add('trace_server', self.__trace_server.poll, 200)
+
+	def __upload_climate(self):
+		"""
+		Uploads the climate measurements, a failed upload is forced again on the next pass.
+		"""
+		force_update = self.__climate_failed
+		self.__climate_failed = False
+		self.__check_climate_result(self.dht20.update_server(webserver=self.ws, force_update=force_update))
+
+	async def __upload_climate_async(self):
+		"""
+		As __upload_climate(), but the sensor posts to a Deferred_Post that is sent with post_async().
+		"""
+		force_update = self.__climate_failed
+		self.__climate_failed = False
+		self.__check_climate_result(self.dht20.update_server(webserver=self.__climate_post, force_update=force_update))
+		self.__check_climate_result(await self.__climate_post.send(self.ws))
+
+	def __check_climate_result(self, server_return):
+		if server_return:
+			success_value = server_return.get('success')
+			if success_value == False:
+				self.__climate_failed = True
+				self.__network_jobs.force('climate')
+				print("Run next time!")
+			print(f"(Main): {server_return}")
+
+	def __poll_state(self):
+		if not self.state_sync.is_watching(self.ws):
+			gc.collect()
+			if self.__check_sync_result(self.state_sync.get(webserver=self.ws)):
+				sleep_ms(WIFI_RESTART_TIME)
+
+	def __render(self, scheduler):
+		"""
+		Renders a frame if the face is animating and a frame is due.
+
+		Returns:
+			int: The milliseconds until the next animation event, see State.next_event_in_ms().
+		"""
+		next_event = self.state.next_event_in_ms()
+		if next_event == 0 and scheduler.frame_due():
+			scheduler.begin_frame()
+			self.state.draw_state()
+			scheduler.end_frame()
+		return next_event
+
+	def __handle_touch(self, touch_state):
+		if self.__hue_changing and touch_state['left'] < 1000:
+			self.__hue_changing = False
+			colour = self.LEDS.get_hsv()
+			self.state.draw_state({'hue': colour[0], 'saturation': colour[1], 'value': colour[2]})
+			self.state_sync.queue.add({'hue': colour[0], 'saturation': colour[1], 'value': colour[2]})
+			self.state_sync.set_block_get(False)
+			self.state.save_status = True
+
+		if touch_state['left'] == -2: #State: toggle light (Double touch right)
+			print("Light action: Toggle")
+			colour = self.LEDS.get_hsv()
+			print(f"Colour: {colour}")
+			if colour[2] == 0:
+				print("Light action: Turn on")
+				self.state.trigger_animation({"value": 1}, TOGGLE_TIME, Time_Profiles.ease_out, force=True)
+				self.state_sync.queue.add({'value': 1})
+			else:
+				print("Light action: Turn off")
+				self.state.trigger_animation({"value": 0}, TOGGLE_TIME, Time_Profiles.ease_out, force=True)
+				self.state_sync.queue.add({'value': 0})
+			self.state.save_status = True
+		elif touch_state['left'] > 1000: #State: Change colour (Hold right)
+			print("Light action: Change colour")
+			if not self.__hue_changing:
+				self.__hue_changing = True
+				self.state_sync.set_block_get(True)
+				colour = self.LEDS.get_hsv()
+				if colour[1] != 1 or colour[2] != 1:
+					self.state.trigger_animation({"saturation": 1, "value": 1}, TOGGLE_TIME, Time_Profiles.ease_in, force=True)
+			self.LEDS.increase_hue(360/4)
+		elif touch_state['right'] == -2: #State: Change screen (Double touch Left)
+			print("Light action: Change screen")
+			self.state.face.screen_toggle()
+			self.state_sync.queue.add({'screen_on': 0})
+			self.state.save_status = True
+		elif touch_state['right'] == -5: #State: Reset (Coding) (Hold left)
+			print("Resetting secrets!")
+			Secrets().reset_secrets()
+			print(f"Secrets reset! Restarting in 2s")
+			sleep(2)
+			self.WD.kill()
+		elif touch_state['left'] == -5: #State: Reset (Double tap left)
+			print("Resetting state!")
+			gc.collect()
+			sleep(2)
+			print("Start renaming boot.py")
+			os.rename("boot.py", "_boot.py")
+			Lights(N=8, brightness=1, pin=machine.Pin(2)).set_hsv((0,1,1))
+			self.WD.kill()
+
+	def __check_connection(self):
+		if not self.ws.isconnected():
+			Success = self.ws.connect()
+			if not Success:
+				self.WD.kill()
+			self.boot.mark('wifi')
+
+	async def __check_connection_async(self):
+		if not self.ws.isconnected():
+			Success = await self.ws.connect_async()
+			if not Success:
+				self.WD.kill()
+			self.boot.mark('wifi')
+
+	def __check_sync_result(self, server_return):
+		"""
+		Counts failed gets, restarts the Wi-Fi after 5 and the device after 10 failures in a row.
+
+		:return: True if the Wi-Fi was turned off, the caller has to wait WIFI_RESTART_TIME before reconnecting.
+		"""
+		if server_return:
+			if server_return.get('success') == False:
+				self.__get_failed_count += 1
+				gc.collect()
+				print(f"Memory free: {gc.mem_free()} fail counter: {self.__get_failed_count} - {server_return.get('message', '')}")
+				if self.__get_failed_count == 5:
+					print(f"GET failed 5 times: Restarting Wifi: {server_return.get('message', '')}")
+					print(f"Memory: {micropython.mem_info(1)}")
+					self.ws.disconnect()
+					return True
+				elif self.__get_failed_count > 10:
+					print(f"GET failed 10 times: Doing a restart!")
+					self.WD.kill()
+			else:
+				if self.__get_failed_count > 0:
+					self.__get_failed_count = 0
+				if self.boot.mark('first_sync'):
+					print(f"Boot: {self.boot.report()}")
+		return False
+
 	def __Test():
 		print("Memory allocated:", gc.mem_alloc(), "bytes")
 		print("Memory free:", gc.mem_free(), "bytes")
 
 if __name__ == '__main__':
 	system = main_system(safety_switch=True)
-	system.start_threads()
\ No newline at end of file
+	system.start()
\ No newline at end of file